@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Compact in-memory storage of amplicons, shared by the analysis scripts.
+# Amplicons are named after the "ID_abundance" convention of swarm, in
+# fasta headers as well as in clustering files (one OTU per line,
+# space-separated amplicons). Ids are interned as integers, abundances
+# and sequence boundaries are kept in arrays, and all sequences are
+# concatenated into a single string, instead of one tuple of strings
+# per amplicon. Files too large to be sorted in memory (clusterings,
+# generated data sets) are sorted externally (see external_sort).
+
+
+
+from __future__ import print_function
+
+import heapq
+import tempfile
+from array import array
+
+
+def split_header(header, default=None):
+    """
+    Split an amplicon name (ID_abundance) into its id and its
+    abundance (integer). Names without abundance get the default
+    abundance, or raise a ValueError if there is no default.
+    """
+    fields = header.split("_")
+    if len(fields) == 2:
+        return fields[0], int(fields[1])
+    if default is None:
+        raise ValueError("not an ID_abundance amplicon name: " + header)
+    return header, default
+
+
+def parse_otu_line(line, default=None):
+    """
+    Split a line of a clustering file (space-separated amplicon names)
+    into the list of amplicon ids and the array of their abundances,
+    in the order of the line (see split_header for the default).
+    """
+    return split_headers(line.split(), default)
+
+
+def split_headers(headers, default=None):
+    """
+    Split amplicon names into the list of their ids and the array of
+    their abundances (see split_header for the default).
+    """
+    fields = [header.split("_") for header in headers]
+    if all(len(pair) == 2 for pair in fields):
+        return ([pair[0] for pair in fields],
+                array("l", [int(pair[1]) for pair in fields]))
+    pairs = [split_header("_".join(pair), default) for pair in fields]
+    return ([pair[0] for pair in pairs],
+            array("l", [pair[1] for pair in pairs]))
+
+
+class IdTable(object):
+    """
+    Intern strings as consecutive integers (order of first appearance).
+    """
+
+    def __init__(self):
+        self.names = list()
+        self.index = dict()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def intern(self, name):
+        """
+        Number of the string, which is added if needed.
+        """
+        try:
+            return self.index[name]
+        except KeyError:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+            return self.index[name]
+
+
+class AmpliconStore(object):
+    """
+    Read-only table of amplicons (see read_fasta). Amplicon number i
+    has the id ids.names[i], the abundance abundances[i] and the
+    sequence sequences[starts[i]:ends[i]]. Look-ups by amplicon id
+    return (abundance, sequence) pairs.
+    """
+
+    def __init__(self, ids, abundances, starts, ends, sequences):
+        self.ids = ids
+        self.abundances = abundances
+        self.starts = starts
+        self.ends = ends
+        self.sequences = sequences
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, amplicon):
+        return amplicon in self.ids
+
+    def __getitem__(self, amplicon):
+        i = self.ids.index[amplicon]
+        return self.abundances[i], self.sequence(i)
+
+    def sequence(self, i):
+        """
+        Sequence of the amplicon number i.
+        """
+        return self.sequences[self.starts[i]:self.ends[i]]
+
+
+def read_mask(mask_file):
+    """
+    Load the set of the amplicon ids of a subsample (one amplicon name
+    per line, as written by FastaSampler -m).
+    """
+    with open(mask_file, "r") as mask_file:
+        return set(split_header(line.strip(), 1)[0]
+                   for line in mask_file if line.strip())
+
+
+def read_fasta(fasta_file, mask=None):
+    """
+    Load the ids, abundances and sequences of a fasta file (one line
+    per sequence, ID_abundance headers), or only of the amplicons of a
+    subsample (set of ids, see read_mask). Repeated ids keep their last
+    abundance and sequence.
+    """
+    ids = IdTable()
+    abundances, starts, ends = array("l"), array("l"), array("l")
+    sequences = list()
+    length = 0
+    keep = True
+    with open(fasta_file, "r") as fasta_file:
+        for line in fasta_file:
+            if line.startswith(">"):
+                amplicon, abundance = split_header(line.strip(">\n"))
+                keep = mask is None or amplicon in mask
+                if not keep:
+                    continue
+                i = ids.intern(amplicon)
+                if i == len(abundances):
+                    abundances.append(abundance)
+                    starts.append(length)
+                    ends.append(length)
+                else:
+                    abundances[i] = abundance
+            elif keep:
+                sequence = line.strip()
+                sequences.append(sequence)
+                starts[i] = length
+                length += len(sequence)
+                ends[i] = length
+    return AmpliconStore(ids, abundances, starts, ends, "".join(sequences))
+
+
+class Descending(object):
+    """
+    Wrap a value to sort it in decreasing order
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def external_sort(lines, key, buffer_size=2**26):
+    """
+    Sort lines (without line breaks) with a bounded memory: runs of at
+    most buffer_size characters are sorted in memory and written to
+    temporary files, which are then merged. Lines with equal keys keep
+    their input order. All lines are read before returning the
+    iterator over the sorted lines.
+    """
+    def read_run(run, number):
+        run.seek(0)
+        for position, line in enumerate(run):
+            line = line[:-1]
+            yield key(line), number, position, line
+        run.close()
+
+    runs = list()
+    buffer = list()
+    buffered = 0
+    for line in lines:
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= buffer_size:
+            run = tempfile.TemporaryFile("w+")
+            run.writelines(line + "\n" for line in sorted(buffer, key=key))
+            runs.append(run)
+            buffer = list()
+            buffered = 0
+    buffer.sort(key=key)
+    if not runs:
+        return iter(buffer)
+    merged = heapq.merge(*([read_run(run, number)
+                            for number, run in enumerate(runs)] +
+                           [((key(line), len(runs), position, line)
+                             for position, line in enumerate(buffer))]))
+    return (line for sort_key, number, position, line in merged)
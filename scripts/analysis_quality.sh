@@ -31,6 +31,7 @@ DATA_SET=$1
 REFS=$2
 MIN_T=$3
 MAX_T=$4
+BOOTSTRAP=$5 # optional, number of bootstrap replicates of the metrics (adds the <metric>_low and <metric>_high columns)
 
 
 GROUND_TRUTH_THRESHOLDS=(0.95 0.97 0.99)
@@ -40,12 +41,17 @@ INFILE_ALT=${INFILE}_alt
 INFILE_ALT_LENGTH=${INFILE}_alt_length
 INFILE_ALT_ABUNDANCE=${INFILE}_alt_abundance
 OUTDIR=results
-CONF_TABLE=${OUTDIR}/confusion-table.conf
 
 LOG_FILE=${OUTDIR}/${DATA_SET}-quality-log.csv
 LOG_CMD="/usr/bin/time -f %e,%M,%C -a -o ${LOG_FILE} /bin/sh -c "
 echo "time,memory,cmd" > ${LOG_FILE}
 
+# clusterings and metrics already computed (same inputs, binaries and command)
+# are reused from the cache (add --max_size / --max_age to bound it), with
+# their rows of the log file
+CACHE_DIR=${OUTDIR}/cache
+CACHED="python scripts/result_cache.py -c ${CACHE_DIR} -l ${LOG_FILE}"
+
 
 
 # ===== Clustering & confusion table =====
@@ -57,6 +63,13 @@ ${VSEARCH} -sortbysize ${INFILE_ALT} -output ${INFILE_ALT_ABUNDANCE} -minsize 1
 
 
 # prepare ground truths and metrics files
+METRICS_HEADER="method,threshold,rep,recall,precision,nmi,randindex,adjrandindex"
+if [ "${BOOTSTRAP:-0}" -gt 0 ]; then
+	for METRIC in recall precision nmi randindex adjrandindex
+	do
+		METRICS_HEADER+=",${METRIC}_low,${METRIC}_high"
+	done
+fi
 TAXA_FILES=()
 METRICS_FILES=()
 for P in "${GROUND_TRUTH_THRESHOLDS[@]}"
@@ -70,10 +83,14 @@ do
 	# initialise metrics & performance-log file
 	METRICS_FILE=${OUTDIR}/${DATA_SET}_${P}-metrics.csv
 	METRICS_FILES+=(${METRICS_FILE})
-	echo "method,threshold,rep,recall,precision,nmi,randindex,adjrandindex" > ${METRICS_FILE}
+	echo "${METRICS_HEADER}" > ${METRICS_FILE}
 
 done
 
+# evaluate each clustering against all ground truths at once
+TAXA_LIST=$(IFS=','; echo "${TAXA_FILES[*]}")
+METRICS_LIST=$(IFS=','; echo "${METRICS_FILES[*]}")
+
 # run tools, compute & evaluate confusion table
 for ((T=${MIN_T}; T<=${MAX_T}; T++))
 do
@@ -82,32 +99,23 @@ do
 
 	# Swarm (version 1, non-fastidious)
 	RES=${OUTDIR}/swarm-v1_o_${T}.csv
-	${LOG_CMD} "${SWARM_V1} -d ${T} -o ${RES}.tmp ${INFILE}; \
+	${CACHED} -i ${INFILE} -b ${SWARM_V1} -b ${SWARM_BREAKER} -o ${RES} -- ${LOG_CMD} "${SWARM_V1} -d ${T} -o ${RES}.tmp ${INFILE}; \
 	python ${SWARM_BREAKER} -b ${SWARM_V1} -f ${INFILE} -s ${RES}.tmp -d ${T} > ${RES}"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "swarm-v1" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	bash ${COMPUTE_METRICS} ${RES} "swarm-v1" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# Swarm (version 2, non-fastidious)
 	RES=${OUTDIR}/swarm-v2_o_${T}.csv
-	${LOG_CMD} "${SWARM_V2} -d ${T} -o ${RES} -a 1 ${INFILE}" 
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "swarm-v2" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -b ${SWARM_V2} -o ${RES} -- ${LOG_CMD} "${SWARM_V2} -d ${T} -o ${RES} -a 1 ${INFILE}" 
+	bash ${COMPUTE_METRICS} ${RES} "swarm-v2" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 	# Swarm (version 2, fastidious)
 	if [ "${T}" == "1" ]; then
 		RES=${OUTDIR}/swarm-v2_s_${T}_f.csv
-		${LOG_CMD} "${SWARM_V2} -f -d ${T} -o ${RES} -a 1 ${INFILE}"
-		for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-		do
-			bash ${COMPUTE_METRICS} ${RES} "swarm-v2-2f" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-		done
-		rm ${RES} ${CONF_TABLE}
+		${CACHED} -i ${INFILE} -b ${SWARM_V2} -o ${RES} -- ${LOG_CMD} "${SWARM_V2} -f -d ${T} -o ${RES} -a 1 ${INFILE}"
+		bash ${COMPUTE_METRICS} ${RES} "swarm-v2-2f" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+		rm ${RES}
 	fi
 	
 
@@ -116,58 +124,40 @@ do
 
 	# GeFaST (edit distance, non-fastidious)
 	RES=${OUTDIR}/gefast-e_o_${T}.csv
-	${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES}"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "gefast-e" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -i ${CONF} -b ${GEFAST} -o ${RES} -- ${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES}"
+	bash ${COMPUTE_METRICS} ${RES} "gefast-e" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 	# GeFaST (edit distance, fastidious, t + 1)
 	RES=${OUTDIR}/gefast-e_o_${T}_f1.csv
-	${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((${T} + 1))"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "gefast-e-f1" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -i ${CONF} -b ${GEFAST} -o ${RES} -- ${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((${T} + 1))"
+	bash ${COMPUTE_METRICS} ${RES} "gefast-e-f1" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 	# GeFaST (edit distance, fastidious, 2 * t)
 	RES=${OUTDIR}/gefast-e_o_${T}_2f.csv
-	${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((2 * ${T}))"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "gefast-e-2f" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -i ${CONF} -b ${GEFAST} -o ${RES} -- ${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((2 * ${T}))"
+	bash ${COMPUTE_METRICS} ${RES} "gefast-e-2f" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 
 	# GeFaST (scoring function, non-fastidious)
 	RES=${OUTDIR}/gefast-s_o_${T}.csv
-	${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -i ${CONF} -b ${GEFAST} -o ${RES} -- ${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score"
+	bash ${COMPUTE_METRICS} ${RES} "gefast-s" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 	# GeFaST (scoring function, fastidious, t + 1)
 	RES=${OUTDIR}/gefast-s_o_${T}_f1.csv
-	${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((${T} + 1))"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s-f1" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -i ${CONF} -b ${GEFAST} -o ${RES} -- ${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((${T} + 1))"
+	bash ${COMPUTE_METRICS} ${RES} "gefast-s-f1" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 	# GeFaST (scoring function, fastidious, 2 * t)
 	RES=${OUTDIR}/gefast-s_o_${T}_2f.csv
-	${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((2 * ${T}))"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s-2f" ${T} ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -i ${CONF} -b ${GEFAST} -o ${RES} -- ${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((2 * ${T}))"
+	bash ${COMPUTE_METRICS} ${RES} "gefast-s-2f" ${T} ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 
 
@@ -175,75 +165,27 @@ do
 
 	# USEARCH (cluster_fast, sort by length)
 	RES=${OUTDIR}/usearch-fast-length_${T}.csv
-	${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sort length -fulldp"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "usearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT} -b ${USEARCH} -o ${RES}.uc -- ${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -sort length -fulldp"
+	bash ${COMPUTE_METRICS} ${RES}.uc "usearch-fast-length" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# USEARCH (cluster_fast, sort by abundance)
 	RES=${OUTDIR}/usearch-fast-abund_${T}.csv
-	${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sort size -fulldp"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "usearch-fast-abund" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT} -b ${USEARCH} -o ${RES}.uc -- ${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -sort size -fulldp"
+	bash ${COMPUTE_METRICS} ${RES}.uc "usearch-fast-abund" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# USEARCH (cluster_smallmem, presorted by length)
 	RES=${OUTDIR}/usearch-small-length_${T}.csv
-	${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sortedby length -fulldp"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "usearch-small-length" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT_LENGTH} -b ${USEARCH} -o ${RES}.uc -- ${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.uc -sortedby length -fulldp"
+	bash ${COMPUTE_METRICS} ${RES}.uc "usearch-small-length" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# USEARCH (cluster_smallmem, presorted by abundance)
 	RES=${OUTDIR}/usearch-small-abund_${T}.csv
-	${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sortedby size -fulldp"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "usearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT_ABUNDANCE} -b ${USEARCH} -o ${RES}.uc -- ${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.uc -sortedby size -fulldp"
+	bash ${COMPUTE_METRICS} ${RES}.uc "usearch-small-abund" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 
 
@@ -251,75 +193,27 @@ do
 
 	# VSEARCH (cluster_fast, sort by length)
 	RES=${OUTDIR}/vsearch-fast-length_${T}.csv
-	${LOG_CMD} "${VSEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT} -b ${VSEARCH} -o ${RES}.uc -- ${LOG_CMD} "${VSEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+	bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-fast-length" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# VSEARCH (cluster_size, sort by abundance)
 	RES=${OUTDIR}/vsearch-size-abundance_${T}.csv
-	${LOG_CMD} "${VSEARCH} -threads 1 -cluster_size ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-size-abund" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT} -b ${VSEARCH} -o ${RES}.uc -- ${LOG_CMD} "${VSEARCH} -threads 1 -cluster_size ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+	bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-size-abund" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# VSEARCH (cluster_smallmem, presorted by length)
 	RES=${OUTDIR}/vsearch-small-length_${T}.csv
-	${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-small-length" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT_LENGTH} -b ${VSEARCH} -o ${RES}.uc -- ${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+	bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-small-length" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# VSEARCH (cluster_smallmem, presorted by abundance)
 	RES=${OUTDIR}/vsearch-small-abund_${T}.csv
-	${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1 -usersort"
-	awk 'BEGIN {FS="\t"}{
-		if ($1 == "S") clusters[$2] = $9
-		if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-	}
-	END {
-		for (cluster in clusters) {
-			print clusters[cluster]
-		}
-	}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE_ALT_ABUNDANCE} -b ${VSEARCH} -o ${RES}.uc -- ${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1 -usersort"
+	bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-small-abund" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 
 
@@ -327,34 +221,21 @@ do
 
 	# CD-HIT (-d 0 = use full sequence name; -T 1 = use one thread; -M 0 = no memory limit)
 	RES=${OUTDIR}/cdhit_${T}.csv
-	${LOG_CMD} "${CDHIT} -i ${INFILE} -o ${RES}.tmp -c 0.$((100 - ${T})) -d 0 -T 1 -M 0"
-	awk ' BEGIN {FS = ">|(\\.\\.\\.)"}
-		NR != 1 {printf /^>Cluster/ ? "\n" : $2" "}
-	END {printf "\n"}' ${RES}.tmp.clstr | sed -e 's/ $//' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "cd-hit" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -b ${CDHIT} -o ${RES}.tmp.clstr -- ${LOG_CMD} "${CDHIT} -i ${INFILE} -o ${RES}.tmp -c 0.$((100 - ${T})) -d 0 -T 1 -M 0"
+	bash ${COMPUTE_METRICS} ${RES}.tmp.clstr "cd-hit" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 	# DNACLUST (-t 1 = use one thread)
 	RES=${OUTDIR}/dnaclust_${T}.csv
-	${LOG_CMD} "${DNACLUST} -s 0.$((100 - ${T})) -i ${INFILE} -t 1 | sed 's/\t/ /g; s/ $//g' > ${RES}"
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "dnaclust" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES} ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -b ${DNACLUST} -o ${RES} -- ${LOG_CMD} "${DNACLUST} -s 0.$((100 - ${T})) -i ${INFILE} -t 1 | sed 's/\t/ /g; s/ $//g' > ${RES}"
+	bash ${COMPUTE_METRICS} ${RES} "dnaclust" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}
 
 	# Sumaclust
 	RES=${OUTDIR}/sumaclust_${T}.csv
-	${LOG_CMD} "${SUMACLUST} -t 0.$((100 - ${T})) -O ${RES}.tmp ${INFILE} > /dev/null"
-	cut -d$'\t' -f2- ${RES}.tmp | sed 's/\t/ /g' > ${RES}
-	for ((I=0; I<${#GROUND_TRUTH_THRESHOLDS[@]}; I++))
-	do
-		bash ${COMPUTE_METRICS} ${RES} "sumaclust" 0.$((100 - ${T})) ${TAXA_FILES[${I}]} ${CONF_TABLE} ${METRICS_FILES[${I}]} 0
-	done
-	rm ${RES}* ${CONF_TABLE}
+	${CACHED} -i ${INFILE} -b ${SUMACLUST} -o ${RES}.sumaclust -- ${LOG_CMD} "${SUMACLUST} -t 0.$((100 - ${T})) -O ${RES}.sumaclust ${INFILE} > /dev/null"
+	bash ${COMPUTE_METRICS} ${RES}.sumaclust "sumaclust" 0.$((100 - ${T})) ${TAXA_LIST} ${METRICS_LIST} 0 ${CACHE_DIR} ${BOOTSTRAP}
+	rm ${RES}*
 
 done
 
@@ -34,19 +34,29 @@ MAX_T=$4
 GROUND_TRUTH_THRESHOLD=$5
 PROPORTION=$6
 REPETITIONS=$7
+SEED=$8 # optional, seed of the subsampling (random otherwise)
+BOOTSTRAP=$9 # optional, number of bootstrap replicates of the metrics (adds the <metric>_low and <metric>_high columns)
 
 OUTDIR=results
-CONF_TABLE=${OUTDIR}/confusion-table.conf
 FASTA_FILE=data/${DATA_SET}/${DATA_SET}_derep.fasta
 
 SUBSAMPLE_STEM=data/${DATA_SET}/${DATA_SET}_derep_sub
 REMOVE_SUBSAMPLES=1
 
+# draw the subsamples once, as lists of amplicons (masks),
+# and select their sequences for the clustering tools
+./tools/FastaSampler -m ${FASTA_FILE} ${PROPORTION} ${REPETITIONS} ${SUBSAMPLE_STEM} ${SEED}
 for ((R=0; R<${REPETITIONS}; R++))
 do
-	./tools/FastaSampler -r ${FASTA_FILE} ${PROPORTION} ${REPETITIONS} ${SUBSAMPLE_STEM}
+	./tools/FastaSampler -l ${FASTA_FILE} ${SUBSAMPLE_STEM}_${PROPORTION}_${R}.ids ${SUBSAMPLE_STEM}_${PROPORTION}_${R}.fasta
 done
 
+# assign taxa once for the whole data set (with VSEARCH to avoid memory limit of 32-bit USEARCH),
+# the assignment of an amplicon does not depend on the other amplicons
+# and the metrics restrict them to each subsample (--mask, outside of the timed commands)
+TAXA_FILE=${SUBSAMPLE_STEM}.spec.ualn
+bash scripts/assign_taxa.sh ${VSEARCH} 8 ${FASTA_FILE} ${REFS} ${TAXA_FILE} ${GROUND_TRUTH_THRESHOLD}
+
 
 
 
@@ -54,7 +64,14 @@ done
 
 # prepare metrics & performance-log file
 METRICS_FILE=${OUTDIR}/${DATA_SET}-sub-fixed-metrics.csv
-echo "method,threshold,rep,recall,precision,nmi,randindex,adjrandindex" > ${METRICS_FILE}
+METRICS_HEADER="method,threshold,rep,recall,precision,nmi,randindex,adjrandindex"
+if [ "${BOOTSTRAP:-0}" -gt 0 ]; then
+	for METRIC in recall precision nmi randindex adjrandindex
+	do
+		METRICS_HEADER+=",${METRIC}_low,${METRIC}_high"
+	done
+fi
+echo "${METRICS_HEADER}" > ${METRICS_FILE}
 
 LOG_FILE=${OUTDIR}/${DATA_SET}-sub-fixed-log.csv
 LOG_CMD="/usr/bin/time -f %e,%M,%C -a -o ${LOG_FILE} /bin/sh -c "
@@ -68,6 +85,7 @@ do
 	do
 
 		INFILE=${SUBSAMPLE_STEM}_${PROPORTION}_${R}.fasta
+		MASK=${SUBSAMPLE_STEM}_${PROPORTION}_${R}.ids
 		INFILE_ALT=${INFILE}_alt
 		INFILE_ALT_LENGTH=${INFILE}_alt_length
 		INFILE_ALT_ABUNDANCE=${INFILE}_alt_abundance
@@ -77,10 +95,6 @@ do
 		${VSEARCH} -sortbylength ${INFILE_ALT} -output ${INFILE_ALT_LENGTH} -minsize 1
 		${VSEARCH} -sortbysize ${INFILE_ALT} -output ${INFILE_ALT_ABUNDANCE} -minsize 1
 
-		# assign taxa (with VSEARCH to avoid memory limit of 32-bit USEARCH)
-		TAXA_FILE=${SUBSAMPLE_STEM}_${PROPORTION}_${R}.spec.ualn
-		bash scripts/assign_taxa.sh ${VSEARCH} 8 ${INFILE} ${REFS} ${TAXA_FILE} ${GROUND_TRUTH_THRESHOLD}
-
 
 
 		## Swarm
@@ -90,21 +104,21 @@ do
 		${LOG_CMD} "${SWARM_V1} -d ${T} -o ${RES}.tmp ${INFILE}; \
 		python ${SWARM_BREAKER} -b ${SWARM_V1} -f ${INFILE} -s ${RES}.tmp -d ${T} > ${RES}"
 		rm ${RES}.tmp
-		bash ${COMPUTE_METRICS} ${RES} "swarm-v1" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "swarm-v1" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# Swarm (version 2, non-fastidious)
 		RES=${OUTDIR}/swarm-v2_o_${T}.csv
 		${LOG_CMD} "${SWARM_V2} -d ${T} -o ${RES} -a 1 ${INFILE}" 
-		bash ${COMPUTE_METRICS} ${RES} "swarm-v2" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "swarm-v2" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# Swarm (version 2, fastidious)
 		if [ "${T}" == "1" ]; then
 			RES=${OUTDIR}/swarm-v2_s_${T}_f.csv
 			${LOG_CMD} "${SWARM_V2} -f -d ${T} -o ${RES} -a 1 ${INFILE}"
-			bash ${COMPUTE_METRICS} ${RES} "swarm-v2-2f" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-			rm ${RES} ${CONF_TABLE}
+			bash ${COMPUTE_METRICS} ${RES} "swarm-v2-2f" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+			rm ${RES}
 		fi
 
 
@@ -114,39 +128,39 @@ do
 		# GeFaST (edit distance, non-fastidious)
 		RES=${OUTDIR}/gefast-e_o_${T}_e.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES}"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-e" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-e" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# GeFaST (edit distance, fastidious, t + 1)
 		RES=${OUTDIR}/gefast-e_o_${T}_ef1.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((${T} + 1))"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-e-f1" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-e-f1" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# GeFaST (edit distance, fastidious, 2 * t)
 		RES=${OUTDIR}/gefast-e_o_${T}_e2f.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((2 * ${T}))"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-e-2f" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-e-2f" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 
 		# GeFaST (scoring function, non-fastidious)
 		RES=${OUTDIR}/gefast-s_o_${T}_s.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-s" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# GeFaST (scoring function, fastidious, t + 1)
 		RES=${OUTDIR}/gefast-s_o_${T}_sf1.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((${T} + 1))"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s-f1" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-s-f1" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# GeFaST (scoring function, fastidious, 2 * t)
 		RES=${OUTDIR}/gefast-s_o_${T}_s2f.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((2 * ${T}))"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s-2f" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-s-2f" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 
 
@@ -154,63 +168,27 @@ do
 
 		# USEARCH (cluster_fast, sort by length)
 		RES=${OUTDIR}/usearch-fast-length_${T}.csv
-		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sort length -fulldp"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "usearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -sort length -fulldp"
+		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# USEARCH (cluster_fast, sort by abundance)
 		RES=${OUTDIR}/usearch-fast-abund_${T}.csv
-		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sort size -fulldp"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "usearch-fast-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -sort size -fulldp"
+		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-fast-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# USEARCH (cluster_smallmem, presorted by length)
 		RES=${OUTDIR}/usearch-small-length_${T}.csv
-		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sortedby length -fulldp"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "usearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.uc -sortedby length -fulldp"
+		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# USEARCH (cluster_smallmem, presorted by abundance)
 		RES=${OUTDIR}/usearch-small-abund_${T}.csv
-		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sortedby size -fulldp"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "usearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.uc -sortedby size -fulldp"
+		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 
 
@@ -218,63 +196,27 @@ do
 
 		# VSEARCH (cluster_fast, sort by length)
 		RES=${OUTDIR}/vsearch-fast-length_${T}.csv
-		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# VSEARCH (cluster_size, sort by abundance)
 		RES=${OUTDIR}/vsearch-size-abundance_${T}.csv
-		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_size ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-size-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_size ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-size-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# VSEARCH (cluster_smallmem, presorted by length)
 		RES=${OUTDIR}/vsearch-small-length_${T}.csv
-		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# VSEARCH (cluster_smallmem, presorted by abundance)
 		RES=${OUTDIR}/vsearch-small-abund_${T}.csv
-		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1 -usersort"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1 -usersort"
+		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 
 
@@ -283,28 +225,24 @@ do
 		# CD-HIT (-d 0 = use full sequence name; -T 1 = use one thread; -M 0 = no memory limit)
 		RES=${OUTDIR}/cdhit_${T}.csv
 		${LOG_CMD} "${CDHIT} -i ${INFILE} -o ${RES}.tmp -c 0.$((100 - ${T})) -d 0 -T 1 -M 0"
-		awk ' BEGIN {FS = ">|(\\.\\.\\.)"}
-		NR != 1 {printf /^>Cluster/ ? "\n" : $2" "}
-		END {printf "\n"}' ${RES}.tmp.clstr | sed -e 's/ $//' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "cd-hit" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES}.tmp.clstr "cd-hit" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 		# DNACLUST (-t 1 = use one thread)
 		RES=${OUTDIR}/dnaclust_${T}.csv
 		${LOG_CMD} "${DNACLUST} -s 0.$((100 - ${T})) -i ${INFILE} -t 1 | sed 's/\t/ /g; s/ $//g' > ${RES}"
-		bash ${COMPUTE_METRICS} ${RES} "dnaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "dnaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}
 
 		# Sumaclust
 		RES=${OUTDIR}/sumaclust_${T}.csv
-		${LOG_CMD} "${SUMACLUST} -t 0.$((100 - ${T})) -O ${RES}.tmp ${INFILE} > /dev/null"
-		cut -d$'\t' -f2- ${RES}.tmp | sed 's/\t/ /g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "sumaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${SUMACLUST} -t 0.$((100 - ${T})) -O ${RES}.sumaclust ${INFILE} > /dev/null"
+		bash ${COMPUTE_METRICS} ${RES}.sumaclust "sumaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" "${BOOTSTRAP}" ${MASK}
+		rm ${RES}*
 
 
 
-		rm ${INFILE_ALT} ${INFILE_ALT_LENGTH} ${INFILE_ALT_ABUNDANCE} ${TAXA_FILE}
+		rm ${INFILE_ALT} ${INFILE_ALT_LENGTH} ${INFILE_ALT_ABUNDANCE}
 
 	done
 done
@@ -314,6 +252,7 @@ Rscript --vanilla scripts/eval_subsamples_fixed_quality.R ${METRICS_FILE} ${OUTD
 Rscript --vanilla scripts/eval_subsamples_fixed_performance.R ${LOG_FILE} ${OUTDIR}/${DATA_SET}-sub-fixed-performance
 
 # clean up
+rm -rf ${TAXA_FILE}.compiled
 if [ "${REMOVE_SUBSAMPLES}" == "1" ]; then
 	rm ${SUBSAMPLE_STEM}*
 fi
@@ -33,9 +33,9 @@ MAX_T=$3
 GROUND_TRUTH_THRESHOLD=$4
 PROPORTION=$5
 REPETITIONS=$6
+BOOTSTRAP=$7 # optional, number of bootstrap replicates of the metrics (adds the <metric>_low and <metric>_high columns)
 
 OUTDIR=results
-CONF_TABLE=${OUTDIR}/confusion-table.conf
 FASTA_FILE=data/${DATA_SET}/${DATA_SET}_derep.fasta
 
 SUBSAMPLE_STEM=data/${DATA_SET}/${DATA_SET}_derep_sub
@@ -54,7 +54,7 @@ REFORMAT_SCRIPT=scripts/reformat-silva-taxonomy.R
 # and replace identifiers of reference representatives with the actual taxonomy information
 TAXA_FILE=data/${DATA_SET}/${DATA_SET}_derep.spec.ualn
 bash scripts/assign_taxa.sh ${VSEARCH} 8 ${FASTA_FILE} ${REP_SET} ${TAXA_FILE}.tmp ${GROUND_TRUTH_THRESHOLD}
-python scripts/assign_taxa_rep.py -r ${TAXONOMY} -t ${TAXA_FILE}.tmp > ${TAXA_FILE}
+python scripts/assign_taxa_rep.py -c -r ${TAXONOMY} -t ${TAXA_FILE}.tmp > ${TAXA_FILE}
 rm ${TAXA_FILE}.tmp
 
 # reduce data to sequences with clean, "complete" taxonomy
@@ -86,7 +86,14 @@ done
 
 # prepare metrics & performance-log file
 METRICS_FILE=${OUTDIR}/${DATA_SET}-sub-fixed-red-metrics.csv
-echo "method,threshold,rep,recall,precision,adjrandindex" > ${METRICS_FILE}
+METRICS_HEADER="method,threshold,rep,recall,precision,adjrandindex"
+if [ "${BOOTSTRAP:-0}" -gt 0 ]; then
+	for METRIC in recall precision adjrandindex
+	do
+		METRICS_HEADER+=",${METRIC}_low,${METRIC}_high"
+	done
+fi
+echo "${METRICS_HEADER}" > ${METRICS_FILE}
 
 LOG_FILE=${OUTDIR}/${DATA_SET}-sub-fixed-red-log.csv
 LOG_CMD="/usr/bin/time -f %e,%M,%C -a -o ${LOG_FILE} /bin/sh -c "
@@ -119,21 +126,21 @@ do
 #		${LOG_CMD} "${SWARM_V1} -d ${T} -o ${RES}.tmp ${INFILE}; \
 #		python ${SWARM_BREAKER} -b ${SWARM_V1} -f ${INFILE} -s ${RES}.tmp -d ${T} > ${RES}"
 #		rm ${RES}.tmp
-#		bash ${COMPUTE_METRICS} ${RES} "swarm-v1" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES} ${CONF_TABLE}
+#		bash ${COMPUTE_METRICS} ${RES} "swarm-v1" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}
 #
 #		# Swarm (version 2, non-fastidious)
 #		RES=${OUTDIR}/swarm-v2_o_${T}.csv
 #		${LOG_CMD} "${SWARM_V2} -d ${T} -o ${RES} -a 1 ${INFILE}" 
-#		bash ${COMPUTE_METRICS} ${RES} "swarm-v2" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES} ${CONF_TABLE}
+#		bash ${COMPUTE_METRICS} ${RES} "swarm-v2" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}
 #
 #		# Swarm (version 2, fastidious)
 #		if [ "${T}" == "1" ]; then
 #			RES=${OUTDIR}/swarm-v2_s_${T}_f.csv
 #			${LOG_CMD} "${SWARM_V2} -f -d ${T} -o ${RES} -a 1 ${INFILE}"
-#			bash ${COMPUTE_METRICS} ${RES} "swarm-v2-2f" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#			rm ${RES} ${CONF_TABLE}
+#			bash ${COMPUTE_METRICS} ${RES} "swarm-v2-2f" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#			rm ${RES}
 #		fi
 
 
@@ -143,39 +150,39 @@ do
 #		# GeFaST (edit distance, non-fastidious)
 #		RES=${OUTDIR}/gefast-e_o_${T}_e.csv
 #		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES}"
-#		bash ${COMPUTE_METRICS} ${RES} "gefast-e" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES} ${CONF_TABLE}
+#		bash ${COMPUTE_METRICS} ${RES} "gefast-e" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}
 #
 #		# GeFaST (edit distance, fastidious, t + 1)
 #		RES=${OUTDIR}/gefast-e_o_${T}_ef1.csv
 #		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((${T} + 1))"
-#		bash ${COMPUTE_METRICS} ${RES} "gefast-e-f1" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES} ${CONF_TABLE}
+#		bash ${COMPUTE_METRICS} ${RES} "gefast-e-f1" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}
 #
 #		# GeFaST (edit distance, fastidious, 2 * t)
 #		RES=${OUTDIR}/gefast-e_o_${T}_e2f.csv
 #		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} -sf --swarm-fastidious-threshold $((2 * ${T}))"
-#		bash ${COMPUTE_METRICS} ${RES} "gefast-e-2f" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES} ${CONF_TABLE}
+#		bash ${COMPUTE_METRICS} ${RES} "gefast-e-2f" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}
 
 
 		# GeFaST (scoring function, non-fastidious)
 		RES=${OUTDIR}/gefast-s_o_${T}_s.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-s" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}
 
 		# GeFaST (scoring function, fastidious, t + 1)
 		RES=${OUTDIR}/gefast-s_o_${T}_sf1.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((${T} + 1))"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s-f1" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-s-f1" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}
 
 		# GeFaST (scoring function, fastidious, 2 * t)
 		RES=${OUTDIR}/gefast-s_o_${T}_s2f.csv
 		${LOG_CMD} "${GEFAST} ${INFILE} -t ${T} --config ${CONF} -so ${RES} --use-score -sf --swarm-fastidious-threshold $((2 * ${T}))"
-		bash ${COMPUTE_METRICS} ${RES} "gefast-s-2f" ${T} ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "gefast-s-2f" ${T} ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}
 
 
 
@@ -183,63 +190,27 @@ do
 
 #		# USEARCH (cluster_fast, sort by length)
 #		RES=${OUTDIR}/usearch-fast-length_${T}.csv
-#		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sort length -fulldp"
-#		awk 'BEGIN {FS="\t"}{
-#			if ($1 == "S") clusters[$2] = $9
-#			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-#		}
-#		END {
-#			for (cluster in clusters) {
-#				print clusters[cluster]
-#			}
-#		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-#		bash ${COMPUTE_METRICS} ${RES} "usearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES}* ${CONF_TABLE}
+#		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -sort length -fulldp"
+#		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}*
 
 		# USEARCH (cluster_fast, sort by abundance)
 		RES=${OUTDIR}/usearch-fast-abund_${T}.csv
-		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sort size -fulldp"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "usearch-fast-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${USEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -sort size -fulldp"
+		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-fast-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}*
 
 #		# USEARCH (cluster_smallmem, presorted by length)
 #		RES=${OUTDIR}/usearch-small-length_${T}.csv
-#		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sortedby length -fulldp"
-#		awk 'BEGIN {FS="\t"}{
-#			if ($1 == "S") clusters[$2] = $9
-#			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-#		}
-#		END {
-#			for (cluster in clusters) {
-#				print clusters[cluster]
-#			}
-#		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-#		bash ${COMPUTE_METRICS} ${RES} "usearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES}* ${CONF_TABLE}
+#		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.uc -sortedby length -fulldp"
+#		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}*
 
 #		# USEARCH (cluster_smallmem, presorted by abundance)
 #		RES=${OUTDIR}/usearch-small-abund_${T}.csv
-#		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.tmp -sortedby size -fulldp"
-#		awk 'BEGIN {FS="\t"}{
-#			if ($1 == "S") clusters[$2] = $9
-#			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-#		}
-#		END {
-#			for (cluster in clusters) {
-#				print clusters[cluster]
-#			}
-#		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-#		bash ${COMPUTE_METRICS} ${RES} "usearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES}* ${CONF_TABLE}
+#		${LOG_CMD} "${USEARCH} -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.uc -sortedby size -fulldp"
+#		bash ${COMPUTE_METRICS} ${RES}.uc "usearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}*
 
 
 
@@ -247,63 +218,27 @@ do
 
 #		# VSEARCH (cluster_fast, sort by length)
 #		RES=${OUTDIR}/vsearch-fast-length_${T}.csv
-#		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-#		awk 'BEGIN {FS="\t"}{
-#			if ($1 == "S") clusters[$2] = $9
-#			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-#		}
-#		END {
-#			for (cluster in clusters) {
-#				print clusters[cluster]
-#			}
-#		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-#		bash ${COMPUTE_METRICS} ${RES} "vsearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES}* ${CONF_TABLE}
+#		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_fast ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+#		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-fast-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}*
 
 		# VSEARCH (cluster_size, sort by abundance)
 		RES=${OUTDIR}/vsearch-size-abundance_${T}.csv
-		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_size ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-		awk 'BEGIN {FS="\t"}{
-			if ($1 == "S") clusters[$2] = $9
-			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-		}
-		END {
-			for (cluster in clusters) {
-				print clusters[cluster]
-			}
-		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "vsearch-size-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_size ${INFILE_ALT} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-size-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}*
 
 #		# VSEARCH (cluster_smallmem, presorted by length)
 #		RES=${OUTDIR}/vsearch-small-length_${T}.csv
-#		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1"
-#		awk 'BEGIN {FS="\t"}{
-#			if ($1 == "S") clusters[$2] = $9
-#			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-#		}
-#		END {
-#			for (cluster in clusters) {
-#				print clusters[cluster]
-#			}
-#		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-#		bash ${COMPUTE_METRICS} ${RES} "vsearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES}* ${CONF_TABLE}
+#		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_LENGTH} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1"
+#		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-small-length" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}*
 
 #		# VSEARCH (cluster_smallmem, presorted by abundance)
 #		RES=${OUTDIR}/vsearch-small-abund_${T}.csv
-#		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.tmp -minsize 1 -usersort"
-#		awk 'BEGIN {FS="\t"}{
-#			if ($1 == "S") clusters[$2] = $9
-#			if ($1 == "H") clusters[$2] = clusters[$2] " " $9
-#		}
-#		END {
-#			for (cluster in clusters) {
-#				print clusters[cluster]
-#			}
-#		}' ${RES}.tmp | sed 's/;size=/_/g' > ${RES}
-#		bash ${COMPUTE_METRICS} ${RES} "vsearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-#		rm ${RES}* ${CONF_TABLE}
+#		${LOG_CMD} "${VSEARCH} -threads 1 -cluster_smallmem ${INFILE_ALT_ABUNDANCE} -id 0.$((100 - ${T})) -uc ${RES}.uc -minsize 1 -usersort"
+#		bash ${COMPUTE_METRICS} ${RES}.uc "vsearch-small-abund" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+#		rm ${RES}*
 
 
 
@@ -312,24 +247,20 @@ do
 		# CD-HIT (-d 0 = use full sequence name; -T 1 = use one thread; -M 0 = no memory limit)
 		RES=${OUTDIR}/cdhit_${T}.csv
 		${LOG_CMD} "${CDHIT} -i ${INFILE} -o ${RES}.tmp -c 0.$((100 - ${T})) -d 0 -T 1 -M 0"
-		awk ' BEGIN {FS = ">|(\\.\\.\\.)"}
-		NR != 1 {printf /^>Cluster/ ? "\n" : $2" "}
-		END {printf "\n"}' ${RES}.tmp.clstr | sed -e 's/ $//' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "cd-hit" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES}.tmp.clstr "cd-hit" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}*
 
 		# DNACLUST (-t 1 = use one thread)
 		RES=${OUTDIR}/dnaclust_${T}.csv
 		${LOG_CMD} "${DNACLUST} -s 0.$((100 - ${T})) -i ${INFILE} -t 1 | sed 's/\t/ /g; s/ $//g' > ${RES}"
-		bash ${COMPUTE_METRICS} ${RES} "dnaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES} ${CONF_TABLE}
+		bash ${COMPUTE_METRICS} ${RES} "dnaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}
 
 		# Sumaclust
 		RES=${OUTDIR}/sumaclust_${T}.csv
-		${LOG_CMD} "${SUMACLUST} -t 0.$((100 - ${T})) -O ${RES}.tmp ${INFILE} > /dev/null"
-		cut -d$'\t' -f2- ${RES}.tmp | sed 's/\t/ /g' > ${RES}
-		bash ${COMPUTE_METRICS} ${RES} "sumaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${CONF_TABLE} ${METRICS_FILE} ${R}
-		rm ${RES}* ${CONF_TABLE}
+		${LOG_CMD} "${SUMACLUST} -t 0.$((100 - ${T})) -O ${RES}.sumaclust ${INFILE} > /dev/null"
+		bash ${COMPUTE_METRICS} ${RES}.sumaclust "sumaclust" 0.$((100 - ${T})) ${TAXA_FILE} ${METRICS_FILE} ${R} "" ${BOOTSTRAP}
+		rm ${RES}*
 
 
 
@@ -344,5 +275,5 @@ Rscript --vanilla scripts/eval_subsamples_fixed_performance.R ${LOG_FILE} ${OUTD
 
 # clean up
 if [ "${REMOVE_SUBSAMPLES}" == "1" ]; then
-	rm ${SUBSAMPLE_STEM}*
+	rm -r ${SUBSAMPLE_STEM}*
 fi
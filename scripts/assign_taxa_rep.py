@@ -3,12 +3,18 @@
 
 # Replaces identifiers (obtained from FASTA headers) in a taxonomic assignment
 # with the taxonomy corresponding to the identifier.
+# The assignments are relabelled line by line while they are read. With -c,
+# the taxonomy is looked up in a sorted, memory-mapped index that is built
+# once per taxonomy file (e.g. per SILVA release) and reused afterwards.
 
 
 
 import sys
 from optparse import OptionParser
 
+from amplicon_store import IdTable
+from instrumentation import phase
+
 # Parse arguments from command line.
 def option_parser():
     des = """This program reads (1) a table of taxonomic assignments 
@@ -25,51 +31,60 @@ def option_parser():
     parser.add_option("-r", "--rep_taxonomy",
                       action = "store", dest = "rep_taxonomy")
 
+    parser.add_option("-c", "--cache",
+                      action = "store_true", dest = "cache", default = False,
+                      help = "look up the taxonomy in its sorted, memory-mapped "
+                      "index (<FILE>.compiled, created or updated if needed)")
+
     (options, args) = parser.parse_args()
-    return options.taxonomic_assignments, options.rep_taxonomy
+    return options.taxonomic_assignments, options.rep_taxonomy, options.cache
 
 
 # Parse taxonomy file (e.g. gg_13_8_otu/taxonomy/97_otu_taxonomy.txt)
-def parse_otu_taxonomy(otu_taxonomy):
+# or load its compiled form (see assignment_cache.py). Identical taxonomies
+# share a single string.
+def parse_otu_taxonomy(otu_taxonomy, cache = False):
+    if cache:
+        from assignment_cache import load_assignments
+        return load_assignments(otu_taxonomy, "taxonomy")
     id2taxonomy = dict()
-    with open(otu_taxonomy, "rU") as otu_taxonomy:
+    taxa = IdTable()
+    with open(otu_taxonomy, "r") as otu_taxonomy:
         for line in otu_taxonomy:
             id, taxon = line.split("\t")
             taxon = "".join(taxon.split(" "))
-            id2taxonomy[id] = taxon.rstrip()
+            id2taxonomy[id] = taxa.names[taxa.intern(taxon.rstrip())]
     return id2taxonomy
 
 
-# Parse taxonomic assignments
+# Parse taxonomic assignments (one at a time)
 def parse_assignments(taxonomic_assignments):
-    assignments = []
-    with open(taxonomic_assignments, "rU") as taxonomic_assignments:
+    with open(taxonomic_assignments, "r") as taxonomic_assignments:
         for line in taxonomic_assignments:
-            assignments.append(line.split("\t"))
-    return assignments
+            yield line.split("\t")
 
 
 # Look up the taxonomy and replace the identifier in the assignment with the taxonomy.
 def replace_identifiers(assignments, id2taxonomy):
     for a in assignments:
         a[1] = id2taxonomy[a[1]]
-    return assignments
+        yield a
 
 
 if __name__ == '__main__':
 
     ## Parse command-line arguments
-    taxonomic_assignments, rep_taxonomy = option_parser()
+    taxonomic_assignments, rep_taxonomy, cache = option_parser()
 
-    ## Parse taxonomy file and assignments
-    id2taxonomy = parse_otu_taxonomy(rep_taxonomy)
-    assignments = parse_assignments(taxonomic_assignments)
+    ## Parse (or load the index of) the taxonomy file
+    with phase("parse"):
+        id2taxonomy = parse_otu_taxonomy(rep_taxonomy, cache)
 
-    ## Replace the identifiers with the taxonomy
-    assignments = replace_identifiers(assignments, id2taxonomy)
-
-    ## Print relabelled assignments
-    for a in assignments:
-        sys.stdout.write("\t".join(a))
+    ## Replace the identifiers with the taxonomy and print the relabelled
+    ## assignments, while reading them
+    with phase("relabel"):
+        assignments = parse_assignments(taxonomic_assignments)
+        for a in replace_identifiers(assignments, id2taxonomy):
+            sys.stdout.write("\t".join(a))
 
-sys.exit(0)
+    sys.exit(0)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Compiles a table of taxonomic assignments (.spec.ualn file) or a
+# taxonomy file (e.g. gg_13_8_otu/taxonomy/97_otu_taxonomy.txt) into
+# NumPy arrays stored next to it (<FILENAME>.compiled): the sorted
+# identifiers, a taxon code and an abundance per identifier, and the
+# table of taxon names. The arrays are memory-mapped when loaded, so
+# that the many processes of an analysis share the parsed table instead
+# of parsing the text file again. The compiled table is rebuilt when the
+# source file changes (size, modification time and SHA-1 checksum).
+
+
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from optparse import OptionParser
+
+import numpy as np
+
+from amplicon_store import split_header
+
+
+FORMAT_VERSION = 1
+CACHE_SUFFIX = ".compiled"
+NO_ABUNDANCE = -1
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program compiles tables of taxonomic assignments
+    (ualn) or taxonomy files (taxonomy) into <FILENAME>.compiled, unless
+    an up-to-date compiled table already exists."""
+
+    parser = OptionParser(usage="usage: %prog [-k KIND] FILENAME...",
+                          description=desc)
+
+    parser.add_option("-k", "--kind",
+                      metavar="<KIND>",
+                      action="store",
+                      type="choice",
+                      choices=["ualn", "taxonomy"],
+                      default="ualn",
+                      dest="kind",
+                      help="kind of the input files (ualn or taxonomy). "
+                      "Default is ualn.")
+
+    (options, args) = parser.parse_args()
+    if not args:
+        parser.error("at least one input file is required")
+    return options.kind, args
+
+
+def as_bytes(text):
+    """
+    Encode a string for storage in a bytes array (no-op for Python 2
+    strings).
+    """
+    return text if isinstance(text, bytes) else text.encode("utf-8")
+
+
+def as_text(data):
+    """
+    Decode a string read from a bytes array (no-op for Python 2
+    strings).
+    """
+    return data if isinstance(data, str) else data.decode("utf-8")
+
+
+def parse_ualn_line(line):
+    """
+    Parse a line of taxonomic assignments (amplicon_abundance taxon ...).
+    """
+    amplicon, taxon = line.split()[0:2]
+    amplicon, abundance = split_header(amplicon)
+    return amplicon, abundance, taxon
+
+
+def parse_taxonomy_line(line):
+    """
+    Parse a line of a taxonomy file (identifier, tab, taxonomy).
+    """
+    identifier, taxon = line.split("\t")
+    taxon = "".join(taxon.split(" "))
+    return identifier, NO_ABUNDANCE, taxon.rstrip()
+
+
+LINE_PARSERS = {"ualn": parse_ualn_line, "taxonomy": parse_taxonomy_line}
+
+
+def source_signature(source):
+    """
+    Size and modification time of the source file.
+    """
+    status = os.stat(source)
+    return {"size": status.st_size, "mtime": status.st_mtime}
+
+
+def source_checksum(source, block_size=2**20):
+    """
+    SHA-1 checksum of the source file.
+    """
+    checksum = hashlib.sha1()
+    with open(source, "rb") as source:
+        for block in iter(lambda: source.read(block_size), b""):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def compile_assignments(source, kind, target):
+    """
+    Parse the source file and save its compiled form in the (existing)
+    target directory. For repeated identifiers, the last line wins.
+    """
+    parse_line = LINE_PARSERS[kind]
+    identifiers, codes, abundances = list(), list(), list()
+    taxa, taxon_codes = list(), dict()
+    with open(source, "r") as assignments:
+        for line in assignments:
+            identifier, abundance, taxon = parse_line(line)
+            code = taxon_codes.get(taxon)
+            if code is None:
+                code = taxon_codes[taxon] = len(taxa)
+                taxa.append(taxon)
+            identifiers.append(as_bytes(identifier))
+            codes.append(code)
+            abundances.append(abundance)
+
+    identifiers = np.array(identifiers, dtype=bytes)
+    order = np.argsort(identifiers, kind="mergesort")
+    identifiers = identifiers[order]
+    keep = np.ones(len(identifiers), dtype=bool)
+    keep[:-1] = identifiers[:-1] != identifiers[1:]
+    order = order[keep]
+
+    np.save(os.path.join(target, "ids.npy"), identifiers[keep])
+    np.save(os.path.join(target, "taxon_codes.npy"),
+            np.array(codes, dtype=np.int32)[order])
+    np.save(os.path.join(target, "abundances.npy"),
+            np.array(abundances, dtype=np.int64)[order])
+    np.save(os.path.join(target, "taxa.npy"),
+            np.array([as_bytes(taxon) for taxon in taxa], dtype=bytes))
+
+
+def read_metadata(target):
+    """
+    Read the metadata of a compiled table (None if missing or broken).
+    """
+    try:
+        with open(os.path.join(target, "meta.json"), "r") as metadata:
+            return json.load(metadata)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_metadata(target, metadata):
+    """
+    Write the metadata of a compiled table (atomically).
+    """
+    path = os.path.join(target, "meta.json")
+    with open(path + ".tmp", "w") as output:
+        json.dump(metadata, output, sort_keys=True)
+    os.rename(path + ".tmp", path)
+
+
+def is_up_to_date(source, kind, target):
+    """
+    Check whether the compiled table matches the source file. A mere
+    change of modification time is accepted (and recorded) if the
+    checksum is unchanged.
+    """
+    metadata = read_metadata(target)
+    if metadata is None or metadata.get("version") != FORMAT_VERSION or \
+       metadata.get("kind") != kind:
+        return False
+    signature = source_signature(source)
+    if metadata["size"] != signature["size"]:
+        return False
+    if metadata["mtime"] == signature["mtime"]:
+        return True
+    if metadata["sha1"] != source_checksum(source):
+        return False
+    metadata.update(signature)
+    write_metadata(target, metadata)
+    return True
+
+
+def update_cache(source, kind="ualn"):
+    """
+    Compile the source file unless an up-to-date compiled table exists
+    and return the directory of the compiled table. The new table is
+    built in a temporary directory and then moved in place, so that
+    concurrent readers never see a partial table.
+    """
+    target = source + CACHE_SUFFIX
+    if is_up_to_date(source, kind, target):
+        return target
+    signature = source_signature(source)
+    temporary = tempfile.mkdtemp(prefix=os.path.basename(target) + ".",
+                                 dir=os.path.dirname(os.path.abspath(target)))
+    try:
+        compile_assignments(source, kind, temporary)
+        metadata = {"version": FORMAT_VERSION, "kind": kind,
+                    "sha1": source_checksum(source)}
+        metadata.update(signature)
+        write_metadata(temporary, metadata)
+        if os.path.isdir(target):
+            shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.rename(temporary, target)
+        except OSError:
+            # another process has just installed its own compiled table
+            if not is_up_to_date(source, kind, target):
+                raise
+    finally:
+        if os.path.isdir(temporary):
+            shutil.rmtree(temporary, ignore_errors=True)
+    return target
+
+
+class CompiledAssignments(object):
+    """
+    Read-only mapping from identifiers to taxonomic assignments, backed
+    by the memory-mapped arrays of a compiled table. Values are
+    (abundance, taxon) pairs for tables of taxonomic assignments, and
+    taxa for taxonomy files, as in the dictionaries built by
+    confusion_table.py and assign_taxa_rep.py.
+    """
+
+    def __init__(self, target, kind):
+        self.kind = kind
+        load = lambda name: np.load(os.path.join(target, name + ".npy"),
+                                    mmap_mode="r")
+        self.ids = load("ids")
+        self.taxon_codes = load("taxon_codes")
+        self.abundances = load("abundances")
+        self.taxa = [as_text(taxon) for taxon in load("taxa")]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, identifier):
+        return self.find(identifier) >= 0
+
+    def __getitem__(self, identifier):
+        i = self.find(identifier)
+        if i < 0:
+            raise KeyError(identifier)
+        taxon = self.taxa[self.taxon_codes[i]]
+        if self.kind == "taxonomy":
+            return taxon
+        return int(self.abundances[i]), taxon
+
+    def get(self, identifier, default=None):
+        try:
+            return self[identifier]
+        except KeyError:
+            return default
+
+    def find(self, identifier):
+        """
+        Position of the identifier in the table (-1 if absent).
+        """
+        key = as_bytes(identifier)
+        i = int(np.searchsorted(self.ids, key))
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return -1
+
+    def positions(self, identifiers):
+        """
+        Positions of several identifiers in the table at once (-1 if
+        absent).
+        """
+        keys = np.array([as_bytes(identifier) for identifier in identifiers],
+                        dtype=bytes)
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self.ids) or not len(keys):
+            return positions
+        candidates = np.minimum(np.searchsorted(self.ids, keys),
+                                len(self.ids) - 1)
+        found = self.ids[candidates] == keys
+        positions[found] = candidates[found]
+        return positions
+
+    def lookup(self, identifiers):
+        """
+        Taxon codes of several identifiers at once (-1 if absent).
+        """
+        positions = self.positions(identifiers)
+        codes = np.full(len(positions), -1, dtype=np.int32)
+        found = positions >= 0
+        codes[found] = self.taxon_codes[positions[found]]
+        return codes
+
+    def values(self, identifiers):
+        """
+        Values of several identifiers at once (None if absent), as
+        __getitem__ would return them.
+        """
+        positions = self.positions(identifiers)
+        found = positions >= 0
+        taxa = [self.taxa[code] for code in
+                self.taxon_codes[positions[found]].tolist()]
+        if self.kind == "ualn":
+            taxa = list(zip(self.abundances[positions[found]].tolist(),
+                            taxa))
+        values = [None] * len(positions)
+        for i, value in zip(np.flatnonzero(found).tolist(), taxa):
+            values[i] = value
+        return values
+
+
+def load_assignments(source, kind="ualn"):
+    """
+    Load the compiled form of a table of taxonomic assignments (ualn) or
+    of a taxonomy file (taxonomy), compiling it first if needed.
+    """
+    return CompiledAssignments(update_cache(source, kind), kind)
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    kind, sources = option_parser()
+
+    ## Compile the input files (if needed)
+    for source in sources:
+        print(update_cache(source, kind), file=sys.stderr)
+
+    sys.exit(0)
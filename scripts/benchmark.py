@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Micro-benchmarks of the Python stages of the analyses, on generated
+# inputs of increasing size (number of amplicons). Each benchmark runs in
+# a fresh process, so that its peak memory (maximum resident set size)
+# can be measured in isolation. Only the benchmarked stage is timed, the
+# peak memory covers the whole process (including loading the inputs).
+# The results are written as JSON and can be compared with a saved
+# baseline (relative throughput and peak memory, regressions beyond a
+# tolerance are reported and make the program fail).
+
+
+
+from __future__ import division, print_function
+
+import json
+import os
+import platform
+import random
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+BENCHMARKS = ["parse_taxonomy", "OTU_parser", "swarm_parse", "graph_breaker",
+              "removeN", "assign_taxa_rep", "metrics"]
+
+SWARM_SIZE = 1000  # amplicons per swarm in the graph_breaker benchmark
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program benchmarks the Python stages of the analyses
+    on generated inputs and reports their throughput (amplicons per
+    second) and peak memory as JSON."""
+
+    parser = OptionParser(usage="usage: %prog [options]",
+                          description=desc)
+
+    parser.add_option("-s", "--sizes",
+                      metavar="<LIST>",
+                      action="store",
+                      default="10000,100000,1000000",
+                      dest="sizes",
+                      help="comma-separated list of input sizes (number of "
+                      "amplicons), up to 10000000 and beyond. Default is "
+                      "10000,100000,1000000.")
+
+    parser.add_option("-b", "--benchmarks",
+                      metavar="<LIST>",
+                      action="store",
+                      default=",".join(BENCHMARKS),
+                      dest="benchmarks",
+                      help="comma-separated list of benchmarks. Default is "
+                      + ",".join(BENCHMARKS) + ".")
+
+    parser.add_option("-o", "--output",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="output",
+                      help="write the results to <FILENAME> instead of "
+                      "stdout.")
+
+    parser.add_option("-c", "--compare",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="baseline",
+                      help="compare the results with the baseline saved in "
+                      "<FILENAME> (output of a previous run).")
+
+    parser.add_option("-t", "--tolerance",
+                      metavar="<FLOAT>",
+                      action="store",
+                      type="float",
+                      default=0.2,
+                      dest="tolerance",
+                      help="relative loss of throughput or gain of peak "
+                      "memory considered as a regression. Default is 0.2.")
+
+    parser.add_option("-w", "--workdir",
+                      metavar="<DIRECTORY>",
+                      action="store",
+                      dest="workdir",
+                      help="keep the generated inputs in <DIRECTORY> and "
+                      "reuse them (temporary directory by default).")
+
+    parser.add_option("--child",
+                      action="store_true",
+                      default=False,
+                      dest="child",
+                      help="(internal) run one benchmark: NAME SIZE "
+                      "DIRECTORY.")
+
+    (options, args) = parser.parse_args()
+    benchmarks = options.benchmarks.split(",")
+    for benchmark in benchmarks:
+        if benchmark not in BENCHMARKS:
+            parser.error("unknown benchmark: " + benchmark)
+    sizes = [int(size) for size in options.sizes.split(",")]
+    return (sizes, benchmarks, options.output, options.baseline,
+            options.tolerance, options.workdir, options.child, args)
+
+
+#*****************************************************************************#
+#                                                                             #
+#                                    Inputs                                   #
+#                                                                             #
+#*****************************************************************************#
+
+def random_sequences(count, length, rng):
+    """
+    Random nucleotide sequences of the given length (about 1% of them
+    contain an N), drawn from rng: each nucleotide is a hexadecimal
+    digit of a random integer.
+    """
+    table = bytearray(b"N" * 256)
+    for i, digit in enumerate(bytearray(b"0123456789abcdef")):
+        table[digit] = bytearray(b"ACGT")[i % 4]
+    table = bytes(table)
+    for i in range(count):
+        sequence = ("%0*x" % (length, rng.getrandbits(4 * length))
+                    ).encode("ascii").translate(table)
+        if rng.random() < 0.01:
+            position = rng.randrange(length)
+            sequence = sequence[:position] + b"N" + sequence[position + 1:]
+        yield sequence.decode("ascii")
+
+
+def generate_inputs(size, directory, seed=1):
+    """
+    Write the inputs of all benchmarks for the given number of
+    amplicons (fasta file, swarms, taxonomic assignments against
+    reference identifiers, reference taxonomy and relabelled
+    assignments) and return their paths.
+    """
+    stem = os.path.join(directory, "bench_%d" % size)
+    paths = dict((kind, stem + "." + kind)
+                 for kind in ["fasta", "swarms", "assignments",
+                              "taxonomy", "spec.ualn"])
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+    rng = random.Random(seed)
+    references = max(10, size // 100)
+    lineages = ["k__Bacteria;p__P%d;c__C%d;o__O%d;f__F%d;g__G%d;s__S%d" %
+                (i % 7, i % 23, i % 61, i % 149, i % 401, i)
+                for i in range(references)]
+    abundances = [int(rng.paretovariate(1.1)) for i in range(size)]
+    abundances.sort(reverse=True)
+    names = ["a%d_%d" % (i, abundance) for i, abundance in enumerate(abundances)]
+
+    with open(paths["fasta"], "w") as fasta:
+        for name, sequence in zip(names, random_sequences(size, 120, rng)):
+            print(">", name, "\n", sequence, sep="", file=fasta)
+
+    with open(paths["swarms"], "w") as swarms:
+        order = list(range(size))
+        rng.shuffle(order)
+        start = 0
+        while start < size:
+            end = min(size, start + 1 + int(rng.expovariate(0.1)))
+            members = sorted(order[start:end])
+            print(" ".join(names[i] for i in members), file=swarms)
+            start = end
+
+    with open(paths["taxonomy"], "w") as taxonomy:
+        for i, lineage in enumerate(lineages):
+            print("ref%d" % i, lineage.replace(";", "; "), sep="\t",
+                  file=taxonomy)
+
+    with open(paths["assignments"], "w") as assignments:
+        with open(paths["spec.ualn"], "w") as ualn:
+            for i, name in enumerate(names):
+                if rng.random() < 0.1:
+                    continue  # unassigned
+                reference = min(references - 1, int(rng.expovariate(0.02)))
+                print(name, "ref%d" % reference, "99.2", "120", "1", "0", "1",
+                      "120", "1", "120", "1e-50", "220", sep="\t",
+                      file=assignments)
+                print(name, lineages[reference], sep="\t", file=ualn)
+    return paths
+
+
+def swarm_graphs(size, seed=1):
+    """
+    Generate swarm graphs (trees of about SWARM_SIZE amplicons, with a
+    few abundant peaks separated by low valleys), in the structures
+    expected by swarm_breaker.build_graph and graph_breaker.
+    """
+    rng = random.Random(seed)
+    graphs = list()
+    for first in range(0, size, SWARM_SIZE):
+        count = min(SWARM_SIZE, size - first)
+        abundances = sorted((int(rng.paretovariate(0.8))
+                             for i in range(count)), reverse=True)
+        abundances[0] = max(abundances[0], 1000)  # at least one peak
+        amplicons = [("s%d" % (first + i), abundance)
+                     for i, abundance in enumerate(abundances)]
+        graph_data = [[amplicons[rng.randrange(max(0, i - 50), i)][0],
+                       amplicons[i][0], "1"] for i in range(1, count)]
+        graphs.append((amplicons, graph_data))
+    return graphs
+
+
+#*****************************************************************************#
+#                                                                             #
+#                                  Benchmarks                                 #
+#                                                                             #
+#*****************************************************************************#
+
+def run_script(script, arguments, output=os.devnull):
+    """
+    Run a script of the repository in this process (stdout redirected).
+    """
+    argv, stdout = sys.argv, sys.stdout
+    sys.argv = [script] + arguments
+    try:
+        with open(output, "w") as sys.stdout:
+            runpy.run_path(os.path.join(SCRIPTS, script), run_name="__main__")
+    except SystemExit:
+        pass
+    finally:
+        sys.argv, sys.stdout = argv, stdout
+
+
+def run_benchmark(name, size, directory):
+    """
+    Run one benchmark and return the duration of its timed part.
+    """
+    sys.path.insert(0, SCRIPTS)
+    paths = generate_inputs(size, directory)
+
+    if name == "parse_taxonomy":
+        from confusion_table import parse_taxonomy
+        start = time.time()
+        parse_taxonomy(paths["spec.ualn"])
+        return time.time() - start
+
+    if name == "OTU_parser":
+        from confusion_table import (OTU_parser, dereplicate_taxa,
+                                     parse_taxonomy, split_amplicons)
+        amplicon2taxonomy, taxa = parse_taxonomy(paths["spec.ualn"])
+        taxa_list, taxa_dict = dereplicate_taxa(taxa)
+        start = time.time()
+        with open(paths["swarms"], "r") as swarms:
+            for line in swarms:
+                OTU_parser(taxa_dict, amplicon2taxonomy, split_amplicons(line))
+        return time.time() - start
+
+    if name == "swarm_parse":
+        from swarm_breaker import swarm_parse
+        start = time.time()
+        swarm_parse(paths["swarms"])
+        return time.time() - start
+
+    if name == "graph_breaker":
+        from swarm_breaker import build_graph, graph_breaker, swarmer
+        graphs = swarm_graphs(size)
+        stderr = sys.stderr
+        with open(os.devnull, "w") as sys.stderr:
+            start = time.time()
+            for amplicons, graph_data in graphs:
+                all_amplicons = dict((amplicon, (abundance, ""))
+                                     for amplicon, abundance in amplicons)
+                graph = build_graph(amplicons, graph_data)
+                seeds, graph = graph_breaker(amplicons, graph, all_amplicons)
+                for seed in seeds:
+                    swarmer(graph, seed)
+            duration = time.time() - start
+        sys.stderr = stderr
+        return duration
+
+    if name == "removeN":
+        output = os.path.join(directory, "bench_%d.removeN.fasta" % size)
+        start = time.time()
+        run_script("removeN.py", [paths["fasta"], output])
+        duration = time.time() - start
+        os.remove(output)
+        return duration
+
+    if name == "assign_taxa_rep":
+        start = time.time()
+        run_script("assign_taxa_rep.py", ["-t", paths["assignments"],
+                                          "-r", paths["taxonomy"]])
+        return time.time() - start
+
+    if name == "metrics":
+        from cluster_metrics import clustering_metrics
+        start = time.time()
+        clustering_metrics([paths["spec.ualn"]], paths["swarms"])
+        return time.time() - start
+
+
+def measure(name, size, directory):
+    """
+    Run one benchmark in a fresh process and collect its duration and
+    peak memory (kilobytes on Linux).
+    """
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                                "--child", name, str(size), directory],
+                               stdout=subprocess.PIPE)
+    output = process.stdout.read()
+    process.stdout.close()
+    pid, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.WEXITSTATUS(status)
+    if process.returncode:
+        raise RuntimeError("benchmark %s failed on %d amplicons" % (name, size))
+    seconds = json.loads(output.decode("ascii"))["seconds"]
+    return {"benchmark": name, "size": size, "seconds": seconds,
+            "throughput": size / seconds if seconds else None,
+            "peak_rss_kb": usage.ru_maxrss}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare the results with a baseline: print the relative throughput
+    and peak memory of each benchmark, and return the number of
+    regressions.
+    """
+    reference = dict(((result["benchmark"], result["size"]), result)
+                     for result in baseline["results"])
+    regressions = 0
+    print("benchmark", "size", "throughput_ratio", "peak_rss_ratio", "status",
+          sep="\t", file=sys.stderr)
+    for result in results:
+        old = reference.get((result["benchmark"], result["size"]))
+        if old is None or not old["throughput"] or not result["throughput"]:
+            continue
+        speed = result["throughput"] / old["throughput"]
+        memory = result["peak_rss_kb"] / old["peak_rss_kb"]
+        status = "ok"
+        if speed < 1 - tolerance or memory > 1 + tolerance:
+            status = "REGRESSION"
+            regressions += 1
+        print(result["benchmark"], result["size"], "%.3f" % speed,
+              "%.3f" % memory, status, sep="\t", file=sys.stderr)
+    return regressions
+
+
+#*****************************************************************************#
+#                                                                             #
+#                                     Body                                    #
+#                                                                             #
+#*****************************************************************************#
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    (sizes, benchmarks, output, baseline, tolerance, workdir, child,
+     args) = option_parser()
+
+    ## Child process: run a single benchmark
+    if child:
+        name, size, directory = args
+        print(json.dumps({"seconds": run_benchmark(name, int(size),
+                                                   directory)}))
+        sys.exit(0)
+
+    ## Generate the inputs and run the benchmarks
+    directory = workdir or tempfile.mkdtemp(prefix="benchmark.")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    try:
+        results = list()
+        for size in sizes:
+            generate_inputs(size, directory)
+            for name in benchmarks:
+                results.append(measure(name, size, directory))
+                print(name, size, "%.3fs" % results[-1]["seconds"],
+                      sep="\t", file=sys.stderr)
+    finally:
+        if not workdir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    ## Write the results (and compare them with the baseline)
+    report = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "results": results}
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(report, output_file, indent=1, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=1, sort_keys=True))
+    if baseline:
+        with open(baseline, "r") as baseline_file:
+            if compare(results, json.load(baseline_file), tolerance):
+                sys.exit(1)
+
+    sys.exit(0)
@@ -0,0 +1,667 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Computes the clustering metrics of CValidate.pl (recall, precision,
+# normalised mutual information, Rand index and adjusted Rand index)
+# from the non-zero cells of a confusion table (OTUs vs taxa).
+# The confusion table is either read from a file (dense or sparse output
+# of confusion_table.py) or built in memory from a clustering file (in any
+# of the formats of clustering_readers.py) and taxonomic assignments,
+# without writing it.
+#
+# With -b, the uncertainty of the metrics is estimated by bootstrap: the
+# amplicons of the confusion table are resampled (multinomial draws over
+# its non-zero cells, OTUs and taxa unchanged), and the percentile
+# confidence interval of each metric over the replicates is printed after
+# the metrics (columns <metric>_low and <metric>_high). The replicates are
+# computed in batches, each batch as one array of counts.
+#
+# With --online, the metrics are accumulated while the clustering is read
+# (running marginals and pair counts, see OnlineMetrics), so that the
+# confusion table is never held in memory and the clustering can be piped
+# in ("-s -" for the standard input, or a named pipe) as it is produced.
+
+
+
+from __future__ import division, print_function
+
+import json
+import math
+import os
+import sys
+import tempfile
+from array import array
+from collections import namedtuple
+from optparse import OptionParser
+
+import numpy as np
+
+from amplicon_store import read_mask
+from clustering_readers import READERS, read_clustering
+from confusion_table import (RANKS, OTU_counter, assigned_OTUs,
+                             column_counter, parse_taxonomy, taxa_tables)
+from instrumentation import phase
+
+
+METRICS = ["recall", "precision", "nmi", "randindex", "adjrandindex"]
+
+# Maximal number of cells (replicates * non-zero cells) of a bootstrap batch
+BOOTSTRAP_CELLS = 10 ** 7
+
+# Non-zero cells of a confusion table (0-based OTU and taxon numbers)
+Contingency = namedtuple("Contingency", ["otus", "taxa", "counts"])
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program computes recall, precision, NMI, Rand index
+    and adjusted Rand index of a clustering, either from a confusion
+    table (OTUs vs taxa) or from a table of taxonomic assignments and
+    a clustering file (swarm, DNACLUST, Sumaclust, CD-HIT or USEARCH /
+    VSEARCH .uc). The values are printed as one CSV line (one line per
+    table of taxonomic assignments, in order)."""
+
+    parser = OptionParser(usage="usage: %prog -t FILENAME -s FILENAME | -c FILENAME",
+                          description=desc)
+
+    parser.add_option("-t", "--taxonomic_assignments",
+                      metavar="<FILENAME>",
+                      action="append",
+                      dest="taxonomic_assignments",
+                      help="set <FILENAME> as taxonomic assignments "
+                      "(repeatable).")
+
+    parser.add_option("-s", "--swarm_OTUs",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="swarm_OTUs",
+                      help="set <FILENAME> as clustering.")
+
+    parser.add_option("-i", "--input_format",
+                      metavar="<FORMAT>",
+                      action="store",
+                      type="choice",
+                      choices=sorted(READERS),
+                      dest="clustering_format",
+                      help="format of the clustering (" +
+                      ", ".join(sorted(READERS)) + "). Default is guessed "
+                      "from the extension (.uc, .clstr...), else swarm.")
+
+    parser.add_option("-c", "--confusion_table",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="confusion_table",
+                      help="set <FILENAME> as confusion table.")
+
+    parser.add_option("-f", "--format",
+                      metavar="<FORMAT>",
+                      action="store",
+                      type="choice",
+                      choices=["dense", "sparse"],
+                      default="dense",
+                      dest="table_format",
+                      help="format of the confusion table (dense or sparse). "
+                      "Default is dense.")
+
+    parser.add_option("-m", "--metrics",
+                      metavar="<LIST>",
+                      action="store",
+                      default=",".join(METRICS),
+                      dest="metrics",
+                      help="comma-separated list of the metrics to print. "
+                      "Default is " + ",".join(METRICS) + ".")
+
+    parser.add_option("-r", "--ranks",
+                      metavar="<LIST>",
+                      action="store",
+                      dest="ranks",
+                      help="comma-separated list of ranks (" +
+                      ", ".join(RANKS) + "): one line per table of "
+                      "taxonomic assignments and rank (all ranks of a "
+                      "table, then the next table), with the "
+                      "';'-separated lineages truncated at the rank. "
+                      "Default is the whole lineage.")
+
+    parser.add_option("-b", "--bootstrap",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=0,
+                      dest="replicates",
+                      help="also print the bootstrap confidence interval of "
+                      "each metric (<metric>_low and <metric>_high columns, "
+                      "after the metrics), from <INTEGER> replicates. "
+                      "Default is 0 (no intervals).")
+
+    parser.add_option("--confidence",
+                      metavar="<FLOAT>",
+                      action="store",
+                      type="float",
+                      default=0.95,
+                      dest="confidence",
+                      help="confidence level of the bootstrap intervals. "
+                      "Default is 0.95.")
+
+    parser.add_option("--seed",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      dest="seed",
+                      help="seed of the bootstrap draws. Default is random.")
+
+    parser.add_option("--online",
+                      action="store_true",
+                      default=False,
+                      dest="online",
+                      help="compute the metrics while reading the clustering "
+                      "(-t and -s, - for the standard input), without "
+                      "building the confusion table (not with -b or "
+                      "--result_cache).")
+
+    parser.add_option("--cache",
+                      action="store_true",
+                      default=False,
+                      dest="cache",
+                      help="read the taxonomic assignments from their "
+                      "compiled form (<FILENAME>.compiled, created or "
+                      "updated if needed).")
+
+    parser.add_option("--result_cache",
+                      metavar="<DIRECTORY>",
+                      action="store",
+                      dest="result_cache",
+                      help="reuse the metrics stored in <DIRECTORY> for the "
+                      "same clustering and taxonomic assignments, or store "
+                      "them there (see result_cache.py).")
+
+    parser.add_option("--mask",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="mask",
+                      help="restrict the taxonomic assignments (of the "
+                      "whole data set) to the subsample listed in "
+                      "<FILENAME> (FastaSampler -m).")
+
+    (options, args) = parser.parse_args()
+    if not options.confusion_table and not (options.taxonomic_assignments and
+                                            options.swarm_OTUs):
+        parser.error("either -c or both -t and -s are required")
+    metrics = options.metrics.split(",")
+    for metric in metrics:
+        if metric not in METRICS:
+            parser.error("unknown metric: " + metric)
+    ranks = options.ranks.split(",") if options.ranks else None
+    for rank in ranks or list():
+        if rank not in RANKS:
+            parser.error("unknown rank: " + rank)
+    if options.replicates < 0 or not 0 < options.confidence < 1:
+        parser.error("option -b must be positive and --confidence "
+                     "between 0 and 1")
+    if options.online and (options.confusion_table or options.replicates or
+                           options.result_cache):
+        parser.error("option --online excludes -c, -b and --result_cache")
+    if options.result_cache and options.swarm_OTUs == "-":
+        parser.error("option --result_cache needs a clustering file")
+    bootstrap = (options.replicates, options.confidence, options.seed)
+    return (options.taxonomic_assignments, options.swarm_OTUs,
+            options.clustering_format, options.confusion_table,
+            options.table_format, metrics, options.cache,
+            options.result_cache, ranks, bootstrap, options.online,
+            options.mask)
+
+
+def contingency(otus, taxa, counts):
+    """
+    Build a contingency from the coordinates and counts of the cells
+    (empty cells are dropped).
+    """
+    otus = np.asarray(otus, dtype=np.int64)
+    taxa = np.asarray(taxa, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    non_zero = counts > 0
+    return Contingency(otus[non_zero], taxa[non_zero], counts[non_zero])
+
+
+def parse_confusion_table(confusion_table, table_format):
+    """
+    Parse a confusion table written by confusion_table.py.
+    """
+    otus, taxa, counts = array("l"), array("l"), array("l")
+    with open(confusion_table, "r") as confusion_table:
+        next(confusion_table)  # header
+        for i, line in enumerate(confusion_table):
+            if table_format == "sparse":
+                otu, taxon, count = line.split("\t")
+                otus.append(int(otu) - 1)
+                taxa.append(int(taxon) - 1)
+                counts.append(int(count))
+            else:
+                row = np.array(line.split("\t")[1:], dtype=np.int64)
+                columns = np.flatnonzero(row)
+                otus.extend([i] * len(columns))
+                taxa.extend(columns.tolist())
+                counts.extend(row[columns].tolist())
+    return contingency(otus, taxa, counts)
+
+
+def parse_ground_truths(taxonomic_assignments, cache=False, ranks=None,
+                        mask=None):
+    """
+    Parse the tables of taxonomic assignments, as (amplicon2taxonomy,
+    list of taxa_dict) pairs, one taxa_dict per rank, restricted to the
+    subsample listed in the mask file if given.
+    """
+    mask = read_mask(mask) if mask else None
+    ground_truths = list()
+    for assignments in taxonomic_assignments:
+        amplicon2taxonomy, taxa = parse_taxonomy(assignments, cache,
+                                                 mask=mask)
+        ground_truths.append((amplicon2taxonomy,
+                              [taxa_dict for taxa_list, taxa_dict
+                               in taxa_tables(taxa, ranks)]))
+    return ground_truths
+
+
+def OTU_columns(ground_truths, swarm_OTUs, clustering_format=None):
+    """
+    Iterate over the OTUs of a clustering, as lists of the non-zero cells
+    of their rows in the confusion tables (column: count dictionaries,
+    one per ground truth and rank, see confusion_table.py). The
+    clustering file is read only once (see clustering_readers.py for the
+    formats), and the taxa of each OTU are counted once per ground truth
+    for all ranks.
+    """
+    for amplicons, assignments in assigned_OTUs(
+            [amplicon2taxonomy for amplicon2taxonomy, taxa_dicts
+             in ground_truths],
+            read_clustering(swarm_OTUs, clustering_format)):
+        rows = list()
+        for (amplicon2taxonomy, taxa_dicts), table_assignments in zip(
+                ground_truths, assignments):
+            OTU_abundance_per_taxa = OTU_counter(amplicon2taxonomy, amplicons,
+                                                 table_assignments)
+            rows.extend(column_counter(taxa_dict, OTU_abundance_per_taxa)
+                        for taxa_dict in taxa_dicts)
+        yield rows
+
+
+def clustering_contingencies(ground_truths, swarm_OTUs,
+                             clustering_format=None):
+    """
+    Build the confusion tables of a clustering in memory, one per ground
+    truth and rank (see OTU_columns).
+    """
+    cells = [(array("l"), array("l"), array("l"))
+             for amplicon2taxonomy, taxa_dicts in ground_truths
+             for taxa_dict in taxa_dicts]
+    for i, rows in enumerate(OTU_columns(ground_truths, swarm_OTUs,
+                                         clustering_format)):
+        for columns, (otus, taxa, counts) in zip(rows, cells):
+            for column, abundance in columns.items():
+                otus.append(i)
+                taxa.append(column - 1)
+                counts.append(abundance)
+    return [contingency(otus, taxa, counts) for otus, taxa, counts in cells]
+
+
+def choose2(n):
+    """
+    Number of pairs among n elements (element-wise).
+    """
+    return n * (n - 1) // 2
+
+
+def compute_metrics(table):
+    """
+    Compute all metrics (dictionary) from the non-zero cells and the
+    marginals of the table.
+    """
+    otus, taxa, counts = table
+    otu_totals = np.bincount(otus, weights=counts).astype(np.int64)
+    taxon_totals = np.bincount(taxa, weights=counts).astype(np.int64)
+    total = int(counts.sum())
+
+    # largest cell of each OTU (precision) and of each taxon (recall)
+    otu_maxima = np.zeros(len(otu_totals), dtype=np.int64)
+    np.maximum.at(otu_maxima, otus, counts)
+    taxon_maxima = np.zeros(len(taxon_totals), dtype=np.int64)
+    np.maximum.at(taxon_maxima, taxa, counts)
+
+    # entropies of both partitions and mutual information
+    otu_frequencies = otu_totals[otu_totals > 0] / total
+    taxon_frequencies = taxon_totals[taxon_totals > 0] / total
+    otu_entropy = -np.sum(otu_frequencies * np.log(otu_frequencies))
+    taxon_entropy = -np.sum(taxon_frequencies * np.log(taxon_frequencies))
+    expected_counts = (otu_totals[otus].astype(np.float64) *
+                       taxon_totals[taxa]) / total
+    mutual_information = np.sum(counts * np.log(counts / expected_counts)) / total
+
+    # pair counts (exact integers)
+    pairs = choose2(total)
+    otu_pairs = int(choose2(otu_totals).sum())
+    taxon_pairs = int(choose2(taxon_totals).sum())
+    cell_pairs = int(choose2(counts).sum())
+    expected = (taxon_pairs * otu_pairs) / pairs
+
+    return {"recall": int(taxon_maxima.sum()) / total,
+            "precision": int(otu_maxima.sum()) / total,
+            "nmi": 2.0 * mutual_information / (otu_entropy + taxon_entropy),
+            "randindex": (pairs - otu_pairs - taxon_pairs + 2 * cell_pairs) / pairs,
+            "adjrandindex": ((cell_pairs - expected) /
+                             (0.5 * (otu_pairs + taxon_pairs) - expected))}
+
+
+class OnlineMetrics(object):
+    """
+    Running marginals and pair counts of a confusion table, filled one
+    OTU at a time (memory in O(taxa), the rows are not kept). The
+    metrics are the same as those of compute_metrics.
+    """
+
+    def __init__(self, taxa):
+        self.taxon_totals = [0] * taxa
+        self.taxon_maxima = [0] * taxa
+        self.total = 0
+        self.otu_maxima = 0
+        self.otu_pairs = 0
+        self.cell_pairs = 0
+        self.otu_terms = 0.0  # sums of n log(n) (entropies and NMI)
+        self.cell_terms = 0.0
+
+    def add(self, columns):
+        """
+        Add the row of an OTU (column: count dictionary of its non-zero
+        cells, 1-based columns).
+        """
+        otu_total = 0
+        for column, count in columns.items():
+            otu_total += count
+            self.cell_pairs += choose2(count)
+            self.cell_terms += count * math.log(count)
+            self.taxon_totals[column - 1] += count
+            if count > self.taxon_maxima[column - 1]:
+                self.taxon_maxima[column - 1] = count
+        if otu_total:
+            self.total += otu_total
+            self.otu_maxima += max(columns.values())
+            self.otu_pairs += choose2(otu_total)
+            self.otu_terms += otu_total * math.log(otu_total)
+
+    def metrics(self):
+        """
+        Compute all metrics (dictionary) from the accumulated values, in
+        O(taxa).
+        """
+        total = self.total
+        taxon_pairs = sum(choose2(n) for n in self.taxon_totals)
+        taxon_terms = sum(n * math.log(n) for n in self.taxon_totals if n)
+        otu_entropy = math.log(total) - self.otu_terms / total
+        taxon_entropy = math.log(total) - taxon_terms / total
+        mutual_information = (math.log(total) + (self.cell_terms -
+                                                 self.otu_terms -
+                                                 taxon_terms) / total)
+        pairs = choose2(total)
+        expected = (taxon_pairs * self.otu_pairs) / pairs
+        return {"recall": sum(self.taxon_maxima) / total,
+                "precision": self.otu_maxima / total,
+                "nmi": 2.0 * mutual_information / (otu_entropy + taxon_entropy),
+                "randindex": (pairs - self.otu_pairs - taxon_pairs +
+                              2 * self.cell_pairs) / pairs,
+                "adjrandindex": ((self.cell_pairs - expected) /
+                                 (0.5 * (self.otu_pairs + taxon_pairs) -
+                                  expected))}
+
+
+def cell_groups(labels):
+    """
+    Order of the cells by OTU (or taxon) and start of each OTU in that
+    order (for reduceat).
+    """
+    order = np.argsort(labels, kind="mergesort")
+    labels = labels[order]
+    starts = np.flatnonzero(np.concatenate(([True],
+                                            labels[1:] != labels[:-1])))
+    return order, starts
+
+
+def marginals(draws, groups):
+    """
+    Totals and largest cells of the OTUs (or taxa) of each replicate.
+    """
+    order, starts = groups
+    cells = draws[:, order]
+    return (np.add.reduceat(cells, starts, axis=1),
+            np.maximum.reduceat(cells, starts, axis=1))
+
+
+def xlogx(counts):
+    """
+    Sum of n log(n) over each row of counts (0 log(0) = 0).
+    """
+    return np.sum(counts * np.log(np.maximum(counts, 1)), axis=1)
+
+
+def replicate_metrics(draws, otu_groups, taxon_groups, total):
+    """
+    Compute all metrics (dictionary of arrays) of a batch of replicates
+    (one row of cell counts per replicate, same total), with the same
+    formulas as compute_metrics.
+    """
+    otu_totals, otu_maxima = marginals(draws, otu_groups)
+    taxon_totals, taxon_maxima = marginals(draws, taxon_groups)
+
+    # entropies and mutual information, from the sums of n log(n)
+    cell_terms, otu_terms = xlogx(draws), xlogx(otu_totals)
+    taxon_terms = xlogx(taxon_totals)
+    otu_entropy = np.log(total) - otu_terms / total
+    taxon_entropy = np.log(total) - taxon_terms / total
+    mutual_information = (np.log(total) +
+                          (cell_terms - otu_terms - taxon_terms) / total)
+
+    # pair counts (exact integers, as floats beyond)
+    pairs = choose2(total)
+    otu_pairs = choose2(otu_totals).sum(axis=1).astype(np.float64)
+    taxon_pairs = choose2(taxon_totals).sum(axis=1).astype(np.float64)
+    cell_pairs = choose2(draws).sum(axis=1).astype(np.float64)
+    expected = (taxon_pairs * otu_pairs) / pairs
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"recall": taxon_maxima.sum(axis=1) / total,
+                "precision": otu_maxima.sum(axis=1) / total,
+                "nmi": 2.0 * mutual_information / (otu_entropy + taxon_entropy),
+                "randindex": (pairs - otu_pairs - taxon_pairs + 2 * cell_pairs) / pairs,
+                "adjrandindex": ((cell_pairs - expected) /
+                                 (0.5 * (otu_pairs + taxon_pairs) - expected))}
+
+
+def bootstrap_metrics(table, replicates, confidence=0.95, seed=None):
+    """
+    Compute the bootstrap confidence intervals of all metrics (dictionary
+    with <metric>_low and <metric>_high keys) from replicates of the
+    table, drawn by resampling its amplicons (multinomial draws over the
+    non-zero cells).
+    """
+    otus, taxa, counts = table
+    total = int(counts.sum())
+    probabilities = counts / total
+    otu_groups, taxon_groups = cell_groups(otus), cell_groups(taxa)
+    generator = np.random.RandomState(seed)
+    batch = max(1, BOOTSTRAP_CELLS // len(counts))
+    values = dict((metric, list()) for metric in METRICS)
+    done = 0
+    while done < replicates:
+        size = min(batch, replicates - done)
+        draws = generator.multinomial(total, probabilities, size=size)
+        for metric, batch_values in replicate_metrics(
+                draws, otu_groups, taxon_groups, total).items():
+            values[metric].append(batch_values)
+        done += size
+    tail = 50.0 * (1 - confidence)
+    intervals = dict()
+    for metric in METRICS:
+        low, high = np.percentile(np.concatenate(values[metric]),
+                                  [tail, 100 - tail])
+        intervals[metric + "_low"] = float(low)
+        intervals[metric + "_high"] = float(high)
+    return intervals
+
+
+def add_intervals(all_values, tables, bootstrap):
+    """
+    Add the bootstrap confidence intervals of each table to its metrics
+    (bootstrap as (replicates, confidence, seed), nothing done without
+    replicates).
+    """
+    replicates, confidence, seed = bootstrap or (0, None, None)
+    if replicates:
+        with phase("bootstrap"):
+            for values, table in zip(all_values, tables):
+                values.update(bootstrap_metrics(table, replicates,
+                                                confidence, seed))
+    return all_values
+
+
+def metric_columns(metrics, bootstrap=None):
+    """
+    Columns printed for the selected metrics (with their confidence
+    intervals if bootstrapped).
+    """
+    if not bootstrap or not bootstrap[0]:
+        return metrics
+    return metrics + [metric + suffix for metric in metrics
+                      for suffix in ("_low", "_high")]
+
+
+def format_metrics(values, metrics):
+    """
+    Format the selected metrics as one CSV line (same precision as
+    CValidate.pl).
+    """
+    return ",".join("%f" % values[metric] for metric in metrics)
+
+
+def clustering_metrics(taxonomic_assignments, swarm_OTUs, cache=False,
+                       clustering_format=None, ranks=None, bootstrap=None,
+                       mask=None):
+    """
+    Compute the metrics of a clustering against one or several tables
+    of taxonomic assignments (no confusion table written, assignments
+    restricted to the subsample listed in the mask file if given), at
+    one or several ranks, with their bootstrap confidence intervals if
+    bootstrap (replicates, confidence, seed) is given. Return one
+    dictionary of metrics per table and rank.
+    """
+    with phase("parse"):
+        ground_truths = parse_ground_truths(taxonomic_assignments, cache,
+                                            ranks, mask)
+    with phase("confusion"):
+        tables = clustering_contingencies(ground_truths, swarm_OTUs,
+                                          clustering_format)
+    with phase("metrics"):
+        all_values = [compute_metrics(table) for table in tables]
+    return add_intervals(all_values, tables, bootstrap)
+
+
+def online_clustering_metrics(taxonomic_assignments, swarm_OTUs, cache=False,
+                              clustering_format=None, ranks=None, mask=None):
+    """
+    Same as clustering_metrics (without bootstrap), with the metrics
+    accumulated while the clustering is read (no confusion table built,
+    see OnlineMetrics).
+    """
+    with phase("parse"):
+        ground_truths = parse_ground_truths(taxonomic_assignments, cache,
+                                            ranks, mask)
+    accumulators = [OnlineMetrics(max(taxa_dict.values() or [0]))
+                    for amplicon2taxonomy, taxa_dicts in ground_truths
+                    for taxa_dict in taxa_dicts]
+    with phase("confusion"):
+        for rows in OTU_columns(ground_truths, swarm_OTUs, clustering_format):
+            for columns, accumulator in zip(rows, accumulators):
+                accumulator.add(columns)
+    with phase("metrics"):
+        return [accumulator.metrics() for accumulator in accumulators]
+
+
+def cached_clustering_metrics(taxonomic_assignments, swarm_OTUs, cache,
+                              result_cache, clustering_format=None,
+                              ranks=None, bootstrap=None, mask=None):
+    """
+    Same as clustering_metrics, with the results stored in (and reused
+    from) a result cache, keyed on the contents of the clustering, of
+    the taxonomic assignments and of the mask, on its format, on the ranks, on the
+    bootstrap parameters and on the sources of this script and of the
+    modules computing the confusion table.
+    """
+    import amplicon_store
+    import assignment_cache
+    import clustering_readers
+    import confusion_table
+    from result_cache import ResultCache
+    results = ResultCache(result_cache)
+    clustering_format = (clustering_format or
+                         clustering_readers.guess_format(swarm_OTUs))
+    extra = [clustering_format] + (ranks or list())
+    if bootstrap and bootstrap[0]:
+        extra.append("bootstrap:%d,%s,%s" % bootstrap)
+    key = results.key(inputs=[swarm_OTUs] + taxonomic_assignments +
+                      ([mask] if mask else []),
+                      binaries=[os.path.abspath(__file__)] + [
+                          os.path.splitext(os.path.abspath(
+                              module.__file__))[0] + ".py"
+                          for module in (amplicon_store, assignment_cache,
+                                         clustering_readers, confusion_table)],
+                      extra=extra)
+    files = results.lookup(key)
+    if files:
+        with open(files[0], "r") as stored:
+            return json.load(stored)
+    all_values = clustering_metrics(taxonomic_assignments, swarm_OTUs, cache,
+                                    clustering_format, ranks, bootstrap, mask)
+    handle, path = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(handle, "w") as output:
+            json.dump(all_values, output)
+        results.store(key, [path], "metrics of " + swarm_OTUs)
+    finally:
+        os.remove(path)
+    return all_values
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    (taxonomic_assignments, swarm_OTUs, clustering_format, confusion_table,
+     table_format, metrics, cache, result_cache, ranks,
+     bootstrap, online, mask) = option_parser()
+
+    ## Compute the metrics from the confusion table or the clustering
+    if confusion_table:
+        with phase("parse"):
+            table = parse_confusion_table(confusion_table, table_format)
+        with phase("metrics"):
+            all_values = [compute_metrics(table)]
+        add_intervals(all_values, [table], bootstrap)
+    elif online:
+        all_values = online_clustering_metrics(taxonomic_assignments,
+                                               swarm_OTUs, cache,
+                                               clustering_format, ranks, mask)
+    elif result_cache:
+        all_values = cached_clustering_metrics(taxonomic_assignments,
+                                               swarm_OTUs, cache,
+                                               result_cache,
+                                               clustering_format, ranks,
+                                               bootstrap, mask)
+    else:
+        all_values = clustering_metrics(taxonomic_assignments, swarm_OTUs,
+                                        cache, clustering_format, ranks,
+                                        bootstrap, mask)
+
+    ## Print the metrics (and their confidence intervals)
+    columns = metric_columns(metrics, bootstrap)
+    for values in all_values:
+        print(format_metrics(values, columns))
+
+    sys.exit(0)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Streaming readers of the clustering files written by the compared tools,
+# so that the confusion tables and metrics can be computed from the raw
+# outputs, without converting them to the swarm format first. Each reader
+# yields the OTUs one at a time, as (OTU, ids, abundances) triples: the
+# name or number of the OTU in the file, the list of the amplicon ids and
+# the array of their abundances (1 if the names have no abundance).
+#
+# Supported formats (see READERS):
+#  swarm: one OTU per line, space-separated ID_abundance names
+#         (swarm, GeFaST, swarm_breaker.py)
+#  dnaclust: one OTU per line, tab-separated names (centre first)
+#  sumaclust: one OTU per line, tab-separated, the first field naming
+#             the OTU (sumaclust -O)
+#  clstr: CD-HIT clusters (">Cluster N" followed by one member per line)
+#  uc: USEARCH / VSEARCH clusters (seed "S" and hit "H" records,
+#      ID;size=abundance labels)
+#
+# The OTUs of a .uc file are grouped with an external sort (on the cluster
+# number), so only the OTU being yielded has to fit in memory. The file
+# name "-" stands for the standard input (e.g. a clustering piped by
+# swarm_breaker.py, swarm format unless given), and named pipes can be
+# read like files.
+
+
+
+from __future__ import print_function
+
+import os
+import sys
+from itertools import groupby
+
+from amplicon_store import external_sort, split_headers
+
+
+def open_clustering(clustering):
+    """
+    Open a clustering file for reading ("-" for the standard input).
+    """
+    return sys.stdin if clustering == "-" else open(clustering, "r")
+
+
+def read_swarm(clustering):
+    """
+    Read a swarm clustering file (OTUs numbered from 0).
+    """
+    with open_clustering(clustering) as clustering:
+        for number, line in enumerate(clustering):
+            ids, abundances = split_headers(line.split(), 1)
+            yield number, ids, abundances
+
+
+def read_dnaclust(clustering):
+    """
+    Read a DNACLUST clustering file (OTUs numbered from 0).
+    """
+    # same layout as swarm files, only with tabs (split() takes both)
+    return read_swarm(clustering)
+
+
+def read_sumaclust(clustering):
+    """
+    Read a Sumaclust OTU map (OTUs named by their first field).
+    """
+    with open_clustering(clustering) as clustering:
+        for line in clustering:
+            fields = line.rstrip("\n").split("\t")
+            ids, abundances = split_headers(fields[1:], 1)
+            yield fields[0], ids, abundances
+
+
+def read_clstr(clustering):
+    """
+    Read a CD-HIT clustering file (OTUs numbered as in the file).
+    """
+    with open_clustering(clustering) as clustering:
+        number, headers = None, list()
+        for line in clustering:
+            if line.startswith(">Cluster"):
+                if number is not None:
+                    ids, abundances = split_headers(headers, 1)
+                    yield number, ids, abundances
+                number, headers = int(line.split()[1]), list()
+            elif line.strip():
+                # e.g. "0\t250nt, >ID_abundance... *"
+                headers.append(line.split(">", 1)[1].split("...", 1)[0])
+        if number is not None:
+            ids, abundances = split_headers(headers, 1)
+            yield number, ids, abundances
+
+
+def uc_members(clustering):
+    """
+    List the members of the clusters of a .uc file as "cluster<tab>name"
+    lines, with ID_abundance names (in the order of the file).
+    """
+    with open_clustering(clustering) as clustering:
+        for line in clustering:
+            fields = line.split("\t")
+            if fields[0] in ("S", "H"):
+                name = fields[8].replace(";size=", "_").rstrip(";")
+                yield fields[1] + "\t" + name
+
+
+def read_uc(clustering):
+    """
+    Read a USEARCH / VSEARCH clustering file (OTUs numbered as in the
+    file, in increasing order).
+    """
+    cluster = lambda line: int(line.split("\t", 1)[0])
+    members = external_sort(uc_members(clustering), cluster)
+    for number, lines in groupby(members, cluster):
+        ids, abundances = split_headers([line.split("\t", 1)[1]
+                                         for line in lines], 1)
+        yield number, ids, abundances
+
+
+READERS = {"swarm": read_swarm,
+           "dnaclust": read_dnaclust,
+           "sumaclust": read_sumaclust,
+           "clstr": read_clstr,
+           "uc": read_uc}
+
+
+def guess_format(clustering):
+    """
+    Format of a clustering file, from its extension (e.g. .uc or
+    .clstr), swarm by default.
+    """
+    extension = os.path.splitext(clustering)[1][1:]
+    return extension if extension in READERS else "swarm"
+
+
+def read_clustering(clustering, clustering_format=None):
+    """
+    Iterate over the OTUs of a clustering file, as (OTU, ids, abundances)
+    triples (format guessed from the file name if not given).
+    """
+    return READERS[clustering_format or guess_format(clustering)](clustering)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Compares several clusterings of the same amplicons with each other
+# (instead of with a taxonomic ground truth): adjusted Rand index,
+# normalised mutual information (as in cluster_metrics.py) and variation
+# of information of all pairs of clusterings. Each clustering file is read
+# once (in any of the formats of clustering_readers.py) and encoded as the
+# array of the OTU numbers of the amplicons (interned once for all
+# clusterings). The confusion table of a pair is built by combining both
+# arrays into one label per amplicon and counting the labels.
+#
+# Amplicons missing from a clustering (e.g. not in the fasta file given
+# with -f) count as singletons, and amplicons are weighted by their
+# abundance unless -u is given. The pairs are printed as CSV lines
+# (long format, both orders of each pair and the diagonal), e.g. for R:
+#  data <- read.csv(file)
+#  reshape2::acast(data, clustering1 ~ clustering2, value.var = "vi")
+
+
+
+from __future__ import division, print_function
+
+import os
+import sys
+from array import array
+from optparse import OptionParser
+
+import numpy as np
+
+from amplicon_store import IdTable, split_header
+from cluster_metrics import compute_metrics, contingency
+from clustering_readers import READERS, read_clustering
+from instrumentation import phase
+
+COLUMNS = ["clustering1", "clustering2", "adjrandindex", "nmi", "vi"]
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program computes the adjusted Rand index, NMI and
+    variation of information of all pairs of clusterings of the same
+    amplicons (swarm, DNACLUST, Sumaclust, CD-HIT or USEARCH / VSEARCH
+    .uc files), printed as CSV lines."""
+
+    parser = OptionParser(usage="usage: %prog [options] FILENAME FILENAME...",
+                          description=desc)
+
+    parser.add_option("-f", "--fasta_file",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="fasta_file",
+                      help="set <FILENAME> as fasta file of the amplicons "
+                      "(ID_abundance headers). Default is the amplicons of "
+                      "the clusterings.")
+
+    parser.add_option("-i", "--input_format",
+                      metavar="<FORMAT>",
+                      action="store",
+                      type="choice",
+                      choices=sorted(READERS),
+                      dest="clustering_format",
+                      help="format of the clusterings (" +
+                      ", ".join(sorted(READERS)) + "). Default is guessed "
+                      "from the extension of each file (.uc, .clstr...), "
+                      "else swarm.")
+
+    parser.add_option("-n", "--names",
+                      metavar="<LIST>",
+                      action="store",
+                      dest="names",
+                      help="comma-separated names of the clusterings in the "
+                      "output. Default is the file names.")
+
+    parser.add_option("-u", "--unweighted",
+                      action="store_true",
+                      default=False,
+                      dest="unweighted",
+                      help="count each amplicon once (weighted by abundance "
+                      "by default).")
+
+    (options, args) = parser.parse_args()
+    if len(args) < 2:
+        parser.error("at least two clusterings are required")
+    if options.names:
+        names = options.names.split(",")
+        if len(names) != len(args):
+            parser.error("option -n must name each clustering")
+    else:
+        names = [os.path.basename(clustering) for clustering in args]
+    return (args, names, options.fasta_file, options.clustering_format,
+            options.unweighted)
+
+
+def intern_fasta(fasta_file, ids, abundances):
+    """
+    Intern the amplicons of a fasta file (headers only) and append their
+    abundances.
+    """
+    with open(fasta_file, "r") as fasta_file:
+        for line in fasta_file:
+            if line.startswith(">"):
+                amplicon, abundance = split_header(line.strip(">\n"))
+                if ids.intern(amplicon) == len(abundances):
+                    abundances.append(abundance)
+
+
+def clustering_members(clustering, ids, abundances, clustering_format=None):
+    """
+    Read a clustering as the numbers of its amplicons (interned, their
+    abundances appended if new) and the OTU number of each of them.
+    """
+    amplicons, otus = array("l"), array("l")
+    for number, (otu, otu_ids, otu_abundances) in enumerate(
+            read_clustering(clustering, clustering_format)):
+        for amplicon, abundance in zip(otu_ids, otu_abundances):
+            i = ids.intern(amplicon)
+            if i == len(abundances):
+                abundances.append(abundance)
+            amplicons.append(i)
+            otus.append(number)
+    return amplicons, otus
+
+
+def labels(amplicons, otus, size):
+    """
+    Array of the OTU numbers of all amplicons (missing amplicons as
+    singletons, numbered after the OTUs).
+    """
+    otus = np.asarray(otus, dtype=np.int64)
+    result = np.full(size, -1, dtype=np.int64)
+    result[np.asarray(amplicons, dtype=np.int64)] = otus
+    missing = np.flatnonzero(result < 0)
+    result[missing] = (otus.max() + 1 if len(otus) else 0) + np.arange(
+        len(missing))
+    return result
+
+
+def pair_contingency(first, second, weights):
+    """
+    Non-zero cells of the confusion table of two clusterings (label
+    arrays), by combining the labels of each amplicon into one.
+    """
+    width = int(second.max()) + 1
+    cells, inverse = np.unique(first * width + second, return_inverse=True)
+    counts = np.rint(np.bincount(inverse.ravel(), weights=weights))
+    return contingency(cells // width, cells % width, counts)
+
+
+def xlogx(counts):
+    """
+    Sum of n log(n) over counts (0 log(0) = 0).
+    """
+    counts = counts[counts > 0].astype(np.float64)
+    return np.sum(counts * np.log(counts))
+
+
+def variation_of_information(table):
+    """
+    Variation of information of a confusion table (nats), i.e. H(OTUs) +
+    H(taxa) - 2 MI, from the sums of n log(n) of its cells and marginals.
+    """
+    otus, taxa, counts = table
+    total = counts.sum()
+    return (xlogx(np.bincount(otus, weights=counts)) +
+            xlogx(np.bincount(taxa, weights=counts)) -
+            2 * xlogx(counts)) / total
+
+
+def compare_clusterings(clusterings, fasta_file=None, clustering_format=None,
+                        unweighted=False):
+    """
+    Compute the adjusted Rand index, NMI and variation of information of
+    all pairs of clusterings, as a matrix (list of lists) of dictionaries.
+    """
+    ids, abundances = IdTable(), array("l")
+    members = list()
+    with phase("parse"):
+        if fasta_file:
+            intern_fasta(fasta_file, ids, abundances)
+        for clustering in clusterings:
+            members.append(clustering_members(clustering, ids, abundances,
+                                              clustering_format))
+        all_labels = [labels(amplicons, otus, len(ids))
+                      for amplicons, otus in members]
+    if unweighted:
+        weights = np.ones(len(ids))
+    else:
+        weights = np.asarray(abundances, dtype=np.float64)
+    matrix = [[None] * len(clusterings) for clustering in clusterings]
+    with phase("metrics"):
+        for i, first in enumerate(all_labels):
+            for j in range(i, len(all_labels)):
+                table = pair_contingency(first, all_labels[j], weights)
+                values = compute_metrics(table)
+                values["vi"] = variation_of_information(table)
+                # all three metrics are symmetric
+                matrix[i][j] = matrix[j][i] = values
+    return matrix
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    (clusterings, names, fasta_file, clustering_format,
+     unweighted) = option_parser()
+
+    ## Compare all pairs of clusterings
+    matrix = compare_clusterings(clusterings, fasta_file, clustering_format,
+                                 unweighted)
+
+    ## Print one CSV line per pair
+    print(",".join(COLUMNS))
+    for first, row in zip(names, matrix):
+        for second, values in zip(names, row):
+            print(first, second, ",".join("%f" % values[metric]
+                                          for metric in COLUMNS[2:]),
+                  sep=",")
+
+    sys.exit(0)
@@ -7,25 +7,42 @@
 #
 # Supplement 8: https://doi.org/10.7717/peerj.593/supp-8
 #
-# Builds confusion table and computes metrics
+# Computes metrics (without writing the confusion table)
+# against one or several ground truths (comma-separated lists of
+# taxonomic assignments and corresponding metrics files)
 
 
 
 # scripts
-BUILD_CONFUSION_TABLE=scripts/confusion_table_reduced.py
-COMPUTE_CLUSTER_METRICS=scripts/CValidate_reduced.pl
+COMPUTE_CLUSTER_METRICS=scripts/cluster_metrics.py
 
 # inputs
-CLUSTERING_RESULTS=$1
+CLUSTERING_RESULTS=$1 # swarm format, or .uc, .clstr, .sumaclust (see clustering_readers.py)
 METHOD=$2
 THRESHOLD=$3
-TAXONOMIC_ASSIGNMENTS=$4
-CONFUSION_TABLE=$5
-METRICS_FILE=$6
-REPETITION=$7
+IFS=',' read -r -a TAXONOMIC_ASSIGNMENTS <<< "$4"
+IFS=',' read -r -a METRICS_FILES <<< "$5"
+REPETITION=$6
+CACHE_DIR=$7 # optional, reuse (or store) the metric values (see result_cache.py)
+BOOTSTRAP=$8 # optional, number of bootstrap replicates (adds the <metric>_low and <metric>_high columns)
 
-# build confusion table; derive and store metric values
-python ${BUILD_CONFUSION_TABLE} -t ${TAXONOMIC_ASSIGNMENTS} -s ${CLUSTERING_RESULTS} > ${CONFUSION_TABLE}
-METRICS_DATA=$(perl ${COMPUTE_CLUSTER_METRICS} --cfile=${CONFUSION_TABLE})
-echo "${METHOD},${THRESHOLD},${REPETITION},${METRICS_DATA}" >> ${METRICS_FILE}
+# derive and store metric values (clustering results are read only once,
+# taxonomic assignments are compiled once and then memory-mapped)
+TAXA_OPTIONS=()
+for TAXA_FILE in "${TAXONOMIC_ASSIGNMENTS[@]}"
+do
+	TAXA_OPTIONS+=(-t ${TAXA_FILE})
+done
+if [ -n "${CACHE_DIR}" ]; then
+	TAXA_OPTIONS+=(--result_cache ${CACHE_DIR})
+fi
+if [ -n "${BOOTSTRAP}" ]; then
+	TAXA_OPTIONS+=(-b ${BOOTSTRAP})
+fi
+I=0
+python ${COMPUTE_CLUSTER_METRICS} --cache ${TAXA_OPTIONS[@]} -s ${CLUSTERING_RESULTS} -m recall,precision,adjrandindex | while read -r METRICS_DATA
+do
+	echo "${METHOD},${THRESHOLD},${REPETITION},${METRICS_DATA}" >> ${METRICS_FILES[${I}]}
+	I=$((I + 1))
+done
 
@@ -37,14 +37,24 @@ __version__ = "$Revision: 0.1"
 import sys
 from optparse import OptionParser
 
+from amplicon_store import parse_otu_line, read_mask, split_header
+from clustering_readers import READERS, read_clustering
+from instrumentation import phase
+
+# Levels of the SILVA lineages (D_0__...;D_1__...;...;D_6__...)
+RANKS = ["domain", "phylum", "class", "order", "family", "genus", "species"]
+
 
 def option_parser():
     """
     Parse arguments from command line.
     """
     desc = """This program reads a table of taxonomic assignments and
-    a swarm clustering file and outputs a confusion table (OTUs vs
-    taxonomic assignments)."""
+    a clustering file (swarm, DNACLUST, Sumaclust, CD-HIT or USEARCH /
+    VSEARCH .uc) and outputs a confusion table (OTUs vs taxonomic
+    assignments). Several tables of taxonomic assignments
+    can be given (one output file each), the clustering file is then
+    read only once."""
 
     parser = OptionParser(usage="usage: %prog -t FILENAME -s FILENAME",
                           description=desc,
@@ -52,9 +62,9 @@ def option_parser():
 
     parser.add_option("-t", "--taxonomic_assignments",
                       metavar="<FILENAME>",
-                      action="store",
+                      action="append",
                       dest="taxonomic_assignments",
-                      help="set <FILENAME> as input.")
+                      help="set <FILENAME> as input (repeatable).")
 
     parser.add_option("-s", "--swarm_OTUs",
                       metavar="<FILENAME>",
@@ -62,20 +72,102 @@ def option_parser():
                       dest="swarm_OTUs",
                       help="set <FILENAME> as input.")
 
+    parser.add_option("-i", "--input_format",
+                      metavar="<FORMAT>",
+                      action="store",
+                      type="choice",
+                      choices=sorted(READERS),
+                      dest="clustering_format",
+                      help="format of the clustering file (" +
+                      ", ".join(sorted(READERS)) + "). Default is guessed "
+                      "from the extension (.uc, .clstr...), else swarm.")
+
+    parser.add_option("-f", "--format",
+                      metavar="<FORMAT>",
+                      action="store",
+                      type="choice",
+                      choices=["dense", "sparse"],
+                      default="dense",
+                      dest="output_format",
+                      help="output one column per taxon (dense) or one "
+                      "line per non-zero cell (sparse). Default is dense.")
+
+    parser.add_option("-r", "--ranks",
+                      metavar="<LIST>",
+                      action="store",
+                      dest="ranks",
+                      help="comma-separated list of ranks (" +
+                      ", ".join(RANKS) + "): one confusion table per rank "
+                      "and per -t option, with the ';'-separated lineages "
+                      "truncated at the rank. Default is the whole "
+                      "lineage.")
+
+    parser.add_option("-o", "--output",
+                      metavar="<FILENAME>",
+                      action="append",
+                      dest="outputs",
+                      help="write the confusion table to <FILENAME> instead "
+                      "of stdout (repeatable, one per -t option and rank, "
+                      "all ranks of a -t option, then the next one).")
+
+    parser.add_option("-c", "--cache",
+                      action="store_true",
+                      default=False,
+                      dest="cache",
+                      help="read the taxonomic assignments from their "
+                      "compiled form (<FILENAME>.compiled, created or "
+                      "updated if needed).")
+
+    parser.add_option("--mask",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="mask",
+                      help="restrict the taxonomic assignments (of the "
+                      "whole data set) to the subsample listed in "
+                      "<FILENAME> (FastaSampler -m).")
+
     (options, args) = parser.parse_args()
-    return options.taxonomic_assignments, options.swarm_OTUs
+    if not options.taxonomic_assignments:
+        parser.error("option -t is required")
+    ranks = options.ranks.split(",") if options.ranks else None
+    for rank in ranks or list():
+        if rank not in RANKS:
+            parser.error("unknown rank: " + rank)
+    tables = len(options.taxonomic_assignments) * len(ranks or [None])
+    outputs = options.outputs or list()
+    if (tables > 1 or outputs) and len(outputs) != tables:
+        parser.error("option -o must be given once per -t option and rank")
+    return (options.taxonomic_assignments, options.swarm_OTUs,
+            options.clustering_format, options.output_format, outputs,
+            options.cache, ranks, options.mask)
 
 
-def parse_taxonomy(taxonomic_assignments):
+def parse_taxonomy(taxonomic_assignments, cache=False, unassigned=True,
+                   mask=None):
     """
-    Parse taxonomy assignments
+    Parse taxonomy assignments (or load their compiled form, see
+    assignment_cache.py), with an "Unassigned" taxon for the amplicons
+    missing from the assignments unless unassigned is False. With a
+    mask (set of amplicon ids, see amplicon_store.read_mask), only the
+    taxa of the subsample are listed
     """
+    extra = ["Unassigned"] if unassigned else []
+    if cache:
+        from assignment_cache import load_assignments
+        amplicon2taxonomy = load_assignments(taxonomic_assignments, "ualn")
+        taxa = amplicon2taxonomy.taxa
+        if mask is not None:
+            taxa = [value[1] for value in amplicon2taxonomy.values(list(mask))
+                    if value is not None]
+        return amplicon2taxonomy, extra + taxa
     amplicon2taxonomy = dict()
-    taxa = ["Unassigned"]
-    with open(taxonomic_assignments, "rU") as taxonomic_assignments:
+    taxa = list(extra)
+    with open(taxonomic_assignments, "r") as taxonomic_assignments:
         for line in taxonomic_assignments:
             amplicon, taxon = line.split()[0:2]
-            amplicon, abundance = amplicon.split("_")
+            amplicon, abundance = split_header(amplicon)
+            if mask is not None and amplicon not in mask:
+                continue
             amplicon2taxonomy[amplicon] = (abundance, taxon)
             taxa.append(taxon)
     return amplicon2taxonomy, taxa
@@ -83,52 +175,245 @@ def parse_taxonomy(taxonomic_assignments):
 
 def dereplicate_taxa(taxa):
     """
-    Dereplicate taxa (list of unique taxon names, and initialized dictionary)
+    Dereplicate taxa (list of unique taxon names, and dictionary of
+    their 1-based column numbers)
     """
     taxa_list = list(set(taxa))
-    taxa_dict = dict(zip(taxa_list, [0] * len(taxa_list)))
+    taxa_dict = dict(zip(taxa_list, range(1, len(taxa_list) + 1)))
     return taxa_list, taxa_dict
 
 
-def OTU_parser(taxa_dict, taxa_list, amplicon2taxonomy, amplicons):
+def rank_taxa(taxa_list, ranks):
     """
-    Parse each OTU and output one line of the confusion table.
+    Truncate the ';'-separated lineages (e.g. SILVA) of the taxa at
+    several ranks, each lineage being split only once. For each rank,
+    return the list of the unique truncated taxa and the dictionary of
+    their 1-based column numbers, indexed by the full lineages.
+    """
+    lineages = [taxon.split(";") for taxon in taxa_list]
+    tables = list()
+    for rank in ranks:
+        depth = RANKS.index(rank) + 1
+        truncated = [";".join(lineage[:depth]) for lineage in lineages]
+        rank_list, rank_dict = dereplicate_taxa(truncated)
+        tables.append((rank_list, dict((taxon, rank_dict[rank_taxon])
+                                       for taxon, rank_taxon
+                                       in zip(taxa_list, truncated))))
+    return tables
+
+
+def taxa_tables(taxa, ranks=None):
+    """
+    Dereplicate taxa, as one (taxa_list, taxa_dict) pair per rank (see
+    rank_taxa), or a single pair for the whole lineages.
+    """
+    taxa_list, taxa_dict = dereplicate_taxa(taxa)
+    if ranks:
+        return rank_taxa(taxa_list, ranks)
+    return [(taxa_list, taxa_dict)]
+
+
+def split_amplicons(line):
+    """
+    Split the amplicons of an OTU (line of the swarm file) into
+    (amplicon, abundance) pairs (abundance is 1 if missing).
+    """
+    return list(zip(*parse_otu_line(line, 1)))
+
+
+def assigned_OTUs(tables, otus, batch_size=2**16):
+    """
+    Iterate over OTUs (otu, ids, abundances triples, see
+    clustering_readers.py) as lists of (amplicon, abundance) pairs and
+    of the (abundance, taxon) pairs of their amplicons (None if missing)
+    in each compiled table of taxonomic assignments (see
+    assignment_cache.py). The amplicons of consecutive OTUs are looked
+    up together, by batches of about batch_size amplicons. Dictionaries
+    are looked up later, by OTU_counter (None instead of the list).
+    """
+    if all(isinstance(table, dict) for table in tables):
+        for otu, ids, abundances in otus:
+            yield list(zip(ids, abundances)), [None] * len(tables)
+        return
+    batch, size = list(), 0
+    for otu in otus:
+        batch.append(otu)
+        size += len(otu[1])
+        if size < batch_size:
+            continue
+        for assigned in split_batch(tables, batch):
+            yield assigned
+        batch, size = list(), 0
+    for assigned in split_batch(tables, batch):
+        yield assigned
+
+
+def split_batch(tables, batch):
+    """
+    Look up the amplicons of a batch of OTUs in each compiled table, and
+    split the assignments per OTU (see assigned_OTUs).
     """
-    for amplicon in amplicons:
-        try:
-            amplicon, abundance = amplicon.split("_")
-        except ValueError:
-            amplicon, abundance = amplicon, 1
-        try:
-            abundance, taxon = amplicon2taxonomy[amplicon]
-        except KeyError:
+    amplicons = [amplicon for otu, ids, abundances in batch
+                 for amplicon in ids]
+    assignments = [None if isinstance(table, dict) else table.values(amplicons)
+                   for table in tables]
+    start = 0
+    for otu, ids, abundances in batch:
+        end = start + len(ids)
+        yield (list(zip(ids, abundances)),
+               [None if table_assignments is None
+                else table_assignments[start:end]
+                for table_assignments in assignments])
+        start = end
+
+
+def OTU_counter(amplicon2taxonomy, amplicons, assignments=None):
+    """
+    Count the abundance of the taxa present in an OTU (list of
+    (amplicon, abundance) pairs), from the assignments of its amplicons
+    if already looked up (see assigned_OTUs).
+    """
+    OTU_abundance_per_taxa = dict()
+    if assignments is None and isinstance(amplicon2taxonomy, dict):
+        for amplicon, abundance in amplicons:
+            try:
+                abundance, taxon = amplicon2taxonomy[amplicon]
+            except KeyError:
+                taxon = "Unassigned"
+            OTU_abundance_per_taxa[taxon] = (
+                OTU_abundance_per_taxa.get(taxon, 0) + int(abundance))
+        return OTU_abundance_per_taxa
+    if assignments is None:
+        assignments = amplicon2taxonomy.values(
+            [amplicon for amplicon, abundance in amplicons])
+    for (amplicon, abundance), assignment in zip(amplicons, assignments):
+        if assignment is None:
             taxon = "Unassigned"
-        taxa_dict[taxon] += int(abundance)
-    OTU_abundance_per_taxa = [str(taxa_dict[taxon]) for taxon in taxa_list]
+        else:
+            abundance, taxon = assignment
+        OTU_abundance_per_taxa[taxon] = (OTU_abundance_per_taxa.get(taxon, 0) +
+                                         int(abundance))
     return OTU_abundance_per_taxa
 
 
-if __name__ == '__main__':
+def column_counter(taxa_dict, OTU_abundance_per_taxa):
+    """
+    Sum the abundances of the taxa of an OTU per column of the confusion
+    table (several lineages share a column when truncated at a rank).
+    """
+    OTU_abundance_per_column = dict()
+    for taxon, abundance in OTU_abundance_per_taxa.items():
+        column = taxa_dict[taxon]
+        OTU_abundance_per_column[column] = (
+            OTU_abundance_per_column.get(column, 0) + abundance)
+    return OTU_abundance_per_column
 
-    ## Parse command line arguments
-    taxonomic_assignments, swarm_OTUs = option_parser()
 
-    ## Parse taxonomy assignments
-    amplicon2taxonomy, taxa = parse_taxonomy(taxonomic_assignments)
+def dense_row(OTU_abundance_per_column, width):
+    """
+    Line of the confusion table (width columns) of an OTU.
+    """
+    OTU_abundance_per_taxa = ["0"] * width
+    for column, abundance in OTU_abundance_per_column.items():
+        OTU_abundance_per_taxa[column - 1] = str(abundance)
+    return OTU_abundance_per_taxa
 
-    ## Dereplicate taxa
-    taxa_list, taxa_dict = dereplicate_taxa(taxa)
 
-    ## Output the table header
-    print("OTUs_vs_Taxa", "\t".join(taxa_list), sep="\t", file=sys.stdout)
+def sparse_row(OTU_abundance_per_column):
+    """
+    Non-zero cells of the line of the confusion table of an OTU, as
+    (taxon column number, abundance) pairs.
+    """
+    return sorted((column, abundance)
+                  for column, abundance in OTU_abundance_per_column.items()
+                  if abundance)
+
+
+def OTU_parser(taxa_dict, amplicon2taxonomy, amplicons):
+    """
+    Parse each OTU and output one line of the confusion table.
+    """
+    OTU_abundance_per_taxa = OTU_counter(amplicon2taxonomy, amplicons)
+    return dense_row(column_counter(taxa_dict, OTU_abundance_per_taxa),
+                     len(taxa_dict))
+
+
+def sparse_OTU_parser(taxa_dict, amplicon2taxonomy, amplicons):
+    """
+    Parse each OTU and output the non-zero cells of its line of the
+    confusion table, as (taxon column number, abundance) pairs.
+    """
+    OTU_abundance_per_taxa = OTU_counter(amplicon2taxonomy, amplicons)
+    return sparse_row(column_counter(taxa_dict, OTU_abundance_per_taxa))
+
+
+def write_confusion_tables(taxonomic_assignments, swarm_OTUs,
+                           clustering_format, output_format, outputs,
+                           cache=False, ranks=None, unassigned=True,
+                           mask=None):
+    """
+    Write the confusion tables of a clustering, one per table of
+    taxonomic assignments and rank (to the outputs, or to stdout), with
+    the clustering file read only once (and the taxonomic assignments
+    restricted to the subsample listed in the mask file if given).
+    """
+    ## Parse taxonomy assignments and dereplicate taxa, output the
+    ## table headers
+    tables = list()
+    k = 0
+    with phase("parse"):
+        mask = read_mask(mask) if mask else None
+        for assignments in taxonomic_assignments:
+            amplicon2taxonomy, taxa = parse_taxonomy(assignments, cache,
+                                                     unassigned, mask)
+            rank_outputs = list()
+            for taxa_list, taxa_dict in taxa_tables(taxa, ranks):
+                output = open(outputs[k], "w") if outputs else sys.stdout
+                k += 1
+                print("OTUs_vs_Taxa", "\t".join(taxa_list), sep="\t",
+                      file=output)
+                rank_outputs.append((taxa_dict, len(taxa_list), output))
+            tables.append((amplicon2taxonomy, rank_outputs))
+
+    ## Parse OTUs (sparse lines: OTU, taxon column, abundance)
+    with phase("confusion"):
+        for i, (amplicons, assignments) in enumerate(assigned_OTUs(
+                [amplicon2taxonomy for amplicon2taxonomy, rank_outputs
+                 in tables],
+                read_clustering(swarm_OTUs, clustering_format))):
+            for (amplicon2taxonomy, rank_outputs), table_assignments in zip(
+                    tables, assignments):
+                OTU_abundance_per_taxa = OTU_counter(amplicon2taxonomy,
+                                                     amplicons,
+                                                     table_assignments)
+                for taxa_dict, width, output in rank_outputs:
+                    OTU_abundance_per_column = column_counter(
+                        taxa_dict, OTU_abundance_per_taxa)
+                    if output_format == "sparse":
+                        for column, abundance in sparse_row(
+                                OTU_abundance_per_column):
+                            print(i+1, column, abundance, sep="\t",
+                                  file=output)
+                        continue
+                    print(str(i+1), "\t".join(dense_row(
+                        OTU_abundance_per_column, width)), sep="\t",
+                          file=output)
+
+    for amplicon2taxonomy, rank_outputs in tables:
+        for taxa_dict, width, output in rank_outputs:
+            if output is not sys.stdout:
+                output.close()
+
+
+if __name__ == '__main__':
+
+    ## Parse command line arguments
+    (taxonomic_assignments, swarm_OTUs, clustering_format, output_format,
+     outputs, cache, ranks, mask) = option_parser()
 
-    ## Parse swarm OTUs
-    with open(swarm_OTUs, "rU") as swarm_OTUs:
-        for i, line in enumerate(swarm_OTUs):
-            amplicons = line.strip().split()
-            OTU_abundance_per_taxa = OTU_parser(taxa_dict.copy(), taxa_list,
-                                                amplicon2taxonomy, amplicons)
-            print(str(i+1), "\t".join(OTU_abundance_per_taxa), sep="\t",
-                  file=sys.stdout)
+    ## Write the confusion tables
+    write_confusion_tables(taxonomic_assignments, swarm_OTUs,
+                           clustering_format, output_format, outputs,
+                           cache, ranks, mask=mask)
 
-sys.exit(0)
+    sys.exit(0)
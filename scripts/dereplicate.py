@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Prepares a data set in a single pass: reads FASTQ or FASTA files
+# (optionally gzip-compressed, read in input order), drops the empty reads
+# and the reads containing n/N, and dereplicates the remaining ones into a FASTA file, as
+# done before by concatenating the files, converting them with seqtk,
+# filtering them with removeN.py and dereplicating them with
+# "swarm -d 0 -a 1 -w".
+#
+# Each distinct sequence (case-insensitive) is represented by its first
+# read: the header is the read identifier (up to the first whitespace,
+# without abundance annotation) followed by "_" and the total abundance,
+# the sequence is written in lowercase on a single line. Representatives
+# are sorted by decreasing abundance, then in order of first appearance.
+# Compressed files are decompressed by background threads (a few files
+# ahead of the parser).
+
+
+
+from __future__ import print_function
+
+import gzip
+import sys
+import threading
+from optparse import OptionParser
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+from amplicon_store import split_header
+from instrumentation import phase
+
+BLOCK_SIZE = 2**20
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program reads FASTQ or FASTA files (plain or gzipped),
+    removes the sequences containing n/N and writes the dereplicated
+    sequences (ID_abundance headers, by decreasing abundance) to a FASTA
+    file."""
+
+    parser = OptionParser(usage="usage: %prog [options] -o FILENAME FILENAME...",
+                          description=desc)
+
+    parser.add_option("-o", "--output",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="output_file",
+                      help="write the dereplicated sequences to <FILENAME>.")
+
+    parser.add_option("-a", "--append_abundance",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=1,
+                      dest="default_abundance",
+                      help="abundance of the reads without abundance "
+                      "annotation. Default is 1.")
+
+    parser.add_option("-t", "--threads",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=4,
+                      dest="threads",
+                      help="decompress up to <INTEGER> files at the same "
+                      "time. Default is 4.")
+
+    (options, args) = parser.parse_args()
+    if not options.output_file or not args:
+        parser.error("an output file (-o) and input files are required")
+    return (args, options.output_file, options.default_abundance,
+            max(1, options.threads))
+
+
+def read_blocks(input_file, blocks):
+    """
+    Read a (possibly gzipped) file and put its blocks in the queue,
+    followed by None (worker thread).
+    """
+    try:
+        with open(input_file, "rb") as handle:
+            compressed = handle.read(2) == b"\x1f\x8b"
+        if compressed:
+            handle = gzip.open(input_file, "rb")
+        else:
+            handle = open(input_file, "rb")
+        with handle:
+            for block in iter(lambda: handle.read(BLOCK_SIZE), b""):
+                blocks.put(block)
+        blocks.put(None)
+    except Exception as error:
+        blocks.put(error)
+
+
+class BlockReaders(object):
+    """
+    Decompress the input files in background threads, at most
+    `threads` files ahead of the file being parsed. Each file has its
+    own bounded queue of blocks.
+    """
+
+    def __init__(self, input_files, threads):
+        self.input_files = input_files
+        self.threads = threads
+        self.queues = list()
+
+    def start(self, count):
+        while len(self.queues) < min(count, len(self.input_files)):
+            blocks = Queue(maxsize=8)
+            thread = threading.Thread(target=read_blocks,
+                                      args=(self.input_files[len(self.queues)],
+                                            blocks))
+            thread.daemon = True
+            thread.start()
+            self.queues.append(blocks)
+
+    def lines(self, k):
+        """
+        Lines of the k-th file (without line breaks).
+        """
+        self.start(k + self.threads)
+        blocks = self.queues[k]
+        pending = b""
+        while True:
+            block = blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if block is None:
+                break
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip(b"\r")
+        self.queues[k] = None
+        if pending:
+            yield pending.rstrip(b"\r")
+
+
+def parse_reads(lines):
+    """
+    List the (header, sequence) pairs of a FASTQ file (four lines per
+    read) or of a FASTA file (possibly wrapped sequences).
+    """
+    lines = iter(lines)
+    for line in lines:
+        if line:
+            break
+    else:
+        return
+    if line.startswith(b"@"):
+        while line is not None:
+            sequence, separator, qualities = [next(lines, None)
+                                              for i in range(3)]
+            if qualities is None or not separator.startswith(b"+"):
+                raise ValueError("truncated FASTQ record: " + repr(line))
+            yield line[1:], sequence
+            line = next(lines, None)
+            while line == b"":
+                line = next(lines, None)
+        return
+    if not line.startswith(b">"):
+        raise ValueError("not a FASTQ or FASTA file")
+    header, sequence = line[1:], list()
+    for line in lines:
+        if line.startswith(b">"):
+            yield header, b"".join(sequence)
+            header, sequence = line[1:], list()
+        else:
+            sequence.append(line.strip())
+    yield header, b"".join(sequence)
+
+
+def dereplicate(reads, default_abundance):
+    """
+    Drop the empty reads and the reads containing n/N, and merge
+    identical sequences
+    (case-insensitive). Return the identifiers, abundances and
+    sequences of the first read of each distinct sequence, in order of
+    first appearance.
+    """
+    index = dict()
+    identifiers, abundances, sequences = list(), list(), list()
+    for header, sequence in reads:
+        if not sequence or b"N" in sequence or b"n" in sequence:
+            continue
+        sequence = sequence.lower()
+        fields = header.split(None, 1)
+        identifier = fields[0].decode("ascii") if fields else ""
+        identifier, abundance = split_header(identifier, default_abundance)
+        i = index.get(sequence)
+        if i is None:
+            index[sequence] = len(sequences)
+            identifiers.append(identifier)
+            abundances.append(abundance)
+            sequences.append(sequence)
+        else:
+            abundances[i] += abundance
+    return identifiers, abundances, sequences
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    input_files, output_file, default_abundance, threads = option_parser()
+
+    ## Read, filter and dereplicate all files, in order
+    readers = BlockReaders(input_files, threads)
+    reads = (read for k in range(len(input_files))
+             for read in parse_reads(readers.lines(k)))
+    with phase("parse"):
+        identifiers, abundances, sequences = dereplicate(reads,
+                                                         default_abundance)
+
+    ## Write the representatives by decreasing abundance
+    with phase("output"), open(output_file, "w") as output_file:
+        for i in sorted(range(len(sequences)), key=lambda i: -abundances[i]):
+            print(">", identifiers[i], "_", abundances[i], sep="",
+                  file=output_file)
+            print(sequences[i].decode("ascii"), file=output_file)
+
+    sys.exit(0)
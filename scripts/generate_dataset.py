@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Generates a synthetic data set with a known ground truth, so that the
+# analyses can be run (and scaled) without downloading any data. Each
+# taxon has a random reference sequence (its centroid), and its amplicons
+# derive from the centroid by successive single-nucleotide mutations
+# (substitutions, insertions, deletions), so that they form swarm-like
+# clusters. The centroids are the most abundant amplicons of their taxa,
+# with the same abundance for all taxa (even data sets) or log-normally
+# distributed abundances (uneven data sets).
+# Some taxa are bridged to one of the previous taxa (within a window, so
+# that only the sequences of these taxa are kept in memory): their
+# centroid differs from the other centroid by a few substitutions, and
+# the intermediate sequences are present as rare amplicons, forming the
+# chains of amplicons that swarm_breaker.py is meant to cut.
+#
+# Three files are written:
+#  <STEM>_derep.fasta: amplicons (ID_abundance headers, by decreasing
+#                      abundance, one line per sequence)
+#  <STEM>_derep.spec.ualn: assignment of each amplicon to the reference of
+#                          its taxon (blast6 format, as assign_taxa.sh)
+#  <STEM>_refs.fasta: reference sequences (one per taxon)
+
+
+
+from __future__ import division, print_function
+
+import os
+import random
+import sys
+from optparse import OptionParser
+
+from amplicon_store import external_sort
+
+NUCLEOTIDES = "acgt"
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program generates a synthetic data set (dereplicated
+    amplicons, taxonomic assignments and reference sequences) with a
+    known ground truth."""
+
+    parser = OptionParser(usage="usage: %prog [options] -o STEM",
+                          description=desc)
+
+    parser.add_option("-o", "--output",
+                      metavar="<STEM>",
+                      action="store",
+                      dest="stem",
+                      help="write the files <STEM>_derep.fasta, "
+                      "<STEM>_derep.spec.ualn and <STEM>_refs.fasta.")
+
+    parser.add_option("-n", "--taxa",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=100,
+                      dest="taxa",
+                      help="number of taxa. Default is 100.")
+
+    parser.add_option("-a", "--amplicons",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=100,
+                      dest="amplicons",
+                      help="number of amplicons per taxon (the data set has "
+                      "taxa * amplicons amplicons, plus the bridges). "
+                      "Default is 100.")
+
+    parser.add_option("-u", "--uneven",
+                      action="store_true",
+                      default=False,
+                      dest="uneven",
+                      help="draw the abundances of the taxa from a "
+                      "log-normal distribution (even by default).")
+
+    parser.add_option("--sigma",
+                      metavar="<FLOAT>",
+                      action="store",
+                      type="float",
+                      default=2.0,
+                      dest="sigma",
+                      help="standard deviation of the log-normal "
+                      "distribution of uneven data sets. Default is 2.0.")
+
+    parser.add_option("-m", "--mutations",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=4,
+                      dest="mutations",
+                      help="maximum number of mutations between an amplicon "
+                      "and the centroid of its taxon. Default is 4.")
+
+    parser.add_option("-b", "--bridges",
+                      metavar="<FLOAT>",
+                      action="store",
+                      type="float",
+                      default=0.1,
+                      dest="bridges",
+                      help="proportion of taxa bridged to a previous taxon. "
+                      "Default is 0.1.")
+
+    parser.add_option("-w", "--window",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=100,
+                      dest="window",
+                      help="bridge taxa to one of the <INTEGER> previous "
+                      "taxa (only their sequences are kept in memory). "
+                      "Default is 100.")
+
+    parser.add_option("-c", "--chain_depth",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=3,
+                      dest="chain_depth",
+                      help="number of rare amplicons on each bridge (the "
+                      "bridged centroids differ by chain_depth + 1 "
+                      "substitutions). Default is 3.")
+
+    parser.add_option("-l", "--length",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=250,
+                      dest="length",
+                      help="length of the centroids. Default is 250.")
+
+    parser.add_option("-s", "--seed",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=1,
+                      dest="seed",
+                      help="seed of the random generator. Default is 1.")
+
+    (options, args) = parser.parse_args()
+    if not options.stem:
+        parser.error("option -o is required")
+    if options.taxa < 1 or options.amplicons < 1 or options.window < 1:
+        parser.error("options -n, -a and -w must be positive")
+    return options
+
+
+def draw(choices, rng):
+    """
+    Pick a random element (the same with Python 2 and 3, unlike
+    random.choice).
+    """
+    return choices[int(rng.random() * len(choices))]
+
+
+def mutate(sequence, rng):
+    """
+    Apply one random mutation (substitution, insertion or deletion).
+    """
+    position = int(rng.random() * len(sequence))
+    kind = rng.random()
+    if kind < 0.6:
+        nucleotide = draw(NUCLEOTIDES.replace(sequence[position], ""), rng)
+        return sequence[:position] + nucleotide + sequence[position + 1:]
+    if kind < 0.8:
+        return (sequence[:position] + draw(NUCLEOTIDES, rng) +
+                sequence[position:])
+    return sequence[:position] + sequence[position + 1:]
+
+
+def substitutions(sequence, count, rng):
+    """
+    List the sequences obtained by applying count substitutions at
+    distinct positions, one after the other.
+    """
+    steps = list()
+    positions = list()
+    while len(positions) < min(count, len(sequence)):
+        position = int(rng.random() * len(sequence))
+        if position not in positions:
+            positions.append(position)
+    for position in positions:
+        nucleotide = draw(NUCLEOTIDES.replace(sequence[position], ""), rng)
+        sequence = sequence[:position] + nucleotide + sequence[position + 1:]
+        steps.append(sequence)
+    return steps
+
+
+def taxon_amplicons(centroid, count, max_mutations, scale, rng, seen):
+    """
+    Generate the amplicons of a taxon as (sequence, abundance, mutations)
+    triples: each new amplicon is one mutation away from a previous one,
+    at most max_mutations away from the centroid. The abundances
+    decrease with the number of mutations, and stay below the abundance
+    of the centroid (when it is above 1). Sequences already in one of
+    the sets of seen are skipped (and new ones are added to the first).
+    """
+    top_abundance = max(1, int(scale))
+    amplicons = [(centroid, top_abundance, 0)]
+    seen[0].add(centroid)
+    attempts = 0
+    while len(amplicons) < count and attempts < 100 * count:
+        attempts += 1
+        parent, parent_abundance, mutations = draw(amplicons, rng)
+        if mutations >= max_mutations:
+            continue
+        sequence = mutate(parent, rng)
+        if any(sequence in known for known in seen):
+            continue
+        seen[0].add(sequence)
+        abundance = max(1, min(top_abundance - 1,
+                               int(scale * rng.paretovariate(1.5) /
+                                   (10 * (mutations + 1) ** 2))))
+        amplicons.append((sequence, abundance, mutations + 1))
+    return amplicons
+
+
+def generate(options, references):
+    """
+    Generate the data set: write the reference sequences and list the
+    amplicons, in order of generation, as tab-separated lines
+    (abundance, identifier, reference, identity, sequence).
+
+    Duplicates are looked for among the sequences of the bridged taxa
+    of the same family. Only the sequences of the taxa that can still
+    be bridged to (the last options.window ones) are kept in memory.
+    """
+    rng = random.Random(options.seed)
+    centroids = list()
+    sequences = dict()  # sequences of each taxon of the window
+    families = dict()  # taxa of the window bridged to each other
+    number = 0
+    for taxon in range(options.taxa):
+        if options.uneven:
+            scale = 1000 * rng.lognormvariate(0, options.sigma)
+        else:
+            scale = 1000
+        reference = "ref%d" % taxon
+        records = list()
+        if taxon and rng.random() < options.bridges:
+            # derive the centroid from a previous one, through a chain of
+            # rare amplicons assigned to the closest centroid
+            start = max(0, taxon - options.window)
+            source = start + int(rng.random() * (taxon - start))
+            steps = substitutions(centroids[source],
+                                  options.chain_depth + 1, rng)
+            centroid, bridge = steps[-1], steps[:-1]
+            family = families[source]
+            seen = [set()] + [sequences[relative] for relative in family]
+            for step, sequence in enumerate(bridge):
+                if any(sequence in known for known in seen):
+                    continue
+                seen[0].add(sequence)
+                if step < len(bridge) // 2:
+                    records.append((sequence, 1, source, step + 1))
+                else:
+                    records.append((sequence, 1, taxon, len(bridge) - step))
+        else:
+            centroid = "".join(draw(NUCLEOTIDES, rng)
+                               for i in range(options.length))
+            family = list()
+            seen = [set()]
+        centroids.append(centroid)
+        family.append(taxon)
+        sequences[taxon] = seen[0]
+        families[taxon] = family
+        if taxon >= options.window:
+            # can no longer be bridged to
+            del sequences[taxon - options.window]
+            families.pop(taxon - options.window).remove(taxon -
+                                                        options.window)
+        print(">", reference, "\n", centroid, sep="", file=references)
+        for sequence, abundance, mutations in taxon_amplicons(
+                centroid, options.amplicons, options.mutations, scale, rng,
+                seen):
+            records.append((sequence, abundance, taxon, mutations))
+        for sequence, abundance, owner, mutations in records:
+            identity = 100.0 * (1 - mutations / options.length)
+            yield "%d\ts%d\tref%d\t%.1f\t%s" % (abundance, number, owner,
+                                                 identity, sequence)
+            number += 1
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    options = option_parser()
+    directory = os.path.dirname(options.stem)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    ## Generate the amplicons and sort them by decreasing abundance
+    ## (on disk if needed)
+    with open(options.stem + "_refs.fasta", "w") as references:
+        lines = external_sort(generate(options, references),
+                              lambda line: -int(line.split("\t", 1)[0]))
+
+    ## Write the amplicons and their assignments
+    with open(options.stem + "_derep.fasta", "w") as fasta:
+        with open(options.stem + "_derep.spec.ualn", "w") as ualn:
+            for line in lines:
+                (abundance, amplicon, reference, identity,
+                 sequence) = line.split("\t")
+                name = amplicon + "_" + abundance
+                length = str(len(sequence))
+                print(">", name, "\n", sequence, sep="", file=fasta)
+                print(name, reference, identity, length, "0", "0", "1",
+                      length, "1", length, "-1", "0", sep="\t", file=ualn)
+
+    sys.exit(0)
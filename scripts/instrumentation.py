@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Opt-in instrumentation of the python scripts: when the environment
+# variable GEFAST_PROFILE names a file, the phases of each script (parse,
+# graph building, breaking, output, confusion table, metrics...) are timed
+# and their costs are appended to that file as JSON lines, one line per
+# phase and per process, when the script exits:
+#
+#  {"script": "swarm_breaker.py", "phase": "breaking", "calls": 12,
+#   "wall": 1.52, "cpu": 1.49, "children_cpu": 0.0, "traced_peak": null,
+#   "maxrss": 51234, "pid": 4242, "start": 1530000000.0,
+#   "command": "scripts/swarm_breaker.py -f ...", "label": "..."}
+#
+# Times are in seconds (summed over the calls of the phase), maxrss is the
+# peak resident set size of the process (kB, from getrusage) at the end of
+# the phase and traced_peak the peak of the memory allocated by python
+# (bytes, from tracemalloc, python 3 only), both since the start of the
+# process. The optional GEFAST_PROFILE_LABEL is copied to the "label"
+# field, and the command can be matched with the %C column of the logs of
+# /usr/bin/time. GEFAST_PROFILE_TRACEMALLOC=1 turns on tracemalloc (which
+# slows the scripts down noticeably).
+#
+# Without GEFAST_PROFILE, phase() does nothing. Run as a script, converts
+# such a file to CSV (one line per record), to be joined with the logs.
+
+
+
+from __future__ import print_function
+
+import atexit
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from optparse import OptionParser
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CSV_FIELDS = ["label", "script", "phase", "calls", "wall", "cpu",
+              "children_cpu", "maxrss", "traced_peak", "pid", "command"]
+PROFILE_VARIABLE = "GEFAST_PROFILE"
+LABEL_VARIABLE = "GEFAST_PROFILE_LABEL"
+TRACEMALLOC_VARIABLE = "GEFAST_PROFILE_TRACEMALLOC"
+
+
+def usage():
+    """
+    CPU times of the process and of its (terminated) children, and peak
+    resident set size of the process (kB).
+    """
+    if resource is None:
+        times = os.times()
+        return times[0] + times[1], times[2] + times[3], None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (own.ru_utime + own.ru_stime,
+            children.ru_utime + children.ru_stime, own.ru_maxrss)
+
+
+class Profiler(object):
+    """
+    Accumulate the costs of the phases of a script and write them to a
+    JSON-lines file at exit.
+    """
+
+    def __init__(self, sink, label=None, trace=False):
+        self.sink = sink
+        self.label = label
+        self.pid = os.getpid()
+        self.phases = dict()
+        self.order = list()
+        self.tracemalloc = None
+        if trace:
+            try:
+                import tracemalloc
+                tracemalloc.start()
+                self.tracemalloc = tracemalloc
+            except ImportError:
+                pass
+        atexit.register(self.write)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block as (a part of) phase name.
+        """
+        start = time.time()
+        cpu, children_cpu, maxrss = usage()
+        try:
+            yield
+        finally:
+            end_cpu, end_children_cpu, maxrss = usage()
+            record = self.phases.get(name)
+            if record is None:
+                record = {"phase": name, "calls": 0, "wall": 0.0,
+                          "cpu": 0.0, "children_cpu": 0.0, "start": start}
+                self.phases[name] = record
+                self.order.append(name)
+            record["calls"] += 1
+            record["wall"] += time.time() - start
+            record["cpu"] += end_cpu - cpu
+            record["children_cpu"] += end_children_cpu - children_cpu
+            record["maxrss"] = maxrss
+            if self.tracemalloc is not None:
+                record["traced_peak"] = self.tracemalloc.get_traced_memory()[1]
+
+    def write(self):
+        """
+        Append one line per phase to the sink (only in the process that
+        created the profiler, not in forked workers).
+        """
+        if os.getpid() != self.pid or not self.order:
+            return
+        lines = list()
+        for name in self.order:
+            record = dict(self.phases[name])
+            record.setdefault("traced_peak", None)
+            record.update({"script": os.path.basename(sys.argv[0]),
+                           "pid": self.pid,
+                           "command": " ".join(sys.argv),
+                           "label": self.label})
+            lines.append(json.dumps(record, sort_keys=True) + "\n")
+        # a single write per process, so that concurrent scripts can
+        # share the sink
+        descriptor = os.open(self.sink,
+                             os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(descriptor, "".join(lines).encode("utf-8"))
+        finally:
+            os.close(descriptor)
+        self.order = list()
+
+
+@contextmanager
+def no_phase():
+    """
+    Context manager doing nothing.
+    """
+    yield
+
+
+PROFILER = None
+
+
+def phase(name):
+    """
+    Context manager timing a phase of the running script (does nothing
+    unless GEFAST_PROFILE is set).
+    """
+    global PROFILER
+    if PROFILER is None:
+        sink = os.environ.get(PROFILE_VARIABLE)
+        if sink:
+            PROFILER = Profiler(sink, os.environ.get(LABEL_VARIABLE),
+                                os.environ.get(TRACEMALLOC_VARIABLE) == "1")
+        else:
+            PROFILER = False
+    if not PROFILER:
+        return no_phase()
+    return PROFILER.phase(name)
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    parser = OptionParser(usage="usage: %prog FILENAME...",
+                          description="""This program converts files of
+                          per-phase costs (JSON lines) to CSV.""")
+    (options, args) = parser.parse_args()
+    if not args:
+        parser.error("a file of per-phase costs is required")
+
+    ## Print one CSV line per record
+    print(",".join(CSV_FIELDS))
+    for profile in args:
+        with open(profile, "r") as profile:
+            for line in profile:
+                record = json.loads(line)
+                values = ["" if record.get(field) is None
+                          else str(record[field]) for field in CSV_FIELDS]
+                # the command is the last column, without quoting
+                print(",".join(values))
+
+    sys.exit(0)
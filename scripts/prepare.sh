@@ -11,8 +11,6 @@
 
 
 
-SWARM=tools/Swarm-2.1.13
-
 # ===== ELDERMET data set =====
 
 # 1) Download
@@ -34,17 +32,11 @@ do
 	wget -P data/eldermet ftp://ftp.sra.ebi.ac.uk/vol1/fastq/SRR136/SRR${r}/SRR${r}.fastq.gz
 done
 
-# 2) Combine into a single FASTA file
-cat data/eldermet/SRR*.fastq.gz > data/eldermet/eldermet.fastq.gz
-seqtk seq -a data/eldermet/eldermet.fastq.gz > data/eldermet/eldermet_raw.fasta
+# 2) Combine into a single FASTA file, remove sequences containing n/N
+# and dereplicate (one pass over the compressed runs)
+python scripts/dereplicate.py -a 1 -o data/eldermet/eldermet_derep.fasta data/eldermet/SRR*.fastq.gz
 rm data/eldermet/*.fastq.gz
 
-# 3) Remove sequences containing n/N
-python scripts/removeN.py data/eldermet/eldermet_raw.fasta data/eldermet/eldermet.fasta
-
-# 4) Dereplicate
-./${SWARM} -d 0 -a 1 -w data/eldermet/eldermet_derep.fasta data/eldermet/eldermet.fasta > /dev/null
-
 
 # ===== Even data set =====
 
@@ -53,11 +45,8 @@ wget -P data/even http://sbr2.sb-roscoff.fr/download/externe/de/fmahe/even.fasta
 bzip2 -d data/even/even.fasta.bz2
 mv data/even/even.fasta data/even/even_raw.fasta
 
-# 2) Remove sequences containing n/N
-python scripts/removeN.py data/even/even_raw.fasta data/even/even.fasta
-
-# 3) Dereplicate
-./${SWARM} -d 0 -a 1 -w data/even/even_derep.fasta data/even/even.fasta > /dev/null
+# 2) Remove sequences containing n/N and dereplicate
+python scripts/dereplicate.py -a 1 -o data/even/even_derep.fasta data/even/even_raw.fasta
 
 
 # ===== Uneven data set =====
@@ -67,10 +56,7 @@ wget -P data/uneven http://sbr2.sb-roscoff.fr/download/externe/de/fmahe/uneven.f
 bzip2 -d data/uneven/uneven.fasta.bz2
 mv data/uneven/uneven.fasta data/uneven/uneven_raw.fasta
 
-# 2) Remove sequences containing n/N
-python scripts/removeN.py data/uneven/uneven_raw.fasta data/uneven/uneven.fasta
-
-# 3) Dereplicate
-./${SWARM} -d 0 -a 1 -w data/uneven/uneven_derep.fasta data/uneven/uneven.fasta > /dev/null
+# 2) Remove sequences containing n/N and dereplicate
+python scripts/dereplicate.py -a 1 -o data/uneven/uneven_derep.fasta data/uneven/uneven_raw.fasta
 
 
@@ -2,17 +2,123 @@
 # https://www.biostars.org/p/183279/
 #
 # Removes sequences containing n/N
+#
+# The fasta file is streamed in large blocks, cut on record boundaries, and
+# the records are filtered and written as Biopython's SeqIO.write does
+# (header line, sequence wrapped at 60 characters), without building any
+# intermediate list of records. The blocks can be filtered by several
+# processes (a few blocks at a time, so that memory stays bounded), the
+# output order is kept.
+
 
 
+from __future__ import print_function
 
+import itertools
+import multiprocessing
 import sys
-from Bio import SeqIO
+from optparse import OptionParser
+
+from instrumentation import phase
+
+LINE_LENGTH = 60
+WHITESPACE = b" \t\r\n"
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    parser = OptionParser(usage="usage: %prog [options] INPUT OUTPUT")
+
+    parser.add_option("-j", "--jobs",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=1,
+                      dest="jobs",
+                      help="filter the blocks of the input file with "
+                      "<INTEGER> processes. Default is 1.")
+
+    parser.add_option("-b", "--block_size",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=2**23,
+                      dest="block_size",
+                      help="read the input file in blocks of about "
+                      "<INTEGER> bytes. Default is 8 MiB.")
+
+    (options, args) = parser.parse_args()
+    if len(args) != 2:
+        parser.error("an input and an output file are required")
+    return args[0], args[1], options.jobs, options.block_size
+
+
+def fasta_blocks(handle, block_size):
+    """
+    Read a fasta file (opened in binary mode) in blocks of complete
+    records, each block starting with the ">" of its first header.
+    """
+    pending = handle.read(block_size)
+    if pending and not pending.startswith(b">"):
+        raise ValueError("fasta file does not start with a header line")
+    while True:
+        data = handle.read(block_size)
+        if not data:
+            break
+        data = pending + data
+        end = data.rfind(b"\n>")
+        if end < 0:
+            pending = data
+            continue
+        pending = data[end + 1:]
+        yield data[:end + 1]
+    if pending:
+        yield pending
+
+
+def filter_block(block):
+    """
+    Drop the records containing n/N from a block of fasta records, and
+    format the other records (header, sequence without whitespace and
+    wrapped at LINE_LENGTH characters).
+    """
+    output = list()
+    for record in block[1:].split(b"\n>"):
+        header_end = record.find(b"\n")
+        if header_end < 0:
+            header_end = len(record)
+        sequence = record[header_end + 1:]
+        if b"N" in sequence or b"n" in sequence:
+            continue
+        sequence = sequence.translate(None, WHITESPACE)
+        output.append(b">" + record[:header_end].rstrip() + b"\n")
+        for i in range(0, len(sequence), LINE_LENGTH):
+            output.append(sequence[i:i + LINE_LENGTH] + b"\n")
+    return b"".join(output)
+
+
+if __name__ == '__main__':
 
-handle = open(sys.argv[1], "rU")
-output_handle = open(sys.argv[2], "w")
+    ## Parse command-line arguments
+    input_file, output_file, jobs, block_size = option_parser()
 
-filtered = [record for record in SeqIO.parse(handle, "fasta") if ((record.seq.count('N') == 0) and (record.seq.count('n') == 0))]
-SeqIO.write(filtered, output_handle, "fasta")
+    ## Filter and write the records, block by block
+    with phase("filter"), open(input_file, "rb") as handle:
+        with open(output_file, "wb") as output_handle:
+            blocks = fasta_blocks(handle, block_size)
+            if jobs > 1:
+                pool = multiprocessing.Pool(jobs)
+                batch = list(itertools.islice(blocks, 2 * jobs))
+                while batch:
+                    for filtered in pool.map(filter_block, batch):
+                        output_handle.write(filtered)
+                    batch = list(itertools.islice(blocks, 2 * jobs))
+                pool.close()
+                pool.join()
+            else:
+                for block in blocks:
+                    output_handle.write(filter_block(block))
 
-output_handle.close()
-handle.close()
+    sys.exit(0)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Content-addressed cache of evaluation results, so that reruns of the
+# analyses skip the clusterings (and metrics) that have already been
+# computed. A result is keyed on the SHA-1 checksums of its input files
+# (data set, ground truths, configuration), of the binaries involved and
+# on the full command line. Results are stored as
+# <CACHE>/<key[:2]>/<key>/ directories (output files and metadata) and
+# evicted by age of last use and / or total size (least recently used
+# first).
+#
+# As a command wrapper: runs the command unless a result for the same key
+# exists, in which case the output files are restored instead. The rows
+# the command appends to a log file (-l, e.g. time and memory written by
+# /usr/bin/time -a) are stored with the outputs and appended again when
+# they are restored.
+
+
+
+from __future__ import division, print_function
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program runs a command and stores its output files in
+    a cache, or restores them from the cache if the command has already
+    been run with the same input files and binaries."""
+
+    parser = OptionParser(usage="usage: %prog -c DIRECTORY [-i FILENAME]... "
+                          "[-b FILENAME]... -o FILENAME... -- COMMAND",
+                          description=desc)
+    parser.disable_interspersed_args()
+
+    parser.add_option("-c", "--cache",
+                      metavar="<DIRECTORY>",
+                      action="store",
+                      dest="cache_dir",
+                      help="store the results in <DIRECTORY>.")
+
+    parser.add_option("-i", "--input",
+                      metavar="<FILENAME>",
+                      action="append",
+                      default=list(),
+                      dest="inputs",
+                      help="input file of the command (repeatable).")
+
+    parser.add_option("-b", "--binary",
+                      metavar="<FILENAME>",
+                      action="append",
+                      default=list(),
+                      dest="binaries",
+                      help="binary or script run by the command "
+                      "(repeatable).")
+
+    parser.add_option("-o", "--output",
+                      metavar="<FILENAME>",
+                      action="append",
+                      default=list(),
+                      dest="outputs",
+                      help="output file of the command (repeatable).")
+
+    parser.add_option("-l", "--log",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="log_file",
+                      help="log file the command appends to (as one of its "
+                      "arguments); its rows are stored and restored with the "
+                      "outputs.")
+
+    parser.add_option("--max_size",
+                      metavar="<MEGABYTES>",
+                      action="store",
+                      type="float",
+                      default=0,
+                      dest="max_size",
+                      help="evict the least recently used results beyond "
+                      "<MEGABYTES> (0 = no limit, default).")
+
+    parser.add_option("--max_age",
+                      metavar="<DAYS>",
+                      action="store",
+                      type="float",
+                      default=0,
+                      dest="max_age",
+                      help="evict the results not used for <DAYS> days "
+                      "(0 = no limit, default).")
+
+    (options, args) = parser.parse_args()
+    if args and args[0] == "--":
+        args = args[1:]
+    if not options.cache_dir or not options.outputs or not args:
+        parser.error("options -c and -o and a command are required")
+    return (options.cache_dir, options.inputs, options.binaries,
+            options.outputs, args, options.log_file, options.max_size,
+            options.max_age)
+
+
+def file_digest(path, block_size=2**20):
+    """
+    SHA-1 checksum of a file.
+    """
+    checksum = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+class ResultCache(object):
+    """
+    Directory of results (lists of files) indexed by keys. Checksums of
+    input files are memoised on (path, size, modification time).
+    """
+
+    def __init__(self, cache_dir, max_size=0, max_age=0):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 2**20
+        self.max_age = max_age * 86400
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                if not os.path.isdir(cache_dir):
+                    raise
+
+    def digest(self, path):
+        """
+        Checksum of a file (memoised).
+        """
+        status = os.stat(path)
+        signature = "%s:%d:%r" % (os.path.abspath(path), status.st_size,
+                                  status.st_mtime)
+        memo = os.path.join(self.cache_dir, "digests",
+                            hashlib.sha1(signature.encode("utf-8")).hexdigest())
+        try:
+            with open(memo, "r") as handle:
+                return handle.read().strip()
+        except (IOError, OSError):
+            pass
+        digest = file_digest(path)
+        write_atomically(memo, digest)
+        return digest
+
+    def key(self, inputs=(), binaries=(), command=(), extra=()):
+        """
+        Key of a result: checksums of the input files and binaries,
+        command line and any other distinguishing strings.
+        """
+        parts = (["input:" + self.digest(path) for path in inputs] +
+                 ["binary:" + self.digest(path) for path in binaries] +
+                 ["command:" + " ".join(command)] +
+                 ["extra:" + part for part in extra])
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        """
+        Directory of the result stored under the key.
+        """
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        """
+        Files of the result stored under the key (None if absent). The
+        result is marked as used.
+        """
+        entry = self.path(key)
+        metadata = os.path.join(entry, "meta.json")
+        if not os.path.exists(metadata):
+            return None
+        os.utime(metadata, None)
+        with open(metadata, "r") as handle:
+            count = len(json.load(handle)["files"])
+        return [os.path.join(entry, str(k)) for k in range(count)]
+
+    def restore(self, key, outputs):
+        """
+        Copy the files of a result to the outputs (False if absent).
+        """
+        files = self.lookup(key)
+        if files is None or len(files) != len(outputs):
+            return False
+        for stored, output in zip(files, outputs):
+            shutil.copyfile(stored, output)
+        return True
+
+    def store(self, key, files, description=""):
+        """
+        Store (copies of) files as the result of the key, then evict
+        old results if needed.
+        """
+        entry = self.path(key)
+        if not os.path.isdir(os.path.dirname(entry)):
+            try:
+                os.makedirs(os.path.dirname(entry))
+            except OSError:
+                pass
+        temporary = tempfile.mkdtemp(prefix=key + ".",
+                                     dir=os.path.dirname(entry))
+        try:
+            for k, path in enumerate(files):
+                shutil.copyfile(path, os.path.join(temporary, str(k)))
+            with open(os.path.join(temporary, "meta.json"), "w") as handle:
+                json.dump({"files": [os.path.basename(path) for path in files],
+                           "description": description,
+                           "created": time.time()}, handle, sort_keys=True)
+            if not os.path.exists(entry):
+                os.rename(temporary, entry)
+        except OSError:
+            # stored concurrently by another process
+            if not os.path.exists(entry):
+                raise
+        finally:
+            if os.path.isdir(temporary):
+                shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """
+        List the stored results as (last use, size, path) triples.
+        """
+        entries = list()
+        for prefix in os.listdir(self.cache_dir):
+            directory = os.path.join(self.cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for key in os.listdir(directory):
+                entry = os.path.join(directory, key)
+                metadata = os.path.join(entry, "meta.json")
+                if not os.path.exists(metadata):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry, name))
+                           for name in os.listdir(entry))
+                entries.append((os.path.getmtime(metadata), size, entry))
+        return entries
+
+    def evict(self):
+        """
+        Remove the results unused for more than max_age seconds, then
+        the least recently used ones until the cache fits in max_size
+        bytes (no limit if zero).
+        """
+        if not self.max_size and not self.max_age:
+            return
+        entries = sorted(self.entries(), reverse=True)
+        total = 0
+        now = time.time()
+        for last_use, size, entry in entries:
+            total += size
+            if ((self.max_age and now - last_use > self.max_age) or
+                (self.max_size and total > self.max_size)):
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+def append_file(source, target):
+    """
+    Append the content of a file to another one.
+    """
+    with open(source, "rb") as source:
+        with open(target, "ab") as target:
+            shutil.copyfileobj(source, target)
+
+
+def write_atomically(path, text):
+    """
+    Write a small text file through a temporary file.
+    """
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            pass
+    handle, temporary = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, "w") as output:
+        output.write(text)
+    os.rename(temporary, path)
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    (cache_dir, inputs, binaries, outputs, command, log_file, max_size,
+     max_age) = option_parser()
+
+    ## Restore the outputs, or run the command and store them
+    cache = ResultCache(cache_dir, max_size, max_age)
+    key = cache.key(inputs, binaries, command)
+    if log_file:
+        # the command logs to a fragment, stored as an extra output
+        handle, fragment = tempfile.mkstemp(suffix=".log")
+        os.close(handle)
+        stored = outputs + [fragment]
+    else:
+        stored = outputs
+    try:
+        if cache.restore(key, stored):
+            print("result_cache: reused", key, file=sys.stderr)
+            status = 0
+        else:
+            status = subprocess.call([fragment if log_file and
+                                      argument == log_file else argument
+                                      for argument in command])
+            if status == 0 and all(os.path.exists(path) for path in outputs):
+                cache.store(key, stored, " ".join(command))
+        if log_file:
+            append_file(fragment, log_file)
+    finally:
+        if log_file:
+            os.remove(fragment)
+
+    sys.exit(status)
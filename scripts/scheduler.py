@@ -0,0 +1,721 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Runs the clustering-quality analyses (analysis_quality.sh and
+# analysis_subsamples_fixed.sh) as a graph of jobs instead of nested
+# loops: input preparation, ground truths, clusterings, metrics,
+# collection of the metrics and visualisation. Independent jobs run in
+# parallel within a budget of cores.
+#
+# The clusterings (whose runtime and memory are logged with
+# /usr/bin/time) are "timed" jobs: by default, each one runs alone, and
+# the other jobs (metrics of the previous clusterings...) only run when
+# no clustering is waiting. With --pin, timed jobs run one at a time on
+# the first core while the other jobs share the remaining cores (taskset).
+#
+# Finished jobs are recorded in a state file: after an interruption, the
+# same command resumes the analysis, rerunning only the jobs that did
+# not finish, whose command changed, that depend on a rerun job or whose
+# outputs are needed but missing.
+#
+# The commands, log file and metrics files are the same as with the
+# shell scripts (metrics are written to one file per job and then
+# concatenated in the order of the shell loops), except that the
+# clusterings of the subsamples are written to one directory per
+# repetition, so that they can run in parallel.
+
+
+
+from __future__ import division, print_function
+
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from optparse import OptionParser
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
+
+SWARM_V1 = "tools/Swarm-1.2.3"
+SWARM_V2 = "tools/Swarm-2.1.13"
+GEFAST = "tools/GeFaST"
+CONF = "gefast.conf"
+USEARCH = "tools/usearch10.0.240_i86linux32"  # adjust to your system
+VSEARCH = "tools/vsearch"
+CDHIT = "tools/cd-hit"
+DNACLUST = "tools/dnaclust"
+SUMACLUST = "tools/sumaclust"
+SWARM_BREAKER = "scripts/swarm_breaker.py"
+COMPUTE_METRICS = "scripts/compute_metrics.sh"
+
+OUTDIR = "results"
+GROUND_TRUTH_THRESHOLDS = ["0.95", "0.97", "0.99"]
+METRICS_HEADER = "method,threshold,rep,recall,precision,nmi,randindex,adjrandindex"
+METRICS = ["recall", "precision", "nmi", "randindex", "adjrandindex"]
+
+# Clustering methods: name (in the metrics files), result file (quality
+# analysis, subsample analysis), input file (plain, sorted by length or
+# abundance...), binaries, command, clustering file written by the
+# command (any format of clustering_readers.py), threshold as identity
+# (instead of t)
+Method = namedtuple("Method", ["name", "result", "sub_result", "input",
+                               "binaries", "command", "output",
+                               "identity"])
+
+METHODS = [
+    Method("swarm-v1", "swarm-v1_o_%(t)d.csv", "swarm-v1_o_%(t)d.csv",
+           "infile", [SWARM_V1, SWARM_BREAKER],
+           SWARM_V1 + " -d %(t)d -o %(res)s.tmp %(infile)s; \t"
+           "python " + SWARM_BREAKER + " -b " + SWARM_V1 +
+           " -f %(infile)s -s %(res)s.tmp -d %(t)d > %(res)s",
+           "%(res)s", False),
+    Method("swarm-v2", "swarm-v2_o_%(t)d.csv", "swarm-v2_o_%(t)d.csv",
+           "infile", [SWARM_V2],
+           SWARM_V2 + " -d %(t)d -o %(res)s -a 1 %(infile)s",
+           "%(res)s", False),
+    Method("swarm-v2-2f", "swarm-v2_s_%(t)d_f.csv", "swarm-v2_s_%(t)d_f.csv",
+           "infile", [SWARM_V2],
+           SWARM_V2 + " -f -d %(t)d -o %(res)s -a 1 %(infile)s",
+           "%(res)s", False),
+    Method("gefast-e", "gefast-e_o_%(t)d.csv", "gefast-e_o_%(t)d_e.csv",
+           "infile", [CONF, GEFAST],
+           GEFAST + " %(infile)s -t %(t)d --config " + CONF + " -so %(res)s",
+           "%(res)s", False),
+    Method("gefast-e-f1", "gefast-e_o_%(t)d_f1.csv",
+           "gefast-e_o_%(t)d_ef1.csv", "infile", [CONF, GEFAST],
+           GEFAST + " %(infile)s -t %(t)d --config " + CONF + " -so %(res)s"
+           " -sf --swarm-fastidious-threshold %(t1)d",
+           "%(res)s", False),
+    Method("gefast-e-2f", "gefast-e_o_%(t)d_2f.csv",
+           "gefast-e_o_%(t)d_e2f.csv", "infile", [CONF, GEFAST],
+           GEFAST + " %(infile)s -t %(t)d --config " + CONF + " -so %(res)s"
+           " -sf --swarm-fastidious-threshold %(t2)d",
+           "%(res)s", False),
+    Method("gefast-s", "gefast-s_o_%(t)d.csv", "gefast-s_o_%(t)d_s.csv",
+           "infile", [CONF, GEFAST],
+           GEFAST + " %(infile)s -t %(t)d --config " + CONF + " -so %(res)s"
+           " --use-score",
+           "%(res)s", False),
+    Method("gefast-s-f1", "gefast-s_o_%(t)d_f1.csv",
+           "gefast-s_o_%(t)d_sf1.csv", "infile", [CONF, GEFAST],
+           GEFAST + " %(infile)s -t %(t)d --config " + CONF + " -so %(res)s"
+           " --use-score -sf --swarm-fastidious-threshold %(t1)d",
+           "%(res)s", False),
+    Method("gefast-s-2f", "gefast-s_o_%(t)d_2f.csv",
+           "gefast-s_o_%(t)d_s2f.csv", "infile", [CONF, GEFAST],
+           GEFAST + " %(infile)s -t %(t)d --config " + CONF + " -so %(res)s"
+           " --use-score -sf --swarm-fastidious-threshold %(t2)d",
+           "%(res)s", False),
+    Method("usearch-fast-length", "usearch-fast-length_%(t)d.csv",
+           "usearch-fast-length_%(t)d.csv", "alt", [USEARCH],
+           USEARCH + " -threads 1 -cluster_fast %(alt)s -id %(id)s"
+           " -uc %(res)s.uc -sort length -fulldp",
+           "%(res)s.uc", True),
+    Method("usearch-fast-abund", "usearch-fast-abund_%(t)d.csv",
+           "usearch-fast-abund_%(t)d.csv", "alt", [USEARCH],
+           USEARCH + " -threads 1 -cluster_fast %(alt)s -id %(id)s"
+           " -uc %(res)s.uc -sort size -fulldp",
+           "%(res)s.uc", True),
+    Method("usearch-small-length", "usearch-small-length_%(t)d.csv",
+           "usearch-small-length_%(t)d.csv", "alt_length", [USEARCH],
+           USEARCH + " -cluster_smallmem %(alt_length)s -id %(id)s"
+           " -uc %(res)s.uc -sortedby length -fulldp",
+           "%(res)s.uc", True),
+    Method("usearch-small-abund", "usearch-small-abund_%(t)d.csv",
+           "usearch-small-abund_%(t)d.csv", "alt_abundance", [USEARCH],
+           USEARCH + " -cluster_smallmem %(alt_abundance)s -id %(id)s"
+           " -uc %(res)s.uc -sortedby size -fulldp",
+           "%(res)s.uc", True),
+    Method("vsearch-fast-length", "vsearch-fast-length_%(t)d.csv",
+           "vsearch-fast-length_%(t)d.csv", "alt", [VSEARCH],
+           VSEARCH + " -threads 1 -cluster_fast %(alt)s -id %(id)s"
+           " -uc %(res)s.uc -minsize 1",
+           "%(res)s.uc", True),
+    Method("vsearch-size-abund", "vsearch-size-abundance_%(t)d.csv",
+           "vsearch-size-abundance_%(t)d.csv", "alt", [VSEARCH],
+           VSEARCH + " -threads 1 -cluster_size %(alt)s -id %(id)s"
+           " -uc %(res)s.uc -minsize 1",
+           "%(res)s.uc", True),
+    Method("vsearch-small-length", "vsearch-small-length_%(t)d.csv",
+           "vsearch-small-length_%(t)d.csv", "alt_length", [VSEARCH],
+           VSEARCH + " -threads 1 -cluster_smallmem %(alt_length)s"
+           " -id %(id)s -uc %(res)s.uc -minsize 1",
+           "%(res)s.uc", True),
+    Method("vsearch-small-abund", "vsearch-small-abund_%(t)d.csv",
+           "vsearch-small-abund_%(t)d.csv", "alt_abundance", [VSEARCH],
+           VSEARCH + " -threads 1 -cluster_smallmem %(alt_abundance)s"
+           " -id %(id)s -uc %(res)s.uc -minsize 1 -usersort",
+           "%(res)s.uc", True),
+    Method("cd-hit", "cdhit_%(t)d.csv", "cdhit_%(t)d.csv", "infile", [CDHIT],
+           CDHIT + " -i %(infile)s -o %(res)s.tmp -c %(id)s -d 0 -T 1 -M 0",
+           "%(res)s.tmp.clstr", True),
+    Method("dnaclust", "dnaclust_%(t)d.csv", "dnaclust_%(t)d.csv", "infile",
+           [DNACLUST],
+           DNACLUST + " -s %(id)s -i %(infile)s -t 1"
+           " | sed 's/\\t/ /g; s/ $//g' > %(res)s",
+           "%(res)s", True),
+    Method("sumaclust", "sumaclust_%(t)d.csv", "sumaclust_%(t)d.csv",
+           "infile", [SUMACLUST],
+           SUMACLUST + " -t %(id)s -O %(res)s.sumaclust %(infile)s > /dev/null",
+           "%(res)s.sumaclust", True),
+]
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program runs a clustering-quality analysis (same
+    arguments as analysis_quality.sh or analysis_subsamples_fixed.sh) as
+    a graph of jobs run in parallel."""
+
+    parser = OptionParser(usage="usage: %prog [options] quality DATA_SET "
+                          "REFS MIN_T MAX_T\n"
+                          "       %prog [options] subsamples_fixed DATA_SET "
+                          "REFS MIN_T MAX_T GROUND_TRUTH_THRESHOLD "
+                          "PROPORTION REPETITIONS [SEED]",
+                          description=desc)
+
+    parser.add_option("-j", "--cores",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=multiprocessing.cpu_count(),
+                      dest="cores",
+                      help="run jobs using at most <INTEGER> cores. "
+                      "Default is the number of cores.")
+
+    parser.add_option("-p", "--pin",
+                      action="store_true",
+                      default=False,
+                      dest="pin",
+                      help="run the timed jobs (clusterings) on one core, "
+                      "alongside the other jobs on the other cores, instead "
+                      "of alone.")
+
+    parser.add_option("-s", "--state",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="state_file",
+                      help="record the finished jobs in <FILENAME> (resume "
+                      "from it). Default is "
+                      "results/DATA_SET-ANALYSIS-jobs.state.")
+
+    parser.add_option("-b", "--bootstrap",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=0,
+                      dest="bootstrap",
+                      help="also compute the bootstrap confidence intervals "
+                      "of the metrics from <INTEGER> replicates (columns "
+                      "<metric>_low and <metric>_high, see cluster_metrics.py)"
+                      ". Default is none.")
+
+    parser.add_option("-n", "--dry_run",
+                      action="store_true",
+                      default=False,
+                      dest="dry_run",
+                      help="list the jobs (and whether they would run) "
+                      "without running them.")
+
+    parser.add_option("-v", "--verbose",
+                      action="store_true",
+                      default=False,
+                      dest="verbose",
+                      help="report the start and end of the jobs.")
+
+    (options, args) = parser.parse_args()
+    arities = {"quality": [5], "subsamples_fixed": [8, 9]}
+    if not args or len(args) not in arities.get(args[0], []):
+        parser.error("wrong analysis or number of arguments")
+    if options.cores < 1 or (options.pin and options.cores < 2):
+        parser.error("at least one core (two with --pin) is required")
+    if options.bootstrap < 0:
+        parser.error("option -b must be positive")
+    if not options.state_file:
+        options.state_file = os.path.join(OUTDIR, "%s-%s-jobs.state" %
+                                          (args[1], args[0]))
+    return options, args[0], args[1:]
+
+
+def which(program):
+    """
+    Path of an executable found in PATH (None if absent).
+    """
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        path = os.path.join(directory, program)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+class Job(object):
+    """
+    Shell command, with the jobs it depends on, the number of cores it
+    uses, whether it is timed and the files it produces.
+    """
+
+    def __init__(self, name, command, requires=(), cores=1, timed=False,
+                 outputs=()):
+        self.name = name
+        self.command = command
+        self.requires = list(requires)
+        self.cores = cores
+        self.timed = timed
+        self.outputs = list(outputs)
+        self.digest = hashlib.sha1(command.encode("utf-8")).hexdigest()
+
+
+class Scheduler(object):
+    """
+    Run jobs as their requirements finish, within a budget of cores,
+    timed jobs alone (or pinned to core 0). Jobs are started in the
+    order they were added. Finished jobs are recorded in a state file.
+    """
+
+    def __init__(self, cores, state_file, pin=False, verbose=False):
+        self.cores = cores
+        self.state_file = state_file
+        self.pin = pin
+        self.verbose = verbose
+        self.jobs = list()
+        self.index = dict()
+        if pin:
+            # first available core for the timed jobs, the others for
+            # the other jobs
+            if not which("taskset"):
+                raise OSError("--pin requires taskset")
+            try:
+                available = sorted(os.sched_getaffinity(0))
+            except AttributeError:
+                available = list(range(multiprocessing.cpu_count()))
+            if len(available) < 2:
+                raise OSError("--pin requires at least two cores")
+            available = available[:cores]
+            self.cores = len(available)
+            self.pinned = (str(available[0]),
+                           ",".join(str(core) for core in available[1:]))
+
+    def add(self, name, command, requires=(), cores=1, timed=False,
+            outputs=()):
+        """
+        Add a job (its requirements must have been added before).
+        Return its name.
+        """
+        if name in self.index:
+            raise ValueError("duplicate job: " + name)
+        for requirement in requires:
+            if requirement not in self.index:
+                raise ValueError("unknown requirement of %s: %s" %
+                                 (name, requirement))
+        job = Job(name, command, requires, cores, timed, outputs)
+        self.index[name] = job
+        self.jobs.append(job)
+        return name
+
+    def finished(self):
+        """
+        Read the state file (job name -> digest of the command).
+        """
+        finished = dict()
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r") as state:
+                for line in state:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # interrupted while writing
+                    finished[record["job"]] = record["digest"]
+        return finished
+
+    def stale(self):
+        """
+        Names of the jobs to run: not finished (or with another
+        command), depending on a job to run, or finished but with
+        missing outputs needed by a job to run.
+        """
+        finished = self.finished()
+        # jobs with new results, and the jobs depending on them
+        # (requirements come first)
+        changed = set()
+        for job in self.jobs:
+            if (finished.get(job.name) != job.digest or
+                any(requirement in changed for requirement in job.requires)):
+                changed.add(job.name)
+        # jobs whose (unchanged) results have to be produced again
+        # (dependents come first)
+        stale = set(changed)
+        for job in reversed(self.jobs):
+            if job.name not in stale:
+                continue
+            for requirement in job.requires:
+                outputs = self.index[requirement].outputs
+                if not all(os.path.exists(path) for path in outputs):
+                    stale.add(requirement)
+        return stale
+
+    def record(self, job):
+        """
+        Append a finished job to the state file.
+        """
+        with open(self.state_file, "a") as state:
+            state.write(json.dumps({"job": job.name, "digest": job.digest,
+                                    "end": time.time()}) + "\n")
+
+    def launch(self, job):
+        """
+        Start the command of a job (pinned to its cores if needed).
+        """
+        command = job.command
+        if self.pin:
+            cores = self.pinned[0] if job.timed else self.pinned[1]
+            command = "taskset -c %s /bin/bash -c %s" % (cores, quote(command))
+        if self.verbose:
+            print("# start", job.name, file=sys.stderr)
+        return subprocess.Popen(["/bin/bash", "-c", command])
+
+    def startable(self, ready, running):
+        """
+        Choose the ready jobs to start now.
+        """
+        timed = [job for job in ready if job.timed]
+        others = [job for job in ready if not job.timed]
+        running_timed = [job for job in running if job.timed]
+        budget = self.cores - (1 if self.pin else 0)
+        used = sum(job.cores for job in running if not job.timed or
+                   not self.pin)
+        chosen = list()
+        if self.pin:
+            if timed and not running_timed:
+                chosen.append(timed[0])
+        elif running_timed:
+            return chosen
+        elif timed:
+            # timed jobs first, each one alone
+            return [timed[0]] if not running else chosen
+        for job in others:
+            if used + job.cores <= budget or not used:
+                chosen.append(job)
+                used += job.cores
+        return chosen
+
+    def run(self, dry_run=False):
+        """
+        Run the jobs to run, return the number of failed jobs (jobs
+        depending on a failed job are not run).
+        """
+        stale = self.stale()
+        if dry_run:
+            for job in self.jobs:
+                print("run" if job.name in stale else "skip", job.name,
+                      job.command, sep="\t")
+            return 0
+        directory = os.path.dirname(self.state_file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        done = set(job.name for job in self.jobs if job.name not in stale)
+        failed = set()
+        pending = [job for job in self.jobs if job.name in stale]
+        running = dict()  # job -> process
+        while pending or running:
+            # jobs depending on a failed job are abandoned
+            for job in pending:
+                if any(requirement in failed for requirement in job.requires):
+                    failed.add(job.name)
+            pending = [job for job in pending if job.name not in failed]
+            ready = [job for job in pending
+                     if all(requirement in done
+                            for requirement in job.requires)]
+            for job in self.startable(ready, list(running)):
+                running[job] = self.launch(job)
+                pending.remove(job)
+            if not running:
+                break
+            time.sleep(0.05)
+            for job, process in list(running.items()):
+                status = process.poll()
+                if status is None:
+                    continue
+                del running[job]
+                if status == 0:
+                    done.add(job.name)
+                    self.record(job)
+                else:
+                    failed.add(job.name)
+                    print("# failed (status %d):" % status, job.name,
+                          file=sys.stderr)
+                if self.verbose:
+                    print("# end", job.name, file=sys.stderr)
+        return len(failed)
+
+
+def clustering_jobs(scheduler, methods, t, files, log_file, requires,
+                    taxa_list, repetition, cache_dir, work, name, bootstrap=0):
+    """
+    Add the clustering (timed) and metrics jobs of all methods at
+    threshold t on a data set (with bootstrap replicates of the metrics
+    if not zero). Return the names of the clustering jobs and the
+    metrics fragments, in the order of the shell loops.
+    """
+    log_cmd = "/usr/bin/time -f %%e,%%M,%%C -a -o %s /bin/sh -c " % log_file
+    clusterings, fragments = list(), list()
+    for method in methods:
+        if method.name == "swarm-v2-2f" and t != 1:
+            continue
+        values = dict(files, t=t, t1=t + 1, t2=2 * t,
+                      id="0.%d" % (100 - t))
+        result = method.sub_result if repetition else method.result
+        values["res"] = os.path.join(files["outdir"], result % values)
+        command = method.command % values
+        output = method.output % values
+        if cache_dir:
+            inputs = [files[method.input]] + [binary for binary in
+                                              method.binaries
+                                              if binary == CONF]
+            binaries = [binary for binary in method.binaries
+                        if binary != CONF]
+            # (the rows of the log file are cached with the clustering)
+            cached = " ".join(["python scripts/result_cache.py -c", cache_dir,
+                               "-l", log_file] +
+                              ["-i " + path for path in inputs] +
+                              ["-b " + path for path in binaries] +
+                              ["-o", output, "--"])
+            command = cached + " " + log_cmd + quote(command)
+        else:
+            command = log_cmd + quote(command)
+        job = "%s:%s:%d" % (name, method.name, t)
+        clusterings.append(scheduler.add(job, command,
+                                         requires[method.input],
+                                         timed=True, outputs=[output]))
+        # metrics (one fragment of each metrics file per job)
+        job_fragments = ["%s/%s.%d.csv" % (work, job.replace(":", "_"), k)
+                         for k in range(len(taxa_list))]
+        threshold = values["id"] if method.identity else str(t)
+        steps = ["rm -f " + " ".join(job_fragments)]
+        # optional arguments of compute_metrics.sh (cache, bootstrap, mask)
+        optional = [cache_dir or "", str(bootstrap or ""), files["mask_file"]]
+        while optional and not optional[-1]:
+            optional.pop()
+        steps.append(" ".join(["bash", COMPUTE_METRICS, output,
+                               '"%s"' % method.name, threshold,
+                               ",".join(taxa_list), ",".join(job_fragments),
+                               str(repetition)] +
+                              [argument or '""' for argument in optional]))
+        steps.append("rm %s*" % values["res"])
+        scheduler.add(job + ":metrics", " && ".join(steps),
+                      [job] + requires["taxa"], outputs=job_fragments)
+        fragments.append(job_fragments)
+    return clusterings, fragments
+
+
+def input_jobs(scheduler, infile, name):
+    """
+    Add the jobs preparing the inputs of USEARCH and VSEARCH. Return the
+    file names and, for each input, the jobs producing it (and no mask,
+    see subsamples_fixed_jobs).
+    """
+    files = {"infile": infile, "mask_file": None,
+             "alt": infile + "_alt",
+             "alt_length": infile + "_alt_length",
+             "alt_abundance": infile + "_alt_abundance"}
+    alt = scheduler.add(name + ":alt", "sed 's/_/;size=/' %(infile)s > "
+                        "%(alt)s" % files, outputs=[files["alt"]])
+    length = scheduler.add(name + ":alt_length", VSEARCH +
+                           " -sortbylength %(alt)s -output %(alt_length)s"
+                           " -minsize 1" % files, [alt],
+                           outputs=[files["alt_length"]])
+    abundance = scheduler.add(name + ":alt_abundance", VSEARCH +
+                              " -sortbysize %(alt)s -output %(alt_abundance)s"
+                              " -minsize 1" % files, [alt],
+                              outputs=[files["alt_abundance"]])
+    producers = {"infile": [], "alt": [alt], "alt_length": [length],
+                 "alt_abundance": [abundance]}
+    return files, producers
+
+
+def metrics_header(bootstrap=0):
+    """
+    Header of the metrics files (with the columns of the confidence
+    intervals if the metrics are bootstrapped, see cluster_metrics.py).
+    """
+    if not bootstrap:
+        return METRICS_HEADER
+    return ",".join([METRICS_HEADER] + [metric + suffix for metric in METRICS
+                                        for suffix in ("_low", "_high")])
+
+
+def collect_job(scheduler, name, metrics_file, fragments, requires,
+                bootstrap=0):
+    """
+    Add the job concatenating the metrics fragments into a metrics file.
+    """
+    command = "(echo %s; cat %s) > %s" % (metrics_header(bootstrap),
+                                          " ".join(fragments), metrics_file)
+    return scheduler.add(name, command, requires, outputs=[metrics_file])
+
+
+def quality_jobs(scheduler, data_set, refs, min_t, max_t, bootstrap=0):
+    """
+    Jobs of analysis_quality.sh.
+    """
+    infile = "data/%s/%s_derep.fasta" % (data_set, data_set)
+    log_file = "%s/%s-quality-log.csv" % (OUTDIR, data_set)
+    cache_dir = OUTDIR + "/cache"
+    work = "%s/%s-quality-jobs" % (OUTDIR, data_set)
+    log = scheduler.add("log", 'mkdir -p %s && echo "time,memory,cmd" > %s'
+                        % (work, log_file), outputs=[log_file, work])
+    files, requires = input_jobs(scheduler, infile, "input")
+    files["outdir"] = OUTDIR
+    for producers in requires.values():
+        producers.append(log)
+    taxa_files, metrics_files, taxa = list(), list(), list()
+    for p in GROUND_TRUTH_THRESHOLDS:
+        taxa_file = "data/%s/%s_%s.spec.ualn" % (data_set, data_set, p)
+        taxa.append(scheduler.add("taxa:" + p, "bash scripts/assign_taxa.sh "
+                                  "%s 8 %s %s %s %s" % (VSEARCH, infile, refs,
+                                                        taxa_file, p),
+                                  cores=8, outputs=[taxa_file]))
+        taxa_files.append(taxa_file)
+        metrics_files.append("%s/%s_%s-metrics.csv" % (OUTDIR, data_set, p))
+    requires["taxa"] = taxa
+    clusterings, fragments = list(), list()
+    for t in range(min_t, max_t + 1):
+        jobs, job_fragments = clustering_jobs(scheduler, METHODS, t, files,
+                                              log_file, requires, taxa_files,
+                                              0, cache_dir, work, "quality",
+                                              bootstrap)
+        clusterings.extend(jobs)
+        fragments.extend(job_fragments)
+    scheduler.add("cleanup", "rm %(alt)s %(alt_length)s %(alt_abundance)s"
+                  % files, clusterings)
+    metrics_jobs = [job.name for job in scheduler.jobs
+                    if job.name.endswith(":metrics")]
+    for k, p in enumerate(GROUND_TRUTH_THRESHOLDS):
+        collected = collect_job(scheduler, "collect:" + p, metrics_files[k],
+                                [job_fragments[k] for job_fragments
+                                 in fragments], metrics_jobs, bootstrap)
+        scheduler.add("eval:" + p, "Rscript --vanilla scripts/eval_quality.R "
+                      "%s %s/%s_%s-metrics %d %d" % (metrics_files[k], OUTDIR,
+                                                     data_set, p, min_t, max_t),
+                      [collected])
+
+
+def subsamples_fixed_jobs(scheduler, data_set, refs, min_t, max_t,
+                          ground_truth_threshold, proportion, repetitions,
+                          seed=None, bootstrap=0):
+    """
+    Jobs of analysis_subsamples_fixed.sh (the clusterings of each
+    repetition are written to their own directory).
+    """
+    fasta_file = "data/%s/%s_derep.fasta" % (data_set, data_set)
+    stem = "data/%s/%s_derep_sub" % (data_set, data_set)
+    log_file = "%s/%s-sub-fixed-log.csv" % (OUTDIR, data_set)
+    metrics_file = "%s/%s-sub-fixed-metrics.csv" % (OUTDIR, data_set)
+    work = "%s/%s-sub-fixed-jobs" % (OUTDIR, data_set)
+    masks = ["%s_%d_%d.ids" % (stem, proportion, r)
+             for r in range(repetitions)]
+    subsamples = ["%s_%d_%d.fasta" % (stem, proportion, r)
+                  for r in range(repetitions)]
+    sampled = scheduler.add("subsample", "./tools/FastaSampler -m %s %d %d %s"
+                            % (fasta_file, proportion, repetitions, stem) +
+                            (" " + seed if seed else ""), outputs=masks)
+    # taxa assigned once for the whole data set (see the shell script)
+    taxa_file = stem + ".spec.ualn"
+    taxa = scheduler.add("taxa", "bash scripts/assign_taxa.sh %s 8 %s %s %s %s"
+                         % (VSEARCH, fasta_file, refs, taxa_file,
+                            ground_truth_threshold), cores=8,
+                         outputs=[taxa_file])
+    log = scheduler.add("log", 'mkdir -p %s && echo "time,memory,cmd" > %s'
+                        % (work, log_file), outputs=[log_file, work])
+    repetition_jobs = list()
+    for r in range(repetitions):
+        name = "rep%d" % r
+        selected = scheduler.add(name + ":subsample",
+                                 "./tools/FastaSampler -l %s %s %s"
+                                 % (fasta_file, masks[r], subsamples[r]),
+                                 [sampled], outputs=[subsamples[r]])
+        files, requires = input_jobs(scheduler, subsamples[r], name)
+        files["outdir"] = "%s/%s" % (work, name)
+        # only the (untimed) metrics read the full files with the mask,
+        # the clusterings read the subsample
+        files["mask_file"] = masks[r]
+        directory = scheduler.add(name + ":directory", "mkdir -p " +
+                                  files["outdir"], [log],
+                                  outputs=[files["outdir"]])
+        for producers in requires.values():
+            producers.extend([selected, directory])
+        requires["taxa"] = [taxa]
+        repetition_jobs.append((name, files, requires, taxa_file))
+    # jobs are added in the order of the shell loops (thresholds, then
+    # repetitions), which is also the order of the metrics
+    fragments = list()
+    per_repetition = dict((name, list()) for name, files, requires, taxa_file
+                          in repetition_jobs)
+    for t in range(min_t, max_t + 1):
+        for r, (name, files, requires, taxa_file) in enumerate(repetition_jobs):
+            jobs, job_fragments = clustering_jobs(scheduler, METHODS, t, files,
+                                                  log_file, requires,
+                                                  [taxa_file], r, None, work,
+                                                  name, bootstrap)
+            per_repetition[name].extend(jobs + [job + ":metrics"
+                                                for job in jobs])
+            fragments.extend(job_fragments)
+    cleanups = list()
+    for name, files, requires, taxa_file in repetition_jobs:
+        cleanups.append(scheduler.add(
+            name + ":cleanup", "rm %(alt)s %(alt_length)s %(alt_abundance)s"
+            % files, per_repetition[name]))
+    metrics_jobs = [job.name for job in scheduler.jobs
+                    if job.name.endswith(":metrics")]
+    collected = collect_job(scheduler, "collect", metrics_file,
+                            [fragment for job_fragments in fragments
+                             for fragment in job_fragments], metrics_jobs,
+                            bootstrap)
+    quality = scheduler.add("eval:quality", "Rscript --vanilla "
+                            "scripts/eval_subsamples_fixed_quality.R %s "
+                            "%s/%s-sub-fixed-quality" % (metrics_file, OUTDIR,
+                                                         data_set),
+                            [collected])
+    performance = scheduler.add("eval:performance", "Rscript --vanilla "
+                                "scripts/eval_subsamples_fixed_performance.R "
+                                "%s %s/%s-sub-fixed-performance"
+                                % (log_file, OUTDIR, data_set), [collected])
+    scheduler.add("cleanup", "rm -rf %s.compiled && rm %s*" % (taxa_file, stem),
+                  [quality, performance] + cleanups)
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    options, analysis, arguments = option_parser()
+
+    ## Build the graph of jobs
+    scheduler = Scheduler(options.cores, options.state_file, options.pin,
+                          options.verbose)
+    if analysis == "quality":
+        data_set, refs, min_t, max_t = arguments
+        quality_jobs(scheduler, data_set, refs, int(min_t), int(max_t),
+                     options.bootstrap)
+    else:
+        (data_set, refs, min_t, max_t, ground_truth_threshold, proportion,
+         repetitions) = arguments[:7]
+        subsamples_fixed_jobs(scheduler, data_set, refs, int(min_t),
+                              int(max_t), ground_truth_threshold,
+                              int(proportion), int(repetitions),
+                              (arguments[7:] or [None])[0], options.bootstrap)
+
+    ## Run the jobs
+    failures = scheduler.run(options.dry_run)
+    if failures:
+        print("scheduler:", failures, "job(s) failed or not run",
+              file=sys.stderr)
+        sys.exit(1)
+
+    sys.exit(0)
@@ -22,11 +22,52 @@ __version__ = "$Revision: 1.1"
 
 import os
 import sys
+import mmap
 import tempfile
 import itertools
 import subprocess
+import multiprocessing
+from array import array
+from collections import namedtuple
 from operator import itemgetter
 from optparse import OptionParser
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from amplicon_store import (Descending, external_sort, parse_otu_line,
+                            read_fasta, read_mask, split_header)
+from instrumentation import phase
+
+# Pairwise relations of a swarm, see build_graph
+Graph = namedtuple("Graph", ["names", "offsets", "children", "parents"])
+
+# Parameters of the breaking (ARBITRARY PARAMETERS): swarms and peaks need
+# an abundance of ABUNDANT, and a valley is deep enough if the ending peak
+# is RATIO times higher than the valley, or RATIO / 2 times higher when
+# the starting peak is less than PEAK_RATIO times higher than the ending
+# one, see graph_breaker
+Parameters = namedtuple("Parameters", ["abundant", "ratio", "peak_ratio"])
+DEFAULT_PARAMETERS = Parameters(abundant=100, ratio=50, peak_ratio=10)
+
+# Lowest points of a swarm graph, see valley_index
+ValleyIndex = namedtuple("ValleyIndex", ["depths", "ranks", "last_ranks",
+                                         "ancestors", "lowest"])
+
+# Scoring of the alignments of swarm (match reward 5, mismatch penalty 4,
+# gap opening penalty 12, gap extension penalty 4), converted by swarm to
+# penalties of a global alignment, see alignment_differences
+MISMATCH_PENALTY = 18
+GAP_OPENING_PENALTY = 24
+GAP_EXTENSION_PENALTY = 13
+
+# Traceback directions of the alignments (as in swarm's nw.cc)
+MASK_UP, MASK_LEFT, MASK_EXTUP, MASK_EXTLEFT = 1, 2, 4, 8
+
+# State inherited by the worker processes, see parallel_swarm_breaker
+_shared = None
+
 
 #*****************************************************************************#
 #                                                                             #
@@ -39,10 +80,14 @@ def option_parse():
     """
     Parse arguments from command line.
     """
-    desc = """Detect and break chains of amplicons in a swarm. That
-    script will search for the swarm binary in /usr/bin/. If swarm is
-    installed at a different location, please modify the corresponding
-    line in the function run_swarm."""
+    desc = """Detect and break chains of amplicons in a swarm. By
+    default, that script will search for the swarm binary in
+    /usr/bin/. If swarm is installed at a different location, please
+    use the option -b. With the internal engine (-e internal, needs
+    NumPy), the pairwise relations inside each swarm are computed
+    in-process instead, with the scoring of swarm v1; its graph data
+    are checked against recordings of swarm v1 by
+    tests/test_swarm_breaker.py."""
 
     parser = OptionParser(usage="usage: %prog -f filename -s filename",
                           description=desc,
@@ -55,6 +100,17 @@ def option_parse():
                       dest="binary",
                       help="swarm binary location. Default is /usr/bin/swarm")
 
+    parser.add_option("-e", "--engine",
+                      metavar="<ENGINE>",
+                      action="store",
+                      type="choice",
+                      choices=["internal", "binary"],
+                      default="binary",
+                      dest="engine",
+                      help="compute the pairwise relations with the swarm "
+                      "binary (binary) or in-process (internal, "
+                      "experimental). Default is binary")
+
     parser.add_option("-f", "--fasta_file",
                       metavar="<FILENAME>",
                       action="store",
@@ -67,6 +123,15 @@ def option_parse():
                       dest="swarm_file",
                       help="set <FILENAME> as swarm file.")
 
+    parser.add_option("--mask",
+                      metavar="<FILENAME>",
+                      action="store",
+                      dest="mask",
+                      help="load only the amplicons of the subsample "
+                      "listed in <FILENAME> (FastaSampler -m) from the "
+                      "fasta file of the whole data set (not needed with "
+                      "--stream)")
+
     parser.add_option("-d", "--differences",
                       metavar="<THRESHOLD>",
                       action="store",
@@ -75,23 +140,109 @@ def option_parse():
                       dest="threshold",
                       help="set local clustering <THRESHOLD>. Default is 1")
 
+    parser.add_option("-v", "--verbose",
+                      action="store_true",
+                      default=False,
+                      dest="verbose",
+                      help="list the abundances along each tested path "
+                      "(debugging, slower)")
+
+    parser.add_option("-j", "--jobs",
+                      metavar="<JOBS>",
+                      action="store",
+                      type="int",
+                      default=1,
+                      dest="jobs",
+                      help="break the swarms with <JOBS> processes. "
+                      "Default is 1")
+
+    parser.add_option("--stream",
+                      action="store_true",
+                      default=False,
+                      dest="stream",
+                      help="read the swarms one at a time (sorted on "
+                      "disk) and load the sequences on demand from an "
+                      "index of the fasta file (<FILENAME>.idx)")
+
+    parser.add_option("--abundant",
+                      metavar="<LIST>",
+                      action="store",
+                      default=str(DEFAULT_PARAMETERS.abundant),
+                      dest="abundant",
+                      help="minimal abundance of the peaks (comma-separated "
+                      "values to sweep). Default is %d"
+                      % DEFAULT_PARAMETERS.abundant)
+
+    parser.add_option("--ratio",
+                      metavar="<LIST>",
+                      action="store",
+                      default=str(DEFAULT_PARAMETERS.ratio),
+                      dest="ratio",
+                      help="ratio of the ending peak to the valley above "
+                      "which the valley is cut (comma-separated values to "
+                      "sweep). Default is %d" % DEFAULT_PARAMETERS.ratio)
+
+    parser.add_option("--peak_ratio",
+                      metavar="<LIST>",
+                      action="store",
+                      default=str(DEFAULT_PARAMETERS.peak_ratio),
+                      dest="peak_ratio",
+                      help="ratio of the starting peak to the ending peak "
+                      "below which half the ratio is enough (comma-separated "
+                      "values to sweep). Default is %d"
+                      % DEFAULT_PARAMETERS.peak_ratio)
+
+    parser.add_option("--sweep",
+                      metavar="<STEM>",
+                      action="store",
+                      dest="sweep",
+                      help="break the swarms with every combination of the "
+                      "values of --abundant, --ratio and --peak_ratio, and "
+                      "write them to <STEM>_<abundant>_<ratio>_<peak_ratio>"
+                      ".swarm (the graph of each swarm is built once for "
+                      "all combinations)")
+
     (options, args) = parser.parse_args()
-    return options.binary, options.fasta_file, options.swarm_file, options.threshold
+    if options.stream and options.jobs > 1:
+        parser.error("options --stream and --jobs are mutually exclusive")
+    try:
+        settings = [Parameters(*values) for values in itertools.product(
+            *[[int(value) for value in values.split(",")]
+              for values in (options.abundant, options.ratio,
+                             options.peak_ratio)])]
+    except ValueError:
+        parser.error("options --abundant, --ratio and --peak_ratio take "
+                     "comma-separated integers")
+    if len(settings) > 1 and not options.sweep:
+        parser.error("option --sweep is required for several values")
+    if options.sweep and options.jobs > 1:
+        parser.error("options --sweep and --jobs are mutually exclusive")
+    binary = options.binary if options.engine == "binary" else None
+    return (binary, options.fasta_file, options.swarm_file,
+            options.threshold, options.verbose, options.jobs,
+            options.stream, options.mask, settings, options.sweep)
 
 
-def fasta_parse(fasta_file):
+def fasta_parse(fasta_file, mask=None):
     """
-    List amplicon ids, abundances and sequences, make a list and a dictionary
+    List amplicon ids, abundances and sequences in a compact table
+    (looked up like a dictionary, see amplicon_store.py), only for the
+    amplicons of the subsample listed in the mask file if given
     """
-    with open(fasta_file, "rU") as fasta_file:
-        all_amplicons = dict()
-        for line in fasta_file:
-            if line.startswith(">"):
-                amplicon, abundance = line.strip(">\n").split("_")
-            else:
-                sequence = line.strip()
-                all_amplicons[amplicon] = (int(abundance), sequence)
-        return all_amplicons
+    return read_fasta(fasta_file, read_mask(mask) if mask else None)
+
+
+def swarm_line_parse(line):
+    """
+    List amplicons contained in a swarm, sort by decreasing abundance.
+    """
+    amplicons = list(zip(*parse_otu_line(line)))
+    # Sort amplicons by decreasing abundance and alphabetical order
+    amplicons.sort(key=itemgetter(1, 0), reverse=True)
+    top_amplicon, top_abundance = amplicons[0]
+    swarm_size = len(amplicons)
+    swarm_mass = sum([amplicon[1] for amplicon in amplicons])
+    return [top_amplicon, swarm_mass, swarm_size, top_abundance, amplicons]
 
 
 def swarm_parse(swarm_file):
@@ -100,31 +251,132 @@ def swarm_parse(swarm_file):
     abundance. Sort the list of swarms by decreasing mass and
     decreasing size.
     """
-    with open(swarm_file, "rU") as swarm_file:
+    with open(swarm_file, "r") as swarm_file:
         swarms = list()
         for line in swarm_file:
-            amplicons = [(amplicon.split("_")[0], int(amplicon.split("_")[1]))
-                         for amplicon in line.strip().split(" ")]
-            # Sort amplicons by decreasing abundance and alphabetical order
-            amplicons.sort(key=itemgetter(1, 0), reverse=True)
-            top_amplicon, top_abundance = amplicons[0]
-            swarm_size = len(amplicons)
-            swarm_mass = sum([amplicon[1] for amplicon in amplicons])
-            swarms.append([top_amplicon, swarm_mass, swarm_size,
-                           top_abundance, amplicons])
+            swarms.append(swarm_line_parse(line))
         # Sort swarms on mass, size and seed name
         swarms.sort(key=itemgetter(1, 2, 0), reverse=True)
         return swarms
 
 
+def as_text(data):
+    """
+    Convert bytes read from a file to a native string
+    """
+    return data if isinstance(data, str) else data.decode("ascii")
+
+
+def swarm_stream(swarm_file):
+    """
+    List amplicons contained in each swarms, one swarm at a time, in
+    the same order as swarm_parse. Swarms are sorted on disk.
+    """
+    def sort_key(line):
+        top_amplicon, swarm_mass, swarm_size = swarm_line_parse(line)[0:3]
+        return -swarm_mass, -swarm_size, Descending(top_amplicon)
+
+    with open(swarm_file, "r") as swarm_file:
+        lines = external_sort((line.strip() for line in swarm_file),
+                              sort_key)
+        for line in lines:
+            yield swarm_line_parse(line)
+
+
+def fasta_index_build(fasta_file, index_file):
+    """
+    Index the amplicons of a fasta file: the index file holds the
+    length of the longest amplicon id, then one fixed-width record per
+    amplicon (space-padded id and offset of the header line), sorted
+    by amplicon id.
+    """
+    longest = [1]
+
+    def headers():
+        with open(fasta_file, "rb") as fasta_file_handle:
+            offset = 0
+            for line in fasta_file_handle:
+                if line.startswith(b">"):
+                    amplicon = split_header(as_text(line[1:].strip()))[0]
+                    longest[0] = max(longest[0], len(amplicon))
+                    yield amplicon + "\t" + str(offset)
+                offset += len(line)
+
+    records = external_sort(headers(), lambda record: record.split("\t")[0])
+    with open(index_file + ".tmp", "w") as index:
+        print(longest[0], file=index)
+        for record in records:
+            amplicon, offset = record.split("\t")
+            print(amplicon.ljust(longest[0]), "%012d" % int(offset),
+                  sep="", file=index)
+    os.rename(index_file + ".tmp", index_file)
+
+
+class FastaIndex(object):
+    """
+    Read-only replacement for the dictionary of fasta_parse. Amplicon
+    ids are looked up in a sorted index file (built once and reused
+    while it is newer than the fasta file), and the abundances and
+    sequences are read on demand from the memory-mapped fasta file.
+    Amplicons are cached until the cache is cleared.
+    """
+
+    def __init__(self, fasta_file):
+        index_file = fasta_file + ".idx"
+        if (not os.path.exists(index_file) or
+            os.path.getmtime(index_file) < os.path.getmtime(fasta_file)):
+            fasta_index_build(fasta_file, index_file)
+        with open(fasta_file, "rb") as fasta:
+            self.fasta = mmap.mmap(fasta.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_file, "rb") as index:
+            self.index = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        self.width = int(self.index.readline())
+        self.start = self.index.tell()
+        self.record_length = self.width + 13
+        self.records = (len(self.index) - self.start) // self.record_length
+        self.cache = dict()
+
+    def __getitem__(self, amplicon):
+        try:
+            return self.cache[amplicon]
+        except KeyError:
+            pass
+        # Binary search of the amplicon id
+        key = amplicon.encode("ascii").ljust(self.width)
+        low, high = 0, self.records
+        while low < high:
+            middle = (low + high) // 2
+            position = self.start + middle * self.record_length
+            if self.index[position:position + self.width] < key:
+                low = middle + 1
+            else:
+                high = middle
+        position = self.start + low * self.record_length
+        if low == self.records or self.index[position:position + self.width] != key:
+            raise KeyError(amplicon)
+        offset = int(self.index[position + self.width:
+                                position + self.record_length - 1])
+        # Read the header and the sequence
+        header_end = self.fasta.find(b"\n", offset)
+        sequence_end = self.fasta.find(b"\n", header_end + 1)
+        if sequence_end < 0:
+            sequence_end = len(self.fasta)
+        header = as_text(self.fasta[offset + 1:header_end].strip())
+        abundance = split_header(header)[1]
+        sequence = self.fasta[header_end + 1:sequence_end].strip()
+        self.cache[amplicon] = (abundance, as_text(sequence))
+        return self.cache[amplicon]
+
+
 def run_swarm(binary, all_amplicons, swarm, threshold):
     """
     Write temporary fasta files, run swarm and collect the graph data
     """
     swarm_command = [binary, "-b", "-d", str(threshold)]
     with open(os.devnull, "w") as devnull:
-        with tempfile.SpooledTemporaryFile() as tmp_fasta_file:
-            with tempfile.SpooledTemporaryFile() as tmp_swarm_results:
+        # (text mode, the sequences are native strings)
+        with tempfile.SpooledTemporaryFile(mode="w+") as tmp_fasta_file:
+            with tempfile.SpooledTemporaryFile(mode="w+") as tmp_swarm_results:
                 for amplicon, abundance in swarm:
                     sequence = all_amplicons[amplicon][1]
                     print(">", amplicon, "_", str(abundance), "\n", sequence,
@@ -143,149 +395,570 @@ def run_swarm(binary, all_amplicons, swarm, threshold):
                 return graph_data
 
 
-def build_graph(graph_data):
+def bounded_edit_distance(seqA, seqB, bound):
+    """
+    Compute the edit distance between two sequences, or bound + 1 as
+    soon as it is clear that the distance exceeds the bound. Common
+    prefixes and suffixes are skipped, and only a band of width
+    2 * bound + 1 of the dynamic programming matrix is filled.
+    """
+    too_far = bound + 1
+    if abs(len(seqA) - len(seqB)) > bound:
+        return too_far
+    # Skip the common prefix and suffix
+    start = 0
+    shortest = min(len(seqA), len(seqB))
+    while start < shortest and seqA[start] == seqB[start]:
+        start += 1
+    endA, endB = len(seqA), len(seqB)
+    while endA > start and endB > start and seqA[endA - 1] == seqB[endB - 1]:
+        endA -= 1
+        endB -= 1
+    seqA, seqB = seqA[start:endA], seqB[start:endB]
+    lengthA, lengthB = len(seqA), len(seqB)
+    if not lengthA or not lengthB:
+        return min(max(lengthA, lengthB), too_far)
+    # Banded dynamic programming, cells outside of the band are too far
+    previous = [j if j <= bound else too_far for j in range(lengthB + 1)]
+    for i in range(1, lengthA + 1):
+        current = [too_far] * (lengthB + 1)
+        if i <= bound:
+            current[0] = i
+        nucleotide = seqA[i - 1]
+        low = max(1, i - bound)
+        high = min(lengthB, i + bound)
+        row_minimum = current[low - 1]
+        for j in range(low, high + 1):
+            value = previous[j - 1] + (nucleotide != seqB[j - 1])
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            current[j] = value
+            if value < row_minimum:
+                row_minimum = value
+        if row_minimum > bound:
+            return too_far
+        previous = current
+    return min(previous[lengthB], too_far)
+
+
+def qgram_profiles(sequences, length):
+    """
+    Count the q-grams (substrings of the given length) of each
+    sequence, as the rows of a matrix with one column per q-gram of
+    nucleotides (other symbols are counted as "a", which can only
+    lower the differences between profiles)
+    """
+    import numpy as np
+    codes = dict(zip("acgtACGT", (0, 1, 2, 3, 0, 1, 2, 3)))
+    profiles = np.zeros((len(sequences), 4 ** length), dtype=np.int16)
+    for row, sequence in enumerate(sequences):
+        count = len(sequence) - length + 1
+        if count < 1:
+            continue
+        values = np.array([codes.get(nucleotide, 0) for nucleotide in sequence],
+                          dtype=np.int64)
+        qgrams = np.zeros(count, dtype=np.int64)
+        for k in range(length):
+            qgrams = qgrams * 4 + values[k:k + count]
+        profiles[row] = np.bincount(qgrams, minlength=4 ** length)
+    return profiles
+
+
+def alignment_differences(seqA, seqB, bound):
+    """
+    Count the differences (mismatches and gap positions) in the
+    optimal global alignment of two sequences under the scoring of
+    swarm (see the PENALTY constants), or return bound + 1 as soon as
+    it is clear that they exceed the bound. As in swarm (nw.cc), seqA
+    is the query, ties between alignments are broken by the same
+    traceback, and the differences are the alignment length minus the
+    matches.
+
+    Alignments have at least as many differences as the edit
+    distance, which is checked first. Only a band of width
+    2 * (2 * bound + 2) + 1 of the dynamic programming matrix is
+    filled: alignments leaving it have at least 3 * bound + 6 gap
+    positions, a higher penalty than any alignment with at most bound
+    differences, so the band holds the optimal alignment whenever it
+    matters.
+    """
+    too_far = bound + 1
+    if bounded_edit_distance(seqA, seqB, bound) > bound:
+        return too_far
+    gap_open, gap_extend = GAP_OPENING_PENALTY, GAP_EXTENSION_PENALTY
+    infinity = float("inf")
+    width = 2 * bound + 2
+    qlen, dlen = len(seqA), len(seqB)
+    # H and E of the previous column (column -1 on the boundary, out of
+    # the band beyond the width)
+    H = [gap_open + (i + 1) * gap_extend if i <= width else infinity
+         for i in range(qlen)]
+    E = [2 * gap_open + (i + 2) * gap_extend if i <= width else infinity
+         for i in range(qlen)]
+    lows, directions = list(), list()
+    for j in range(dlen):
+        low, high = max(0, j - width), min(qlen - 1, j + width)
+        if low == 0:
+            f = 2 * gap_open + (j + 2) * gap_extend
+            h = 0 if j == 0 else gap_open + j * gap_extend
+        else:
+            f = infinity
+            h = H[low - 1]
+        column = bytearray(high - low + 1)
+        nucleotide = seqB[j]
+        for i in range(low, high + 1):
+            n = H[i]
+            e = E[i]
+            if seqA[i] != nucleotide:
+                h += MISMATCH_PENALTY
+            direction = MASK_UP if f < h else 0
+            if f < h:
+                h = f
+            if e < h:
+                h = e
+            if e == h:
+                direction |= MASK_LEFT
+            H[i] = h
+            h += gap_open + gap_extend
+            e += gap_extend
+            f += gap_extend
+            if f < h:
+                direction |= MASK_EXTUP
+            else:
+                f = h
+            if e < h:
+                direction |= MASK_EXTLEFT
+            else:
+                e = h
+            E[i] = e
+            column[i - low] = direction
+            h = n
+        lows.append(low)
+        directions.append(column)
+    # Trace back and count the differences
+    i, j = qlen, dlen
+    length, matches = 0, 0
+    operation = None
+    while i > 0 and j > 0:
+        direction = directions[j - 1][i - 1 - lows[j - 1]]
+        length += 1
+        if operation == "I" and direction & MASK_EXTLEFT:
+            j -= 1
+        elif operation == "D" and direction & MASK_EXTUP:
+            i -= 1
+        elif direction & MASK_LEFT:
+            operation = "I"
+            j -= 1
+        elif direction & MASK_UP:
+            operation = "D"
+            i -= 1
+        else:
+            operation = "M"
+            if seqA[i - 1] == seqB[j - 1]:
+                matches += 1
+            i -= 1
+            j -= 1
+    length += i + j
+    return min(length - matches, too_far)
+
+
+def pairwise_swarm(all_amplicons, swarm, threshold):
+    """
+    Cluster the amplicons of a swarm in-process and collect the graph
+    data, in the same form and order as the "@" lines produced by
+    "swarm -b" (see run_swarm).
+
+    Amplicons are processed in the order of the swarm (decreasing
+    abundance). Each seed recruits all unswarmed amplicons with at
+    most threshold differences, then each recruited amplicon does the
+    same, in order of recruitment. Differences are counted in the
+    optimal alignment, as swarm does (see alignment_differences), and
+    candidates whose lengths or q-gram profiles differ too much are
+    rejected without alignment (an edit modifies at most QGRAM_LENGTH
+    q-grams in each sequence). The binary engine remains the
+    reference (see tests/test_swarm_breaker.py). Needs NumPy, unlike
+    the binary engine.
+    """
+    import numpy as np
+    QGRAM_LENGTH = 5
+    amplicons = [amplicon for amplicon, abundance in swarm]
+    sequences = [all_amplicons[amplicon][1] for amplicon in amplicons]
+    lengths = np.array([len(sequence) for sequence in sequences],
+                       dtype=np.int64)
+    profiles = qgram_profiles(sequences, QGRAM_LENGTH)
+    max_qgram_distance = 2 * QGRAM_LENGTH * threshold
+    graph_data = list()
+    # Unswarmed amplicons, in order
+    unswarmed = np.arange(len(amplicons))
+    swarmed = np.zeros(len(amplicons), dtype=bool)
+    while len(unswarmed):
+        # The most abundant unswarmed amplicon seeds a new swarm
+        subseeds = [int(unswarmed[0])]
+        unswarmed = unswarmed[1:]
+        for subseed in subseeds:  # grows while recruiting
+            if not len(unswarmed):
+                break
+            candidates = unswarmed[np.abs(lengths[unswarmed] -
+                                          lengths[subseed]) <= threshold]
+            distances = np.abs(profiles[candidates] -
+                               profiles[subseed]).sum(axis=1)
+            recruited = False
+            for target in candidates[distances <= max_qgram_distance]:
+                target = int(target)
+                differences = alignment_differences(sequences[subseed],
+                                                    sequences[target],
+                                                    threshold)
+                if differences <= threshold:
+                    graph_data.append([amplicons[subseed], amplicons[target],
+                                       str(differences)])
+                    subseeds.append(target)
+                    swarmed[target] = recruited = True
+            if recruited:
+                unswarmed = unswarmed[~swarmed[unswarmed]]
+    return graph_data
+
+
+def build_graph(amplicons, graph_data):
     """
     List pairwise relations in a swarm. Note that not all pairwise
     relations are stored. That's why the graph exploration must always
     start from the most abundant amplicon, and must be reiterated for
     sub-swarms after a breaking.
+
+    Amplicons are interned as integers (their rank in the swarm). The
+    children of amplicon i are children[offsets[i]:offsets[i + 1]], in
+    the order of the graph data. Swarm graphs are trees, so each
+    amplicon has at most one parent (-1 for the roots and for the
+    amplicons whose relation has been deleted).
     """
-    graph = dict()
-    for line in graph_data:
-        ampliconA, ampliconB, differences = line
-        if ampliconA in graph:
-            graph[ampliconA] += [ampliconB]
-        else:
-            graph[ampliconA] = [ampliconB]
-    return graph
+    names = [amplicon[0] for amplicon in amplicons]
+    index = dict((name, i) for i, name in enumerate(names))
+    links = [(index[ampliconA], index[ampliconB])
+             for ampliconA, ampliconB, differences in graph_data]
+    offsets = array("l", [0]) * (len(names) + 1)
+    for ampliconA, ampliconB in links:
+        offsets[ampliconA + 1] += 1
+    for i in range(len(names)):
+        offsets[i + 1] += offsets[i]
+    children = array("l", [0]) * len(links)
+    parents = array("l", [-1]) * len(names)
+    free = offsets[:-1]
+    for ampliconA, ampliconB in links:
+        children[free[ampliconA]] = ampliconB
+        free[ampliconA] += 1
+        parents[ampliconB] = ampliconA
+    return Graph(names, offsets, children, parents)
 
 
-def find_path(graph, start, end, path=[]):
+def find_path(graph, start, end):
     """
-    Recursively explore the graph and find all paths connecting two
-    amplicons (http://www.python.org/doc/essays/graphs.html). As the
-    graph is not complete, some pairs of amplicon cannot be linked.
+    Find the path connecting two amplicons by climbing from the end
+    to the start. Relations are directed and there is only one path
+    joining two amplicons. As the graph is not complete, some pairs
+    of amplicon cannot be linked.
     """
-    path = path + [start]
-    if start == end:
-        return path
-    if start not in graph:
+    path = [end]
+    node = end
+    while node != start:
+        node = graph.parents[node]
+        if node < 0 or len(path) > len(graph.names):
+            return None
+        path.append(node)
+    path.reverse()
+    return path
+
+
+def valley_index(graph, abundances):
+    """
+    Index the swarm tree to find the lowest point on the path joining
+    two amplicons in logarithmic time. For each amplicon, store its
+    depth, its preorder rank and the last preorder rank of its
+    sub-tree (ancestor tests), and for each power of two k, its k-th
+    ancestor and the lowest amplicon among itself and its k - 1 next
+    ancestors (the deepest one in case of ties).
+    """
+    size = len(graph.names)
+    depths = array("l", [0]) * size
+    ranks = array("l", [0]) * size
+    preorder = list()
+    for root in range(size):
+        if graph.parents[root] >= 0:
+            continue
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            ranks[node] = len(preorder)
+            preorder.append(node)
+            for i in range(graph.offsets[node], graph.offsets[node + 1]):
+                child = graph.children[i]
+                if graph.parents[child] == node:
+                    depths[child] = depths[node] + 1
+                    stack.append(child)
+    last_ranks = array("l", ranks)
+    for node in reversed(preorder):
+        parent = graph.parents[node]
+        if parent >= 0 and last_ranks[node] > last_ranks[parent]:
+            last_ranks[parent] = last_ranks[node]
+    # Roots are their own ancestors
+    ancestors = [array("l", [parent if parent >= 0 else node
+                             for node, parent in enumerate(graph.parents)])]
+    lowest = [array("l", range(size))]
+    step = 1
+    while 2 * step <= max(depths) + 1:
+        up, low = ancestors[-1], lowest[-1]
+        ancestors.append(array("l", [up[up[node]] for node in range(size)]))
+        lowest.append(array("l", [low[up[node]]
+                                  if abundances[low[up[node]]] < abundances[low[node]]
+                                  else low[node]
+                                  for node in range(size)]))
+        step *= 2
+    return ValleyIndex(depths, ranks, last_ranks, ancestors, lowest)
+
+
+def find_valley(index, abundances, cuts, start, end):
+    """
+    Find the lowest amplicon on the path joining two amplicons (the
+    rightmost one, closest to the end, in case of ties). Return None
+    if the end is not a descendant of the start, or if one of the
+    relations on the path has been cut (cuts lists the amplicons that
+    lost their parent since the index was built).
+    """
+    if not index.ranks[start] < index.ranks[end] <= index.last_ranks[start]:
         return None
-    for node in graph[start]:
-        if node not in path:
-            newpath = find_path(graph, node, end, path)
-            if newpath:
-                return newpath
-    return None
+    for cut in cuts:
+        if index.ranks[start] < index.ranks[cut] <= index.ranks[end] <= index.last_ranks[cut]:
+            return None
+    valley = None
+    node = end
+    steps = index.depths[end] - index.depths[start]
+    level = 0
+    while steps:
+        if steps & 1:
+            candidate = index.lowest[level][node]
+            if valley is None or abundances[candidate] < abundances[valley]:
+                valley = candidate
+            node = index.ancestors[level][node]
+        steps >>= 1
+        level += 1
+    if abundances[start] < abundances[valley]:
+        valley = start
+    return valley
+
+
+def swarm_graph(binary, all_amplicons, amplicons, threshold, graphs=None):
+    """
+    Run swarm (or its in-process equivalent) to get the pairwise
+    relationships of a swarm and build its graph. Graphs stored in
+    graphs (if given, keyed on the amplicons of the swarm) are reused,
+    and a copy is returned as the graph is cut by graph_breaker.
+    """
+    key = tuple(amplicon[0] for amplicon in amplicons)
+    if graphs is not None and key in graphs:
+        graph = graphs[key]
+    else:
+        if binary:
+            graph_raw_data = run_swarm(binary, all_amplicons, amplicons,
+                                       threshold)
+        else:
+            graph_raw_data = pairwise_swarm(all_amplicons, amplicons,
+                                            threshold)
+        graph = build_graph(amplicons, graph_raw_data)
+        if graphs is None:
+            return graph
+        graphs[key] = graph
+    return graph._replace(parents=array("l", graph.parents))
 
 
-def graph_breaker(amplicons, graph, all_amplicons, ABUNDANT):
+def graph_breaker(amplicons, graph, all_amplicons,
+                  parameters=DEFAULT_PARAMETERS, verbose=False):
     """
     Find deep valleys and cut the graph
     """
+    ABUNDANT, RATIO, PEAK_RATIO = parameters
     # High peaks to test (starting and ending points)
-    top_amplicons = [amplicon[0] for amplicon in amplicons
+    top_amplicons = [i for i, amplicon in enumerate(amplicons)
                      if amplicon[1] >= ABUNDANT]
-    # Ending peak is RATIO times higher than the valley
-    RATIO = 50
     # Debugging
-    print("## OTU ", top_amplicons[0], "\n", "# List potential bridges",
-          sep="", file=sys.stderr)
+    print("## OTU ", graph.names[top_amplicons[0]], "\n",
+          "# List potential bridges", sep="", file=sys.stderr)
     # Initialize the list of new seeds
     new_swarm_seeds = [top_amplicons[0]]
     # Break if there is no second peak
     if len(top_amplicons) < 2:
         return new_swarm_seeds, graph
+    # Index the lowest points of the graph
+    abundances = [int(all_amplicons[name][0]) for name in graph.names]
+    index = valley_index(graph, abundances)
+    cuts = list()
     # Loop over the list of top amplicons
     pairs_of_peaks = itertools.combinations(top_amplicons, 2)
     for pair_of_peaks in pairs_of_peaks:
         start_amplicon, end_amplicon = pair_of_peaks
-        path = find_path(graph, start_amplicon, end_amplicon)
-        # Path can be empty if the relation have been deleted
-        if path and len(path) > 1:
-            abundances = [int(all_amplicons[node][0]) for node in path]
-            # Find the weakest spot
-            lowest = min(abundances)
-            if lowest != abundances[-1]:
-                # LOW VALLEY MODEL (CHANGE HERE)
-                if (abundances[-1] / lowest > RATIO / 2 and abundances[0] / abundances[-1] < 10) or abundances[-1] / lowest >= RATIO:
-                    # Debugging
-                    print(abundances, "\tBREAK!", file=sys.stderr)
-                    # Find the rightmost occurence of the lowest point
-                    index = len(abundances) - (abundances[::-1].index(lowest) + 1)
-                    left_amplicon = path[index-1]
-                    right_amplicon = path[index]
-                    # Delete the relation from the graph
-                    graph[left_amplicon].remove(right_amplicon)
-                    # Remove the graph entry if the relation is now empty
-                    if not graph[left_amplicon]:
-                        del graph[left_amplicon]
-                    # Lowest point will be a new swarm seed
-                    new_swarm_seeds.append(right_amplicon)
-                else:
-                    print(abundances, file=sys.stderr)
+        # Find the weakest spot (None if the relation have been deleted)
+        valley = find_valley(index, abundances, cuts,
+                             start_amplicon, end_amplicon)
+        if valley is None:
+            continue
+        lowest = abundances[valley]
+        start_abundance = abundances[start_amplicon]
+        end_abundance = abundances[end_amplicon]
+        if lowest != end_abundance:
+            # LOW VALLEY MODEL (CHANGE HERE)
+            if (end_abundance / lowest > RATIO / 2 and start_abundance / end_abundance < PEAK_RATIO) or end_abundance / lowest >= RATIO:
+                # Debugging
+                if verbose:
+                    path = find_path(graph, start_amplicon, end_amplicon)
+                    print([abundances[node] for node in path], "\tBREAK!",
+                          file=sys.stderr)
+                # Delete the relation on the left of the lowest point
+                graph.parents[valley] = -1
+                cuts.append(valley)
+                # Lowest point will be a new swarm seed
+                new_swarm_seeds.append(valley)
+            elif verbose:
+                path = find_path(graph, start_amplicon, end_amplicon)
+                print([abundances[node] for node in path], file=sys.stderr)
     return new_swarm_seeds, graph
 
 
-def swarmer(graph, seed, path=[]):
+def swarmer(graph, seed):
     """
-    Recursively explore the graph and find all amplicons linked to the
-    seed
+    Explore the graph (depth-first, without recursion) and find all
+    amplicons linked to the seed
     """
-    path = path + [seed]
-    if seed in graph:
-        for node in graph[seed]:
-            path = swarmer(graph, node, path)
+    path = list()
+    stack = [seed]
+    while stack:
+        node = stack.pop()
+        path.append(node)
+        # Push the children in reverse to visit them in order
+        for i in range(graph.offsets[node + 1] - 1, graph.offsets[node] - 1, -1):
+            child = graph.children[i]
+            # Skip the relations deleted by graph_breaker
+            if graph.parents[child] == node:
+                stack.append(child)
     return path
 
 
-def swarm_breaker(binary, all_amplicons, swarms, threshold):
+def swarm_breaker(binary, all_amplicons, swarms, threshold, verbose=False,
+                  parameters=DEFAULT_PARAMETERS, output=None, graphs=None):
     """
-    Recursively inspect and break the newly produced swarms
+    Recursively inspect and break the newly produced swarms (written
+    to output, stdout by default). The graphs of the swarms are reused
+    from graphs if given (see swarm_graph).
     """
-    # ARBITRARY PARAMETERS
-    ABUNDANT = 100
+    if output is None:
+        output = sys.stdout
     # Deal with each swarm
     for swarm in swarms:
         top_amplicon, swarm_mass, swarm_size, top_abundance, amplicons = swarm
-        if swarm_size > 2 and top_abundance > ABUNDANT:
-            # Run swarm to get the pairwise relationships
-            graph_raw_data = run_swarm(binary, all_amplicons, amplicons, threshold)
-            # Build the graph of pairwise relationships
-            graph = build_graph(graph_raw_data)
-            new_swarm_seeds, graph = graph_breaker(amplicons, graph,
-                                                   all_amplicons, ABUNDANT)
-            # Explore the graph and find all amplicons linked to the seeds
-            observed = 0
-            new_swarms = list()
-            for seed in new_swarm_seeds:
-                new_swarm = swarmer(graph, seed)
-                observed += len(new_swarm)
-                # Give to the new swarms the same structure and
-                # re-order them by decreasing abundance
-                amplicons = [(amplicon, all_amplicons[amplicon][0])
-                             for amplicon in new_swarm]
-                amplicons.sort(key=itemgetter(1), reverse=True)
-                top_amplicon, top_abundance = amplicons[0]
-                swarm_size = len(amplicons)
-                swarm_mass = sum([amplicon[1] for amplicon in amplicons])
-                new_swarms.append([top_amplicon, swarm_mass,
-                                   swarm_size, top_abundance, amplicons])
+        if swarm_size > 2 and top_abundance > parameters.abundant:
+            with phase("graph"):
+                # Get the graph of pairwise relationships
+                graph = swarm_graph(binary, all_amplicons, amplicons,
+                                    threshold, graphs)
+            with phase("breaking"):
+                new_swarm_seeds, graph = graph_breaker(amplicons, graph,
+                                                       all_amplicons,
+                                                       parameters, verbose)
+                # Explore the graph and find all amplicons linked to the
+                # seeds
+                observed = 0
+                new_swarms = list()
+                for seed in new_swarm_seeds:
+                    new_swarm = [graph.names[node]
+                                 for node in swarmer(graph, seed)]
+                    observed += len(new_swarm)
+                    # Give to the new swarms the same structure and
+                    # re-order them by decreasing abundance
+                    amplicons = [(amplicon, all_amplicons[amplicon][0])
+                                 for amplicon in new_swarm]
+                    amplicons.sort(key=itemgetter(1), reverse=True)
+                    top_amplicon, top_abundance = amplicons[0]
+                    swarm_size = len(amplicons)
+                    swarm_mass = sum([amplicon[1] for amplicon in amplicons])
+                    new_swarms.append([top_amplicon, swarm_mass,
+                                       swarm_size, top_abundance, amplicons])
             # Deal with the new swarms (no need to treat again the
             # first swarm). There will always be at least one swarm in
             # new_swarms.
-            print(" ".join(["_".join([amplicon[0], str(amplicon[1])])
-                            for amplicon in new_swarms[0][4]]), file=sys.stdout)
+            with phase("output"):
+                print(" ".join(["_".join([amplicon[0], str(amplicon[1])])
+                                for amplicon in new_swarms[0][4]]),
+                      file=output)
             new_swarms.pop(0)
             if new_swarms:
                 # Sort the rest of the new swarms by decreasing mass
                 # and size. Inject them into swarm_breaker.
                 new_swarms.sort(key=itemgetter(1, 2), reverse=True)
-                swarm_breaker(binary, all_amplicons, new_swarms, threshold)
+                swarm_breaker(binary, all_amplicons, new_swarms, threshold,
+                              verbose, parameters, output, graphs)
         else:
             # Output the swarm
-            print(" ".join(["_".join([amplicon[0], str(amplicon[1])])
-                            for amplicon in amplicons]), file=sys.stdout)
+            with phase("output"):
+                print(" ".join(["_".join([amplicon[0], str(amplicon[1])])
+                                for amplicon in amplicons]), file=output)
+    return None
+
+
+def sweep_breaker(binary, all_amplicons, swarms, threshold, settings,
+                  outputs, verbose=False):
+    """
+    Inspect and break the swarms with several parameter settings (one
+    output per setting). The graph of each swarm is built once for all
+    settings, as is the graph of each sub-swarm produced by several
+    settings, and forgotten once the swarm has been treated.
+    """
+    for swarm in swarms:
+        graphs = dict()
+        for parameters, output in zip(settings, outputs):
+            swarm_breaker(binary, all_amplicons, [swarm], threshold, verbose,
+                          parameters, output, graphs)
+    return None
+
+
+def break_one_swarm(i):
+    """
+    Inspect and break the i-th swarm (worker process), and return
+    what has been written to stdout and stderr
+    """
+    binary, all_amplicons, swarms, threshold, verbose, parameters = _shared
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        swarm_breaker(binary, all_amplicons, [swarms[i]], threshold, verbose,
+                      parameters)
+        return sys.stdout.getvalue(), sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+def parallel_swarm_breaker(binary, all_amplicons, swarms, threshold,
+                           verbose, jobs, parameters=DEFAULT_PARAMETERS):
+    """
+    Inspect and break the swarms in several processes. The workers
+    are forked after loading the data, so they share the amplicons
+    and swarms instead of receiving pickled copies. The new swarms
+    are written in the same order as with a single process.
+    """
+    global _shared
+    _shared = (binary, all_amplicons, swarms, threshold, verbose, parameters)
+    if hasattr(multiprocessing, "get_context"):
+        pool = multiprocessing.get_context("fork").Pool(jobs)
+    else:
+        pool = multiprocessing.Pool(jobs)
+    try:
+        chunk_size = max(1, len(swarms) // (jobs * 64))
+        for output, log in pool.imap(break_one_swarm, range(len(swarms)),
+                                     chunk_size):
+            sys.stderr.write(log)
+            sys.stdout.write(output)
+    finally:
+        pool.close()
+        pool.join()
+        _shared = None
     return None
 
 
@@ -305,13 +978,54 @@ def main():
     been treated.
     """
     # Parse command line options.
-    binary, fasta_file, swarm_file, threshold = option_parse()
-    # Load all amplicon ids, abundances and sequences
-    all_amplicons = fasta_parse(fasta_file)
-    # Load the swarming data
-    swarms = swarm_parse(swarm_file)
+    (binary, fasta_file, swarm_file, threshold, verbose, jobs,
+     stream, mask, settings, sweep) = option_parse()
+    if sweep:
+        # One output per parameter setting, all swarms broken at once
+        outputs = [open("%s_%d_%d_%d.swarm" % ((sweep,) + parameters), "w")
+                   for parameters in settings]
+        try:
+            if stream:
+                with phase("parse"):
+                    all_amplicons = FastaIndex(fasta_file)
+                for swarm in swarm_stream(swarm_file):
+                    sweep_breaker(binary, all_amplicons, [swarm], threshold,
+                                  settings, outputs, verbose)
+                    all_amplicons.cache.clear()
+            else:
+                with phase("parse"):
+                    all_amplicons = fasta_parse(fasta_file, mask)
+                    swarms = swarm_parse(swarm_file)
+                sweep_breaker(binary, all_amplicons, swarms, threshold,
+                              settings, outputs, verbose)
+        finally:
+            for output in outputs:
+                output.close()
+        return None
+    parameters = settings[0]
+    if stream:
+        # Deal with each swarm, keeping only its amplicons in memory
+        with phase("parse"):
+            all_amplicons = FastaIndex(fasta_file)
+        for swarm in swarm_stream(swarm_file):
+            swarm_breaker(binary, all_amplicons, [swarm], threshold, verbose,
+                          parameters)
+            all_amplicons.cache.clear()
+        return None
+    with phase("parse"):
+        # Load all amplicon ids, abundances and sequences
+        all_amplicons = fasta_parse(fasta_file, mask)
+        # Load the swarming data
+        swarms = swarm_parse(swarm_file)
     # Deal with each swarm
-    swarm_breaker(binary, all_amplicons, swarms, threshold)
+    if jobs > 1:
+        # (phases of the workers are not recorded separately)
+        with phase("breaking"):
+            parallel_swarm_breaker(binary, all_amplicons, swarms, threshold,
+                                   verbose, jobs, parameters)
+    else:
+        swarm_breaker(binary, all_amplicons, swarms, threshold, verbose,
+                      parameters)
 
 
 #*****************************************************************************#
@@ -324,4 +1038,4 @@ if __name__ == '__main__':
 
     main()
 
-sys.exit(0)
+    sys.exit(0)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Records the graph data of swarm v1 ("swarm -b", see run_swarm in
+# swarm_breaker.py) on random swarms, as the fixture against which
+# test_swarm_breaker.py checks the internal engine without the binary:
+#
+# python tests/record_swarm_graphs.py -b tools/Swarm-1.2.3
+#
+# Each case stores its amplicons (id, abundance, sequence), threshold and
+# the "@" lines of swarm (subseed, target, differences), in JSON.
+
+
+
+from __future__ import print_function
+
+import json
+import os
+import random
+import sys
+from optparse import OptionParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from swarm_breaker import run_swarm
+
+FIXTURE = os.path.join(ROOT, "tests", "data", "swarm_graphs.json")
+
+
+def option_parser():
+    """
+    Parse arguments from command line.
+    """
+    desc = """This program records the graph data of swarm v1 on random
+    swarms (fixture of test_swarm_breaker.py)."""
+
+    parser = OptionParser(usage="usage: %prog -b BINARY", description=desc)
+
+    parser.add_option("-b", "--binary",
+                      metavar="<BINARY>",
+                      action="store",
+                      default=os.path.join(ROOT, "tools", "Swarm-1.2.3"),
+                      dest="binary",
+                      help="swarm v1 binary. Default is tools/Swarm-1.2.3.")
+
+    parser.add_option("-d", "--differences",
+                      metavar="<LIST>",
+                      action="store",
+                      default="1,2,3",
+                      dest="thresholds",
+                      help="comma-separated list of thresholds. "
+                      "Default is 1,2,3.")
+
+    parser.add_option("-n", "--swarms",
+                      metavar="<INTEGER>",
+                      action="store",
+                      type="int",
+                      default=3,
+                      dest="swarms",
+                      help="number of random swarms per threshold. "
+                      "Default is 3.")
+
+    parser.add_option("-o", "--output",
+                      metavar="<FILENAME>",
+                      action="store",
+                      default=FIXTURE,
+                      dest="output",
+                      help="write the fixture to <FILENAME>. Default is "
+                      "tests/data/swarm_graphs.json.")
+
+    (options, args) = parser.parse_args()
+    thresholds = [int(threshold)
+                  for threshold in options.thresholds.split(",")]
+    return options.binary, thresholds, options.swarms, options.output
+
+
+def random_swarm(seed, size=100, length=60):
+    """
+    Random amplicons, each derived from an earlier one by one to three
+    edits, as (id, abundance, sequence) triples by decreasing abundance.
+    """
+    generator = random.Random(seed)
+    sequences = ["".join(generator.choice("acgt") for i in range(length))]
+    while len(sequences) < size:
+        sequence = list(generator.choice(sequences))
+        for edit in range(generator.randint(1, 3)):
+            position = generator.randrange(len(sequence))
+            operation = generator.choice("sid")
+            if operation == "s":
+                sequence[position] = generator.choice("acgt")
+            elif operation == "i":
+                sequence.insert(position, generator.choice("acgt"))
+            elif len(sequence) > 1:
+                del sequence[position]
+        sequence = "".join(sequence)
+        if sequence not in sequences:
+            sequences.append(sequence)
+    return [["a%d" % i, size - i, sequence]
+            for i, sequence in enumerate(sequences)]
+
+
+if __name__ == '__main__':
+
+    ## Parse command-line arguments
+    binary, thresholds, swarms, output = option_parser()
+
+    ## Run swarm on each random swarm
+    cases = list()
+    for threshold in thresholds:
+        for seed in range(swarms):
+            amplicons = random_swarm(seed)
+            all_amplicons = dict((amplicon, (abundance, sequence))
+                                 for amplicon, abundance, sequence
+                                 in amplicons)
+            swarm = [(amplicon, abundance)
+                     for amplicon, abundance, sequence in amplicons]
+            cases.append({"threshold": threshold, "amplicons": amplicons,
+                          "graph_data": run_swarm(binary, all_amplicons,
+                                                  swarm, threshold)})
+
+    ## Write the fixture
+    if not os.path.isdir(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, "w") as output_file:
+        json.dump({"binary": os.path.basename(binary), "cases": cases},
+                  output_file, indent=1, sort_keys=True)
+
+    sys.exit(0)
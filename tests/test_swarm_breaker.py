@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Checks the in-process engine of swarm_breaker.py against swarm v1: the
+# differences of the optimal alignment (scoring of swarm), and the graph
+# data of random swarms recorded from swarm v1 by record_swarm_graphs.py
+# (tests/data/swarm_graphs.json), so that no binary is needed. The
+# comparison is skipped until the fixture has been recorded.
+#
+# python -m unittest discover -s tests
+
+
+
+from __future__ import print_function
+
+import json
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from swarm_breaker import (alignment_differences, bounded_edit_distance,
+                           pairwise_swarm)
+
+FIXTURE = os.path.join(ROOT, "tests", "data", "swarm_graphs.json")
+
+
+class AlignmentDifferencesTest(unittest.TestCase):
+
+    def test_swarm_scoring(self):
+        # A shifted triplet: two edits, but swarm aligns it with three
+        # differences (two mismatches cost less than two gaps)
+        seqA = "ttgcattgcaacgtatgcttagc"
+        seqB = "ttgcattgcacgatatgcttagc"
+        self.assertEqual(bounded_edit_distance(seqA, seqB, 3), 2)
+        self.assertEqual(alignment_differences(seqA, seqB, 3), 3)
+        self.assertEqual(alignment_differences(seqA, seqB, 2), 3)
+
+    def test_simple_edits(self):
+        seqA = "acgtacgtacgtacgt"
+        self.assertEqual(alignment_differences(seqA, seqA, 1), 0)
+        self.assertEqual(alignment_differences(seqA, "acgtacgaacgtacgt", 1),
+                         1)
+        self.assertEqual(alignment_differences(seqA, "acgtacgtacgtacg", 1), 1)
+        self.assertEqual(alignment_differences(seqA, "acgtaacgtacgtacgt", 1),
+                         1)
+        self.assertEqual(alignment_differences(seqA, "tttt", 2), 3)
+
+
+@unittest.skipUnless(os.path.exists(FIXTURE),
+                     "graph data of swarm v1 not recorded "
+                     "(run tests/record_swarm_graphs.py)")
+class EngineComparisonTest(unittest.TestCase):
+
+    def test_recorded_graph_data(self):
+        with open(FIXTURE, "r") as fixture:
+            cases = json.load(fixture)["cases"]
+        for case in cases:
+            all_amplicons = dict((amplicon, (abundance, sequence))
+                                 for amplicon, abundance, sequence
+                                 in case["amplicons"])
+            swarm = [(amplicon, abundance)
+                     for amplicon, abundance, sequence in case["amplicons"]]
+            graph_data = pairwise_swarm(all_amplicons, swarm,
+                                        case["threshold"])
+            self.assertEqual(graph_data, case["graph_data"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -180,6 +180,35 @@ std::vector<Entry> sample(std::vector<Entry>& entries, size_t n) {
 
 };
 
+// randomly chooses the indices of a given number of samples (in increasing order)
+std::vector<size_t> sampleIndices(size_t size, size_t n, std::mt19937& urng) {
+
+    // create indices 0, ..., size - 1
+    std::vector<size_t> indices(size);
+    std::iota(indices.begin(), indices.end(), 0);
+
+    // shuffle indices randomly, keep the first n in their original order
+    std::shuffle(indices.begin(), indices.end(), urng);
+    indices.resize(n);
+    std::sort(indices.begin(), indices.end());
+
+    return indices;
+
+}
+
+// writes the identifiers of the chosen entries to disk (one per line, in the order of the FASTA file)
+void writeMask(const std::string fileName, std::vector<Entry>& entries, std::vector<size_t>& indices) {
+
+    std::ofstream oStream(fileName);
+
+    for (auto i : indices) {
+        oStream << extractId(entries[i].first) << std::endl;
+    }
+
+    oStream.close();
+
+}
+
 // writes the given entries as a FASTA file to disk
 void writeSample(const std::string fileName, std::vector<Entry>& sample) {
 
@@ -211,7 +240,18 @@ void printHelp() {
     std::cout << "\t<FASTA file>: input file to sample from" << std::endl;
     std::cout << "\t<ID file>: list of identifiers (one per line)" << std::endl;
     std::cout << "\t<output file>: path and prefix of output file (e.g. /home/user/selected.fasta)" << std::endl;
-    std::cout << "\t<case>: optional flag indicating the case of the output files (L = lower case, U = upper case, K = keep as is)" << std::endl;
+    std::cout << "\t<case>: optional flag indicating the case of the output files (L = lower case, U = upper case, K = keep as is)" << std::endl << std::endl;
+
+    std::cout << "Use case 3: Random subsampling as masks" << std::endl;
+    std::cout << "FastaSampler -m <FASTA file> <percentages> <repetitions> <output-stem> [<seed>]" << std::endl;
+    std::cout << "\t<FASTA file>: input file to sample from" << std::endl;
+    std::cout << "\t<percentages>: comma-separated list of percentages (integer values, e.g. 50,60,70)" << std::endl;
+    std::cout << "\t<repetitions>: number of samples to obtain per percentage" << std::endl;
+    std::cout << "\t<output-stem>: path and prefix of output files (e.g. /home/user/sample), " << std::endl;
+    std::cout << "\t\t completed by the percentage and repetition number (e.g. /home/user/sample_50_0.ids)," << std::endl;
+    std::cout << "\t\t each listing the identifiers of a sample (one per line, in the order of the FASTA file," << std::endl;
+    std::cout << "\t\t see use case 2 to obtain the sample itself)" << std::endl;
+    std::cout << "\t<seed>: optional seed of the random number generator (random by default)" << std::endl;
 
 }
 
@@ -303,6 +343,75 @@ int main(int argc, const char* argv[]) {
 
     }
 
+    if (opt == "-m") { // random subsampling (identifier lists only)
+
+        if (argc < 6) {
+
+            std::cout << "Error: Not enough arguments!" << std::endl;
+            printHelp();
+            return 1;
+
+        }
+
+        std::string inputFile = argv[2];
+        std::string percentagesStr = argv[3]; // comma-separated percentages
+        int reps = std::stoi(argv[4]); // number of samples per percentage
+        std::string outputStem = std::string(argv[5]);
+
+        std::random_device rng;
+        std::mt19937 urng((argc >= 7) ? std::stoul(argv[6]) : rng());
+
+        std::vector<int> percentages;
+        size_t start = 0;
+        size_t end = percentagesStr.find(',');
+        while (end != std::string::npos) {
+
+            percentages.push_back(std::stoi(percentagesStr.substr(start, end - start)));
+            start = end + 1;
+            end = percentagesStr.find(',', start);
+
+        }
+
+        percentages.push_back(std::stoi(percentagesStr.substr(start, end)));
+
+
+        std::cout << "FASTA file: " << inputFile << std::endl;
+        std::cout << "Percentages: ";
+        for (auto p : percentages) {
+            std::cout << p << " ";
+        }
+        std::cout << std::endl;
+        std::cout << "Repetitions: " << reps << std::endl;
+        std::cout << "Stem of output files: " << outputStem << std::endl << std::endl;
+
+        std::cout << "Reading FASTA file..." << std::flush;
+        std::vector<Entry> entries;
+        readInput(inputFile, entries, 'K');
+        std::cout << "DONE" << std::endl;
+
+        std::cout << "Sampling..." << std::endl;
+        for (auto p : percentages) {
+
+            std::cout << p << " %: 0 / " << reps << " completed\r" << std::flush;
+            for (auto i = 0; i < reps; i++) {
+
+                std::vector<size_t> indices = sampleIndices(entries.size(), size_t(ceil((p / 100.0) * entries.size())), urng);
+                writeMask(outputStem + "_" + std::to_string(p) + "_" + std::to_string(i) + ".ids", entries, indices);
+
+                std::cout << p << " %: "<< (i + 1) << " / " << reps << " completed\r" << std::flush;
+
+            }
+
+            std::cout << std::endl;
+
+        }
+
+        std::cout << "\nAll samples obtained!" << std::endl;
+
+        return 0;
+
+    }
+
     if (opt == "-l") { // subsample by identifier list
 
         if (argc < 5) {